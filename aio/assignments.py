@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from database.mongo_db import async_db
+from utils.results import as_async_results
+from utils.timestamp import utc_now_iso
+
+
+async def get_upcoming_assignments(materialize=False, batch_size=None):
+    now = utc_now_iso()
+    results = async_db["assignments"].find(
+        {"dueDate": {"$gte": now, "$lte": now + timedelta(days=7)}},
+        {"_id": 0, "assignmentId": 1, "title": 1}
+    )
+    return await as_async_results(results, materialize, batch_size)
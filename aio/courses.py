@@ -0,0 +1,167 @@
+import re
+
+from pymongo import ASCENDING, DESCENDING
+
+from analytics.result_cache import bumps
+from courses import (
+    average_course_rating_pipeline,
+    average_rating_per_instructor_pipeline,
+    courses_grouped_by_category_pipeline,
+    get_course_with_instructor_pipeline,
+    SEARCH_FIELDS,
+    popular_course_categories_pipeline,
+    search_courses_query,
+    search_tokens
+)
+from catalog import aget_course, invalidate_course
+from database.mongo_db import async_db
+from utils.pagination import DEFAULT_PAGE_SIZE, async_find_page
+from utils.results import as_async_results
+from utils.timestamp import utc_now_iso
+
+
+async def get_course_with_instructor(materialize=False, batch_size=None):
+    result = await async_db["courses"].aggregate(get_course_with_instructor_pipeline())
+    return await as_async_results(result, materialize, batch_size)
+
+
+async def get_courses_by_category(category: str, materialize=False, batch_size=None):
+    courses = async_db["courses"].find(
+        {"category": category},
+        {"_id": 0, "courseId": 1, "title": 1, "category": 1}
+    )
+    return await as_async_results(courses, materialize, batch_size)
+
+
+async def get_courses_by_category_page(category: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return await async_find_page(
+        async_db["courses"],
+        {"category": category},
+        {"_id": 0, "courseId": 1, "title": 1, "category": 1},
+        [("courseId", ASCENDING)],
+        page_size,
+        token
+    )
+
+
+async def search_courses_by_title(query: str, materialize=False, batch_size=None):
+    courses = async_db["courses"].find(
+        {"title": {"$regex": re.escape(query), "$options": "i"}},
+        {"_id": 0, "courseId": 1, "title": 1}
+    )
+    return await as_async_results(courses, materialize, batch_size)
+
+
+async def search_courses_by_title_page(query: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return await async_find_page(
+        async_db["courses"],
+        {"title": {"$regex": re.escape(query), "$options": "i"}},
+        {"_id": 0, "courseId": 1, "title": 1},
+        [("title", ASCENDING), ("courseId", ASCENDING)],
+        page_size,
+        token
+    )
+
+
+async def _no_results():
+    # Empty async generator, the async counterpart of iter(())
+    return
+    yield
+
+
+async def search_courses(query: str, category=None, level=None, min_price=None, max_price=None, prefix=False,
+                         limit=20, materialize=False, batch_size=None):
+    conditions = search_courses_query(query, category, level, min_price, max_price, prefix)
+    if conditions is None:
+        return [] if materialize else _no_results()
+
+    projection = dict(SEARCH_FIELDS)
+    if "$text" in conditions:
+        projection["score"] = {"$meta": "textScore"}
+        sort = [("score", {"$meta": "textScore"})]
+    else:
+        sort = [("ratingSummary.average", DESCENDING)]
+
+    results = async_db["courses"].find(conditions, projection).sort(sort).limit(limit)
+    return await as_async_results(results, materialize, batch_size)
+
+
+@bumps("courses")
+async def publish_course(course_id: str):
+    courses = async_db["courses"]
+    course = await aget_course(course_id)
+
+    if not course:
+        print(f"❌ Course with ID {course_id} not found.")
+        return
+
+    if course.get("isPublished"):
+        print(f"⚠️ Course '{course_id}' is already published. No action taken.")
+        return
+
+    result = await courses.update_one(
+        {"courseId": course_id, "isPublished": False},
+        {"$set": {"isPublished": True, "updatedAt": utc_now_iso()}}
+    )
+    invalidate_course(course_id)
+    print(f"\n📢 Course '{course_id}' marked as published: {result.modified_count} document(s) updated.")
+
+
+@bumps("courses")
+async def add_tags_to_course(course_id: str, new_tags: list):
+    result = await async_db["courses"].update_one(
+        {"courseId": course_id},
+        {
+            "$addToSet": {"tags": {"$each": new_tags}, "searchTokens": {"$each": search_tokens("", new_tags)}},
+            "$set": {"updatedAt": utc_now_iso()}
+        }
+    )
+
+    if not result.matched_count:
+        print(f"❌ Course with ID {course_id} not found.")
+        return
+    print(f"\n🏷️ Tags added to course {course_id}: {result.modified_count} document(s) updated.")
+
+
+async def get_courses_in_price_range(min_price=50, max_price=200, materialize=False, batch_size=None):
+    results = async_db["courses"].find(
+        {"price": {"$gte": min_price, "$lte": max_price}},
+        {"_id": 0, "courseId": 1, "price": 1}
+    )
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def get_courses_in_price_range_page(min_price=50, max_price=200, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return await async_find_page(
+        async_db["courses"],
+        {"price": {"$gte": min_price, "$lte": max_price}},
+        {"_id": 0, "courseId": 1, "price": 1},
+        [("price", ASCENDING), ("courseId", ASCENDING)],
+        page_size,
+        token
+    )
+
+
+async def get_courses_by_tags(tag_list, materialize=False, batch_size=None):
+    results = async_db["courses"].find({"tags": {"$in": tag_list}}, {"_id": 0, "courseId": 1, "tags": 1})
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def average_course_rating(materialize=False, batch_size=None):
+    results = await async_db["courses"].aggregate(average_course_rating_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def courses_grouped_by_category(materialize=False, batch_size=None):
+    results = await async_db["courses"].aggregate(courses_grouped_by_category_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def average_rating_per_instructor(materialize=False, batch_size=None):
+    results = await async_db["courses"].aggregate(average_rating_per_instructor_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def popular_course_categories(materialize=False, batch_size=None):
+    results = await async_db["enrollments"].aggregate(popular_course_categories_pipeline())
+    return await as_async_results(results, materialize, batch_size)
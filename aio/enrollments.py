@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from analytics.course_stats import STATS_COLLECTION, stale_course_update
+from analytics.enrollment_rollups import (
+    COURSE_DAILY_COLLECTION,
+    DAILY_COLLECTION,
+    arolled_through,
+    rollup_decrements
+)
+from analytics.result_cache import bumps
+from analytics.student_reach import INSTRUCTOR_STUDENT_SKETCHES, approximate_students_per_instructor_pipeline
+from catalog import aget_course, aget_courses, aget_user, aget_users
+from database.mongo_db import async_db
+from enrollments import (
+    course_completion_rate_pipeline,
+    enrollment_operations,
+    enrollment_rejection,
+    enrollment_stats_per_course_pipeline,
+    enrollment_summary,
+    enrollment_upsert,
+    enrollment_write_counts,
+    located_failures,
+    monthly_enrollment_trends_pipeline,
+    revenue_per_instructor_pipeline,
+    total_students_per_instructor_pipeline
+)
+from utils.bulk import DEFAULT_BATCH_SIZE, chunked
+from utils.results import as_async_results
+
+
+@bumps("enrollments")
+async def enroll_student(user_id: str, course_id: str):
+    enrollments = async_db["enrollments"]
+
+    # The student and course lookups are independent, so issue them concurrently (cache misses only)
+    student, course = await asyncio.gather(aget_user(user_id), aget_course(course_id))
+
+    rejection = enrollment_rejection(student, course)
+    if rejection:
+        print(f"❌ Cannot add enrollment: {rejection}")
+        return
+
+    enrollment_filter, enrollment_update = enrollment_upsert(student["userId"], course)
+
+    try:
+        result = await enrollments.update_one(enrollment_filter, enrollment_update, upsert=True)
+    except DuplicateKeyError:
+        result = None
+    except Exception as e:
+        print(f"❌ Failed to insert enrollment: {e}")
+        return
+
+    if result is None or result.upserted_id is None:
+        print(f"⚠️ Student {student['userId']} is already enrolled in course {course['courseId']}")
+        return
+
+    print(f"✅ Enrolled {student['userId']} in course {course['courseId']}")
+    return result.upserted_id
+
+
+@bumps("enrollments")
+async def enroll_students(pairs, batch_size=DEFAULT_BATCH_SIZE):
+    started = time.perf_counter()
+    pairs = list(pairs)
+    students, courses = await asyncio.gather(
+        aget_users([user_id for user_id, _ in pairs]),
+        aget_courses([course_id for _, course_id in pairs])
+    )
+    operations, targets, rejected = enrollment_operations(pairs, students, courses)
+
+    enrolled = already = 0
+    failures = []
+    offset = 0
+    for batch in chunked(operations, batch_size):
+        try:
+            counts = enrollment_write_counts(await async_db["enrollments"].bulk_write(batch, ordered=False))
+        except BulkWriteError as e:
+            counts = enrollment_write_counts(error=e)
+        enrolled += counts[0]
+        already += counts[1]
+        failures += located_failures(counts[2], targets, offset)
+        offset += len(batch)
+
+    return enrollment_summary(enrolled, already, rejected, failures, started)
+
+
+@bumps("enrollments", DAILY_COLLECTION, COURSE_DAILY_COLLECTION)
+async def delete_enrollment(enrollment_id: str):
+    deleted = await async_db["enrollments"].find_one_and_delete(
+        {"enrollmentId": enrollment_id},
+        {"_id": 0, "courseId": 1, "enrolledAt": 1}
+    )
+
+    if deleted:
+        state_filter, state_update = stale_course_update(deleted["courseId"])
+        await async_db["analytics_state"].update_one(state_filter, state_update, upsert=True)
+        decrements = rollup_decrements(deleted["courseId"], deleted["enrolledAt"], await arolled_through())
+        for collection, rollup_filter, rollup_update in decrements:
+            await async_db[collection].update_one(rollup_filter, rollup_update)
+        print(f"✅ Enrollment '{enrollment_id}' deleted successfully.")
+    else:
+        print(f"❌ Enrollment '{enrollment_id}' not found.")
+
+
+async def enrollment_stats_per_course(materialize=False, batch_size=None):
+    results = await async_db[STATS_COLLECTION].aggregate(enrollment_stats_per_course_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def course_completion_rate(materialize=False, batch_size=None):
+    results = await async_db[STATS_COLLECTION].aggregate(course_completion_rate_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def total_students_per_instructor(approximate=False, materialize=False, batch_size=None):
+    if approximate:
+        results = await async_db[INSTRUCTOR_STUDENT_SKETCHES].aggregate(approximate_students_per_instructor_pipeline())
+    else:
+        results = await async_db["enrollments"].aggregate(total_students_per_instructor_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def revenue_per_instructor(materialize=False, batch_size=None):
+    results = await async_db["enrollments"].aggregate(revenue_per_instructor_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def monthly_enrollment_trends(materialize=False, batch_size=None):
+    pipeline = monthly_enrollment_trends_pipeline(rolled=await arolled_through())
+    results = await async_db[DAILY_COLLECTION].aggregate(pipeline)
+    return await as_async_results(results, materialize, batch_size)
@@ -0,0 +1,34 @@
+from faker import Faker
+
+from analytics.result_cache import bumps
+from database.mongo_db import async_db
+from lessons import new_lesson
+
+
+@bumps("lessons")
+async def add_lesson_to_course():
+    lessons = async_db["lessons"]
+
+    course = await async_db["courses"].find_one({}, {"courseId": 1})
+    if not course:
+        print("❌ No course found to add a lesson.")
+        return
+
+    current_position = await lessons.count_documents({"courseId": course["courseId"]}) + 1
+    lesson = new_lesson(course["courseId"], current_position, Faker())
+
+    try:
+        await lessons.insert_one(lesson)
+        print(f"✅ Added lesson {lesson['title']} to course {course['courseId']} (Position {current_position})")
+    except Exception as e:
+        print(f"❌ Failed to add lesson: {e}")
+
+
+@bumps("lessons")
+async def delete_lesson(lesson_id: str):
+    result = await async_db["lessons"].delete_one({"lessonId": lesson_id})
+
+    if result.deleted_count:
+        print(f"✅ Lesson '{lesson_id}' removed from course.")
+    else:
+        print(f"❌ Lesson '{lesson_id}' not found.")
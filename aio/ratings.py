@@ -0,0 +1,34 @@
+from analytics.result_cache import bumps
+from database.mongo_db import async_db
+from ratings import rating_bucket_push, rating_summary_update
+from utils.results import as_async_results
+from utils.timestamp import utc_now_iso
+
+
+@bumps("course_ratings", "courses")
+async def add_course_rating(course_id: str, student_id: str, rating: float):
+    rating = float(rating)
+    if not 1.0 <= rating <= 5.0:
+        print(f"❌ Rating must be between 1.0 and 5.0, got {rating}.")
+        return
+
+    rated_at = utc_now_iso()
+
+    result = await async_db["courses"].update_one({"courseId": course_id}, rating_summary_update(rating, rated_at))
+    if not result.matched_count:
+        print(f"❌ Course with ID {course_id} not found.")
+        return
+
+    bucket_filter, bucket_update = rating_bucket_push(course_id, student_id, rating, rated_at)
+    await async_db["course_ratings"].update_one(bucket_filter, bucket_update, upsert=True)
+    print(f"\n⭐ Rating {rating} added to course {course_id}.")
+
+
+async def get_course_ratings(course_id: str, materialize=False, batch_size=None):
+    results = await async_db["course_ratings"].aggregate([
+        {"$match": {"courseId": course_id}},
+        {"$sort": {"firstRatedAt": 1}},
+        {"$unwind": "$ratings"},
+        {"$replaceRoot": {"newRoot": "$ratings"}}
+    ])
+    return await as_async_results(results, materialize, batch_size)
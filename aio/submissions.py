@@ -0,0 +1,71 @@
+import time
+
+from pymongo.errors import BulkWriteError
+
+from analytics.grade_stats import GRADE_STATS_COLLECTION, arecompute_student_grade_stats, graded_stats_operations
+from analytics.result_cache import bumps
+from analytics.score_quantiles import aupdate_score_sketches
+from database.mongo_db import async_db
+from submissions import (
+    grade_distribution_updates,
+    grading_batch_time,
+    grading_outcomes,
+    grading_plan,
+    grading_state_pipeline,
+    grading_summary,
+    write_errors
+)
+from utils.bulk import DEFAULT_BATCH_SIZE, chunked
+
+
+@bumps("submissions", "assignments", GRADE_STATS_COLLECTION)
+async def grade_submissions(grades, batch_size=DEFAULT_BATCH_SIZE):
+    started = time.perf_counter()
+    results = []
+
+    for batch in chunked(grades, batch_size):
+        submission_ids = [submission_id for submission_id, _, _ in batch]
+        cursor = await async_db["submissions"].aggregate(grading_state_pipeline(submission_ids))
+        current = {doc["submissionId"]: doc for doc in await cursor.to_list()}
+        graded_at = grading_batch_time()
+        operations, planned, rejected = grading_plan(batch, current, graded_at)
+        results += rejected
+        if not operations:
+            continue
+
+        failed = {}
+        try:
+            matched = (await async_db["submissions"].bulk_write(operations, ordered=False)).matched_count
+        except BulkWriteError as e:
+            matched, failed = e.details.get("nMatched", 0), write_errors(e)
+
+        applied_ids = None
+        if matched + len(failed) < len(operations):
+            applied_ids = set(await async_db["submissions"].distinct(
+                "submissionId",
+                {"submissionId": {"$in": [grade["submissionId"] for grade in planned]}, "gradedAt": graded_at}
+            ))
+
+        applied, outcomes = grading_outcomes(planned, failed, applied_ids)
+        results += outcomes
+        updates = grade_distribution_updates(applied)
+        if updates:
+            await async_db["assignments"].bulk_write(updates, ordered=False)
+
+        stats_operations, regraded = graded_stats_operations(applied)
+        if stats_operations:
+            await async_db[GRADE_STATS_COLLECTION].bulk_write(stats_operations, ordered=False)
+        if regraded:
+            await arecompute_student_grade_stats(regraded)
+
+        await aupdate_score_sketches(applied)
+
+    return grading_summary(results, started)
+
+
+async def update_assignment_grade(submission_id: str, grade: int, feedback: str = None):
+    result = (await grade_submissions([(submission_id, grade, feedback)]))["results"][0]
+    if result["status"] != "graded":
+        print(f"❌ Could not grade submission {submission_id}: {result['message']}")
+        return
+    print(f"\n📝 Grade updated for submission {submission_id}: {grade}")
@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from pymongo import ASCENDING
+
+from analytics.grade_stats import GRADE_STATS_COLLECTION
+from analytics.result_cache import bumps
+from catalog import aget_user, invalidate_user
+from database.mongo_db import async_db
+from users import (
+    ACTIVE_STUDENT_FIELDS,
+    average_grade_per_student_pipeline,
+    get_students_in_course_pipeline,
+    students_in_course_stages,
+    student_engagement_metrics_pipeline,
+    top_performing_students_with_names_pipeline
+)
+from utils.pagination import DEFAULT_PAGE_SIZE, async_aggregate_page, async_find_page
+from utils.results import as_async_results
+from utils.timestamp import utc_now_iso
+
+
+async def find_active_students(materialize=False, batch_size=None):
+    active_students = async_db["users"].find({
+        "role": "student",
+        "isActive": True
+    }, ACTIVE_STUDENT_FIELDS)
+
+    return await as_async_results(active_students, materialize, batch_size)
+
+
+async def find_active_students_page(page_size=DEFAULT_PAGE_SIZE, token=None):
+    return await async_find_page(
+        async_db["users"],
+        {"role": "student", "isActive": True},
+        ACTIVE_STUDENT_FIELDS,
+        [("dateJoined", ASCENDING), ("userId", ASCENDING)],
+        page_size,
+        token
+    )
+
+
+async def get_students_in_course(course_id: str, materialize=False, batch_size=None):
+    result = await async_db["enrollments"].aggregate(get_students_in_course_pipeline(course_id))
+    return await as_async_results(result, materialize, batch_size)
+
+
+async def get_students_in_course_page(course_id: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return await async_aggregate_page(
+        async_db["enrollments"],
+        {"courseId": course_id},
+        [("studentId", ASCENDING)],
+        students_in_course_stages(),
+        page_size,
+        token
+    )
+
+
+@bumps("users")
+async def update_user_profile(user_id: str, bio: str, avatar: str, skills: list):
+    result = await async_db["users"].update_one(
+        {"userId": user_id},
+        {
+            "$set": {
+                "profile.bio": bio,
+                "profile.avatar": avatar,
+                "profile.skills": skills,
+                "updatedAt": utc_now_iso()
+            }
+        }
+    )
+    print(f"\n👤 Profile update result for {user_id}: {result.modified_count} document(s) updated.")
+
+
+@bumps("users")
+async def soft_delete_user(user_id: str):
+    users = async_db["users"]
+
+    user = await aget_user(user_id)
+
+    if not user:
+        print(f"❌ User '{user_id}' not found.")
+        return
+
+    if not user['isActive']:
+        print(f"⚠️ User '{user['userId']}' is already inactive.")
+        return
+
+    result = await users.update_one(
+        {"userId": user_id, "isActive": True},
+        {"$set": {"isActive": False, "updatedAt": utc_now_iso()}}
+    )
+    invalidate_user(user_id)
+
+    if result.modified_count:
+        print(f"✅ User '{user_id}' marked as inactive.")
+    else:
+        print(f"❌ Failed to update user '{user_id}'.")
+
+
+async def get_recent_users(months=6, materialize=False, batch_size=None):
+    since = utc_now_iso() - timedelta(days=30 * months)
+    results = async_db["users"].find(
+        {"dateJoined": {"$gte": since}},
+        {"_id": 0, "userId": 1, "firstName": 1, "lastName": 1}
+    )
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def average_grade_per_student(materialize=False, batch_size=None):
+    results = await async_db[GRADE_STATS_COLLECTION].aggregate(average_grade_per_student_pipeline())
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def top_performing_students_with_names(limit=5, materialize=False, batch_size=None):
+    results = await async_db[GRADE_STATS_COLLECTION].aggregate(top_performing_students_with_names_pipeline(limit))
+    return await as_async_results(results, materialize, batch_size)
+
+
+async def student_engagement_metrics(materialize=False, batch_size=None):
+    results = await async_db[GRADE_STATS_COLLECTION].aggregate(student_engagement_metrics_pipeline())
+    return await as_async_results(results, materialize, batch_size)
@@ -0,0 +1,96 @@
+import argparse
+from datetime import timedelta
+
+from analytics.result_cache import bumps
+from database.mongo_db import db
+from utils.timestamp import utc_now_iso
+
+
+STATS_COLLECTION = "course_enrollment_stats"
+STATE_ID = "course_enrollment_stats"
+
+# Writes stamped just before a refresh may commit just after it; the next refresh re-reads this window.
+# Recomputing a course is idempotent, so the overlap only costs a little repeated work.
+WATERMARK_LAG = timedelta(seconds=60)
+
+
+def stale_course_update(course_id: str):
+    # (filter, update) on analytics_state; deletes leave no updatedAt behind, so they flag the course instead
+    return {"_id": STATE_ID}, {"$addToSet": {"staleCourseIds": course_id}}
+
+
+def mark_course_stats_stale(course_id: str):
+    state_filter, state_update = stale_course_update(course_id)
+    db["analytics_state"].update_one(state_filter, state_update, upsert=True)
+
+
+def course_enrollment_stats_pipeline(course_ids, refreshed_at):
+    # course_ids=None recomputes every course; otherwise only the listed ones
+    match = [{"$match": {"courseId": {"$in": course_ids}}}] if course_ids is not None else []
+    return match + [
+        {
+            "$group": {
+                "_id": "$courseId",
+                "total": {"$sum": 1},
+                "enrolled": {"$sum": {"$cond": [{"$eq": ["$status", "enrolled"]}, 1, 0]}},
+                "inProgress": {"$sum": {"$cond": [{"$eq": ["$status", "in_progress"]}, 1, 0]}},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                "averageProgress": {"$avg": "$progress"}
+            }
+        },
+        {
+            "$set": {
+                "averageProgress": {"$round": ["$averageProgress", 1]},
+                "completionRate": {"$round": [{"$multiply": [{"$divide": ["$completed", "$total"]}, 100]}, 1]},
+                "refreshedAt": {"$literal": refreshed_at}
+            }
+        },
+        {"$merge": {"into": STATS_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+
+@bumps(STATS_COLLECTION)
+def refresh_course_enrollment_stats(full=False):
+    # Recomputes only the courses with enrollments changed since the last watermark (plus courses flagged
+    # stale by deletes). full=True, or a first run with no watermark, rebuilds every course.
+    state = db["analytics_state"].find_one({"_id": STATE_ID}) or {}
+    started = utc_now_iso()
+    watermark = state.get("watermark")
+    stale = state.get("staleCourseIds", [])
+
+    if full or watermark is None:
+        course_ids = None
+    else:
+        changed = db["enrollments"].distinct("courseId", {"updatedAt": {"$gte": watermark}})
+        course_ids = sorted(set(changed) | set(stale))
+
+    if course_ids != []:
+        db["enrollments"].aggregate(course_enrollment_stats_pipeline(course_ids, started))
+
+        # A course that no longer has any enrollment produced no $group row; drop its old stats
+        leftover = {"refreshedAt": {"$lt": started}}
+        if course_ids is not None:
+            leftover["_id"] = {"$in": course_ids}
+        db[STATS_COLLECTION].delete_many(leftover)
+
+    db["analytics_state"].update_one(
+        {"_id": STATE_ID},
+        {"$set": {"watermark": started - WATERMARK_LAG}, "$pullAll": {"staleCourseIds": stale}},
+        upsert=True
+    )
+
+    refreshed = "all" if course_ids is None else len(course_ids)
+    print(f"🔄 Course enrollment stats refreshed for {refreshed} course(s).")
+    return course_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the materialized course_enrollment_stats collection.")
+    parser.add_argument("--full", action="store_true", help="rebuild every course instead of the changed ones")
+    args = parser.parse_args(argv)
+
+    refresh_course_enrollment_stats(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+from datetime import datetime, timezone
+
+from analytics.result_cache import bumps
+from database.mongo_db import async_db, db
+from utils.results import as_results
+from utils.timestamp import utc_now_iso
+
+
+DAILY_COLLECTION = "enrollment_rollups_daily"  # {_id: day, enrollments}
+COURSE_DAILY_COLLECTION = "enrollment_rollups_course_daily"  # {_id: {courseId, day}, courseId, day, enrollments}
+STATE_ID = "enrollment_rollups"
+GRANULARITIES = ("day", "week", "month")
+
+# Nothing rolled up yet: every query falls through to the live path
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def as_utc(moment):
+    # Dates read back from MongoDB are naive UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def day_start(moment):
+    # Day buckets are UTC calendar days
+    return as_utc(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rolled_through():
+    # Exclusive end of the closed days already materialized
+    state = db["analytics_state"].find_one({"_id": STATE_ID}, {"rolledThrough": 1})
+    return day_start(state["rolledThrough"]) if state else EPOCH
+
+
+async def arolled_through():
+    state = await async_db["analytics_state"].find_one({"_id": STATE_ID}, {"rolledThrough": 1})
+    return day_start(state["rolledThrough"]) if state else EPOCH
+
+
+def rollup_decrements(course_id, enrolled_at, rolled):
+    # (collection, filter, update) triples undoing one deleted enrollment in the closed-day rollups.
+    # Only days before the watermark are materialized: later days (including today) are grouped live
+    # and the next refresh counts them from enrollments, so a bucket there must not be touched.
+    day = day_start(enrolled_at)
+    if day >= rolled:
+        return []
+    return [
+        (COURSE_DAILY_COLLECTION, {"_id": {"courseId": course_id, "day": day}}, {"$inc": {"enrollments": -1}}),
+        (DAILY_COLLECTION, {"_id": day}, {"$inc": {"enrollments": -1}})
+    ]
+
+
+@bumps(DAILY_COLLECTION, COURSE_DAILY_COLLECTION)
+def apply_rollup_decrements(course_id, enrolled_at):
+    # No upsert: a missing bucket has nothing to undo, and an orphan -1 would outlive every refresh
+    for collection, rollup_filter, rollup_update in rollup_decrements(course_id, enrolled_at, rolled_through()):
+        db[collection].update_one(rollup_filter, rollup_update)
+
+
+def course_daily_rollup_pipeline(start, end, refreshed_at):
+    enrolled = {"$lt": end} if start is None else {"$gte": start, "$lt": end}
+    return [
+        {"$match": {"enrolledAt": enrolled}},
+        {
+            "$group": {
+                "_id": {"courseId": "$courseId", "day": {"$dateTrunc": {"date": "$enrolledAt", "unit": "day"}}},
+                "enrollments": {"$sum": 1}
+            }
+        },
+        {
+            "$set": {
+                "courseId": "$_id.courseId",
+                "day": "$_id.day",
+                "refreshedAt": {"$literal": refreshed_at}
+            }
+        },
+        {"$merge": {"into": COURSE_DAILY_COLLECTION, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+
+def daily_rollup_pipeline(start, end, refreshed_at):
+    # Built from the (course, day) rollup rather than re-reading enrollments
+    day = {"$lt": end} if start is None else {"$gte": start, "$lt": end}
+    return [
+        {"$match": {"day": day}},
+        {"$group": {"_id": "$day", "enrollments": {"$sum": "$enrollments"}}},
+        {"$set": {"refreshedAt": {"$literal": refreshed_at}}},
+        {"$merge": {"into": DAILY_COLLECTION, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+
+@bumps(DAILY_COLLECTION, COURSE_DAILY_COLLECTION)
+def refresh_enrollment_rollups(full=False):
+    # Materializes every closed day since the last refresh (normally just yesterday); full=True redoes all history
+    started = utc_now_iso()
+    today = day_start(started)
+    rolled = rolled_through()
+    start = None if full or rolled == EPOCH else rolled
+
+    if start is None or start < today:
+        db["enrollments"].aggregate(course_daily_rollup_pipeline(start, today, started))
+        db[COURSE_DAILY_COLLECTION].aggregate(daily_rollup_pipeline(start, today, started))
+
+        # Buckets in the refreshed range that no longer have any enrollment produced no $group row
+        # ($not also catches buckets that never had a refreshedAt)
+        day = {"$lt": today} if start is None else {"$gte": start, "$lt": today}
+        stale = {"$not": {"$gte": started}}
+        db[COURSE_DAILY_COLLECTION].delete_many({"day": day, "refreshedAt": stale})
+        db[DAILY_COLLECTION].delete_many({"_id": day, "refreshedAt": stale})
+
+    db["analytics_state"].update_one(
+        {"_id": STATE_ID},
+        {"$set": {"rolledThrough": today, "updatedAt": started}},
+        upsert=True
+    )
+    print(f"🗓️ Enrollment rollups materialized through {today.date()}.")
+
+
+def enrollment_trends_pipeline(granularity="month", start=None, end=None, course_id=None, rolled=None):
+    # Runs on the daily rollup (or the per-course one when course_id is given). Closed days come from the
+    # rollup; days from `rolled` onward (normally just today) are grouped live from enrollments.
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}, got {granularity!r}")
+    rolled = rolled or EPOCH
+    start = as_utc(start) if start is not None else None
+    end = as_utc(end) if end is not None else None
+
+    closed = {"$lt": rolled if end is None else min(rolled, end)}
+    if start is not None:
+        closed["$gte"] = start
+    live = {"$gte": rolled if start is None else max(rolled, start)}
+    if end is not None:
+        live["$lt"] = end
+
+    if course_id is None:
+        rollup_match = {"_id": closed}
+        live_match = {"enrolledAt": live}
+    else:
+        rollup_match = {"courseId": course_id, "day": closed}
+        live_match = {"courseId": course_id, "enrolledAt": live}
+
+    return [
+        {"$match": rollup_match},
+        {"$project": {"_id": 0, "day": "$_id" if course_id is None else "$day", "enrollments": 1}},
+        {
+            "$unionWith": {
+                "coll": "enrollments",
+                "pipeline": [
+                    {"$match": live_match},
+                    {"$group": {"_id": {"$dateTrunc": {"date": "$enrolledAt", "unit": "day"}}, "enrollments": {"$sum": 1}}},
+                    {"$project": {"_id": 0, "day": "$_id", "enrollments": 1}}
+                ]
+            }
+        },
+        {
+            "$group": {
+                "_id": {"$dateTrunc": {"date": "$day", "unit": granularity, "startOfWeek": "monday"}},
+                "enrollments": {"$sum": "$enrollments"}
+            }
+        },
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "period": "$_id", "enrollments": 1}}
+    ]
+
+
+def enrollment_trends(granularity="month", start=None, end=None, course_id=None, materialize=False, batch_size=None):
+    collection = DAILY_COLLECTION if course_id is None else COURSE_DAILY_COLLECTION
+    pipeline = enrollment_trends_pipeline(granularity, start, end, course_id, rolled_through())
+    results = db[collection].aggregate(pipeline)
+    return as_results(results, materialize, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize closed-day enrollment rollups.")
+    parser.add_argument("--full", action="store_true", help="rebuild every day instead of the ones since the last run")
+    args = parser.parse_args(argv)
+
+    refresh_enrollment_rollups(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
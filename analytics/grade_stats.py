@@ -0,0 +1,208 @@
+import argparse
+import uuid
+
+from pymongo import UpdateOne
+
+from analytics.result_cache import bumps
+from database.mongo_db import async_db, db
+from utils.sketch_store import CAS_RETRIES
+from utils.timestamp import utc_now_iso
+
+
+GRADE_STATS_COLLECTION = "student_grade_stats"
+
+# Bumped by every write to a stats document, so a concurrent recompute can tell it was overtaken
+NEXT_VERSION = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+
+def grade_stats_update(scores, submissions_made=0, updated_at=None):
+    # Pipeline update folding new submissions and/or first-time grades into a student's running stats.
+    # Only ever adds scores: a regrade can't lower minScore/maxScore this way, so regrades recompute instead.
+    changes = {
+        "submissionsMade": {"$add": [{"$ifNull": ["$submissionsMade", 0]}, submissions_made]},
+        "gradedCount": {"$add": [{"$ifNull": ["$gradedCount", 0]}, len(scores)]},
+        "scoreSum": {"$add": [{"$ifNull": ["$scoreSum", 0]}, sum(scores)]},
+        "updatedAt": updated_at or utc_now_iso(),
+        "version": NEXT_VERSION
+    }
+    if scores:
+        changes["minScore"] = {"$min": [{"$ifNull": ["$minScore", min(scores)]}, min(scores)]}
+        changes["maxScore"] = {"$max": [{"$ifNull": ["$maxScore", max(scores)]}, max(scores)]}
+    return [
+        {"$set": changes},
+        {
+            "$set": {
+                "averageScore": {
+                    "$cond": [{"$gt": ["$gradedCount", 0]}, {"$divide": ["$scoreSum", "$gradedCount"]}, None]
+                }
+            }
+        }
+    ]
+
+
+def submission_stats_operations(submissions):
+    # One upsert per student for a batch of newly inserted submissions
+    per_student = {}
+    for submission in submissions:
+        stats = per_student.setdefault(submission["studentId"], {"made": 0, "scores": []})
+        stats["made"] += 1
+        if submission.get("isGraded"):
+            stats["scores"].append(submission["score"])
+
+    updated_at = utc_now_iso()
+    return [
+        UpdateOne({"_id": student_id}, grade_stats_update(stats["scores"], stats["made"], updated_at), upsert=True)
+        for student_id, stats in per_student.items()
+    ]
+
+
+def graded_stats_operations(applied):
+    # For grades applied by grade_submissions: (upserts for first-time grades, students to recompute).
+    # A student with any regrade in the batch is recomputed outright, which also covers their new grades.
+    first_grades, regraded = {}, set()
+    for grade in applied:
+        previous = grade["previous"]
+        if previous.get("isGraded"):
+            regraded.add(previous["studentId"])
+        else:
+            first_grades.setdefault(previous["studentId"], []).append(grade["score"])
+
+    updated_at = utc_now_iso()
+    operations = [
+        UpdateOne({"_id": student_id}, grade_stats_update(scores, updated_at=updated_at), upsert=True)
+        for student_id, scores in first_grades.items() if student_id not in regraded
+    ]
+    return operations, sorted(regraded)
+
+
+def guarded_stats_merge(versions, recompute_id):
+    # $merge that only replaces a stats document still at the version read before the recompute
+    # (versions: {studentId: version}, missing means no document yet). Anything another writer folded
+    # in meanwhile is kept, and the caller finds that student without its recompute_id and retries.
+    expected = {
+        "$getField": {
+            "field": "version",
+            "input": {
+                "$first": {
+                    "$filter": {
+                        "input": {"$literal": [{"_id": key, "version": value} for key, value in versions.items()]},
+                        "cond": {"$eq": ["$$this._id", "$_id"]}
+                    }
+                }
+            }
+        }
+    }
+    replaced = {"$mergeObjects": ["$$new", {"version": NEXT_VERSION}]}
+    return {
+        "into": GRADE_STATS_COLLECTION,
+        "on": "_id",
+        "let": {"new": "$$ROOT", "expected": {"$ifNull": [expected, 0]}},
+        "whenMatched": [
+            {
+                "$replaceWith": {
+                    "$cond": [{"$eq": [{"$ifNull": ["$version", 0]}, "$$expected"]}, replaced, "$$ROOT"]
+                }
+            }
+        ],
+        "whenNotMatched": "insert"
+    }
+
+
+def student_grade_stats_pipeline(student_ids=None, versions=None, recompute_id=None):
+    match = [{"$match": {"studentId": {"$in": student_ids}}}] if student_ids is not None else []
+    graded = {"$eq": ["$isGraded", True]}
+    merge = {
+        "into": GRADE_STATS_COLLECTION,
+        "on": "_id",
+        "whenMatched": [{"$replaceWith": {"$mergeObjects": ["$$new", {"version": NEXT_VERSION}]}}],
+        "whenNotMatched": "insert"
+    }
+    if versions is not None:
+        merge = guarded_stats_merge(versions, recompute_id)
+    return match + [
+        {
+            "$group": {
+                "_id": "$studentId",
+                "submissionsMade": {"$sum": 1},
+                "gradedCount": {"$sum": {"$cond": [graded, 1, 0]}},
+                "scoreSum": {"$sum": {"$cond": [graded, "$score", 0]}},
+                # $min/$max skip the nulls left by ungraded submissions
+                "minScore": {"$min": {"$cond": [graded, "$score", None]}},
+                "maxScore": {"$max": {"$cond": [graded, "$score", None]}}
+            }
+        },
+        {
+            "$set": {
+                "averageScore": {
+                    "$cond": [{"$gt": ["$gradedCount", 0]}, {"$divide": ["$scoreSum", "$gradedCount"]}, None]
+                },
+                "updatedAt": {"$literal": utc_now_iso()},
+                "version": 1,  # inserts; a replaced document continues from its current version
+                "recomputedBy": recompute_id
+            }
+        },
+        {"$merge": merge}
+    ]
+
+
+@bumps(GRADE_STATS_COLLECTION)
+def refresh_student_grade_stats(student_ids=None):
+    # Recomputes the given (or every) student's stats from submissions
+    db["submissions"].aggregate(student_grade_stats_pipeline(student_ids))
+    if student_ids is None:
+        print("🔄 Student grade stats rebuilt for all students.")
+
+
+def _versions(documents):
+    return {doc["_id"]: doc.get("version", 0) for doc in documents}
+
+
+@bumps(GRADE_STATS_COLLECTION)
+def recompute_student_grade_stats(student_ids):
+    # Regrades can lower minScore/maxScore, so those students are recomputed from submissions instead of
+    # incremented. A first-time grade another writer folds in between the read and the $merge would be
+    # overwritten by a plain replace, so the $merge is guarded on version and overtaken students go again.
+    pending = list(student_ids)
+    for _ in range(CAS_RETRIES):
+        recompute_id = str(uuid.uuid4())
+        versions = _versions(db[GRADE_STATS_COLLECTION].find({"_id": {"$in": pending}}, {"version": 1}))
+        db["submissions"].aggregate(student_grade_stats_pipeline(pending, versions, recompute_id))
+        pending = db[GRADE_STATS_COLLECTION].distinct("_id", {"_id": {"$in": pending}, "recomputedBy": {"$ne": recompute_id}})
+        if not pending:
+            return True
+    print(f"⚠️ Gave up recomputing grade stats for {len(pending)} student(s); run python -m analytics.grade_stats to repair.")
+    return False
+
+
+@bumps(GRADE_STATS_COLLECTION)
+async def arecompute_student_grade_stats(student_ids):
+    pending = list(student_ids)
+    for _ in range(CAS_RETRIES):
+        recompute_id = str(uuid.uuid4())
+        versions = _versions(await async_db[GRADE_STATS_COLLECTION].find({"_id": {"$in": pending}}, {"version": 1}).to_list())
+        await (await async_db["submissions"].aggregate(student_grade_stats_pipeline(pending, versions, recompute_id))).to_list()
+        pending = await async_db[GRADE_STATS_COLLECTION].distinct(
+            "_id", {"_id": {"$in": pending}, "recomputedBy": {"$ne": recompute_id}}
+        )
+        if not pending:
+            return True
+    print(f"⚠️ Gave up recomputing grade stats for {len(pending)} student(s); run python -m analytics.grade_stats to repair.")
+    return False
+
+
+@bumps(GRADE_STATS_COLLECTION)
+def record_submissions(submissions):
+    operations = submission_stats_operations(submissions)
+    if operations:
+        db[GRADE_STATS_COLLECTION].bulk_write(operations, ordered=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the student_grade_stats collection from submissions.")
+    parser.parse_args(argv)
+
+    refresh_student_grade_stats()
+
+
+if __name__ == "__main__":
+    main()
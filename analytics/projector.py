@@ -0,0 +1,485 @@
+import argparse
+
+from bson.timestamp import Timestamp
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from database.indexes import INDEXES
+from database.mongo_db import db, get_client
+from utils.bulk import bulk_insert
+from utils.results import as_results
+from utils.timestamp import utc_now_iso
+
+
+STATE_ID = "projector"
+WATCHED = ["enrollments", "courses", "submissions"]
+PROJECTIONS = ["course_projection", "instructor_students", "instructor_stats", "student_engagement"]
+
+# Raised by the server when a stored resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+# Raised when a snapshot read asks for a cluster time older than the server keeps history for
+SNAPSHOT_TOO_OLD = 239
+
+
+def enable_pre_images():
+    # Deletes only carry the _id; pre-images let the projector see which course/student a deleted document counted toward,
+    # and post-images give every update the document as it was right after that event
+    for name in WATCHED:
+        db.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+
+
+def course_projection_pipeline(course_ids=None):
+    match = [{"$match": {"courseId": {"$in": course_ids}}}] if course_ids is not None else []
+    return match + [
+        {
+            "$lookup": {
+                "from": "enrollments",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "let": {"price": "$price"},
+                "pipeline": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "n": {"$sum": 1},
+                            "revenue": {"$sum": {"$ifNull": ["$pricePaid", "$$price"]}}
+                        }
+                    }
+                ],
+                "as": "enrolled"
+            }
+        },
+        {
+            "$project": {
+                "_id": "$courseId",
+                "instructorId": 1,
+                "price": 1,
+                "enrollments": {"$ifNull": [{"$first": "$enrolled.n"}, 0]},
+                "revenue": {"$ifNull": [{"$first": "$enrolled.revenue"}, 0.0]}
+            }
+        }
+    ]
+
+
+def merge_into(collection):
+    return {"$merge": {"into": collection, "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+
+def instructor_students_pipeline(course_ids=None, courses="course_projection", into="instructor_students"):
+    # One document per (instructor, student) holding how many of the instructor's courses the student takes;
+    # the distinct-student counter moves only when that reference count crosses zero.
+    # `courses` is course_projection, or the courses collection itself for a snapshot rebuild.
+    match = [{"$match": {"courseId": {"$in": course_ids}}}] if course_ids is not None else []
+    stages = match + [
+        {
+            "$lookup": {
+                "from": courses,
+                "localField": "courseId",
+                "foreignField": "_id" if courses == "course_projection" else "courseId",
+                "as": "course"
+            }
+        },
+        {"$unwind": "$course"},
+        {
+            "$group": {
+                "_id": {"instructorId": "$course.instructorId", "studentId": "$studentId"},
+                "enrollments": {"$sum": 1}
+            }
+        }
+    ]
+    return stages + [merge_into(into)] if into else stages
+
+
+def instructor_stats_pipeline(instructor_ids=None, students="instructor_students", into="instructor_stats"):
+    # Runs on course_projection: enrollments and revenue per course, unioned with distinct-student counts
+    match = [{"$match": {"instructorId": {"$in": instructor_ids}}}] if instructor_ids is not None else []
+    students_match = (
+        [{"$match": {"_id.instructorId": {"$in": instructor_ids}}}] if instructor_ids is not None else []
+    )
+    return match + [
+        {
+            "$project": {
+                "instructorId": 1,
+                "enrollments": 1,
+                "revenue": 1,
+                "students": {"$literal": 0}
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": students,
+                "pipeline": students_match + [
+                    {"$group": {"_id": "$_id.instructorId", "students": {"$sum": 1}}},
+                    {"$project": {"instructorId": "$_id", "enrollments": {"$literal": 0},
+                                  "revenue": {"$literal": 0.0}, "students": 1}}
+                ]
+            }
+        },
+        {
+            "$group": {
+                "_id": "$instructorId",
+                "students": {"$sum": "$students"},
+                "enrollments": {"$sum": "$enrollments"},
+                "revenue": {"$sum": "$revenue"}
+            }
+        },
+        merge_into(into)
+    ]
+
+
+def student_engagement_pipeline(student_ids=None):
+    match = [{"$match": {"studentId": {"$in": student_ids}}}] if student_ids is not None else []
+    return match + [
+        {
+            "$group": {
+                "_id": "$studentId",
+                "submissionsMade": {"$sum": 1},
+                "scoreSum": {"$sum": "$score"},
+                "scoreCount": {"$sum": {"$cond": [{"$isNumber": "$score"}, 1, 0]}}
+            }
+        },
+        {
+            "$set": {
+                "averageScore": {
+                    "$cond": [
+                        {"$gt": ["$scoreCount", 0]},
+                        {"$round": [{"$divide": ["$scoreSum", "$scoreCount"]}, 2]},
+                        None
+                    ]
+                }
+            }
+        }
+    ]
+
+
+def rebuilding(name):
+    return f"{name}_rebuild"
+
+
+def rebuild_projections():
+    # Initial sync, or recovery after the stored resume token fell off the oplog. Every source is read at one
+    # cluster time (snapshot reads can't $merge, so rows are inserted from here) into side collections that are
+    # then renamed over the live ones, so dashboards never read a half-built projection.
+    # Returns that cluster time: changes up to and including it are already counted.
+    at = db.command("ping")["operationTime"]
+    snapshot = {"readConcern": {"level": "snapshot", "atClusterTime": at}}
+
+    for name in PROJECTIONS:
+        db[rebuilding(name)].drop()
+        db.create_collection(rebuilding(name))
+        if INDEXES.get(name):
+            db[rebuilding(name)].create_indexes(INDEXES[name])
+
+    bulk_insert(db[rebuilding("course_projection")], db["courses"].aggregate(course_projection_pipeline(), **snapshot))
+    bulk_insert(
+        db[rebuilding("instructor_students")],
+        db["enrollments"].aggregate(instructor_students_pipeline(courses="courses", into=None), **snapshot)
+    )
+    bulk_insert(db[rebuilding("student_engagement")], db["submissions"].aggregate(student_engagement_pipeline(), **snapshot))
+    db[rebuilding("course_projection")].aggregate(
+        instructor_stats_pipeline(students=rebuilding("instructor_students"), into=rebuilding("instructor_stats"))
+    )
+
+    for name in PROJECTIONS:
+        db[rebuilding(name)].rename(name, dropTarget=True)
+    print("🧮 Instructor and student projections rebuilt.")
+    return at
+
+
+def rebuild_instructors(instructor_ids, at):
+    # Recomputes a few instructors from scratch; used when a course changes hands or is deleted.
+    # Sources are read at `at`, the cluster time of the last event applied: enrollments the stream hasn't
+    # delivered yet are left for _apply_enrollment, instead of being counted here and again there.
+    instructor_ids = sorted(set(instructor_ids))
+    snapshot = {"readConcern": {"level": "snapshot", "atClusterTime": at}}
+    course_ids = [
+        course["courseId"]
+        for course in db["courses"].aggregate(
+            [{"$match": {"instructorId": {"$in": instructor_ids}}}, {"$project": {"_id": 0, "courseId": 1}}], **snapshot
+        )
+    ]
+    pairs = list(db["enrollments"].aggregate(instructor_students_pipeline(course_ids, courses="courses", into=None), **snapshot))
+
+    db["instructor_students"].delete_many({"_id.instructorId": {"$in": instructor_ids}})
+    if pairs:
+        db["instructor_students"].insert_many(pairs)
+    db["instructor_stats"].delete_many({"_id": {"$in": instructor_ids}})
+    # course_projection is only written by this process, so it is still exactly at `at`
+    db["course_projection"].aggregate(instructor_stats_pipeline(instructor_ids))
+
+
+def drain_stale_instructors():
+    # Instructors queued by apply_event in the same transaction as the resume token, so a crash before
+    # the recompute finishes leaves them queued for the next start instead of losing them
+    state = db["projector_state"].find_one({"_id": STATE_ID}, {"staleInstructors": 1, "appliedThrough": 1}) or {}
+    stale = state.get("staleInstructors") or []
+    if stale:
+        rebuild_instructors(stale, state["appliedThrough"])
+        db["projector_state"].update_one({"_id": STATE_ID}, {"$pullAll": {"staleInstructors": stale}})
+
+
+def _course_projection(course_id, session):
+    projection = db["course_projection"].find_one({"_id": course_id}, session=session)
+    if projection:
+        return projection
+
+    course = db["courses"].find_one({"courseId": course_id}, {"instructorId": 1, "price": 1}, session=session)
+    if not course:
+        return None
+
+    projection = {
+        "_id": course_id,
+        "instructorId": course["instructorId"],
+        "price": course["price"],
+        "enrollments": 0,
+        "revenue": 0.0
+    }
+    db["course_projection"].insert_one(projection, session=session)
+    return projection
+
+
+def _apply_enrollment(enrollment, sign, session):
+    course = _course_projection(enrollment["courseId"], session)
+    if not course:
+        print(f"⚠️ Enrollment {enrollment['enrollmentId']} references unknown course {enrollment['courseId']}.")
+        return
+
+    instructor_id = course["instructorId"]
+    # pricePaid is snapshotted at enrollment time; older enrollments without it fall back to the list price
+    paid = enrollment.get("pricePaid", course["price"])
+    db["course_projection"].update_one(
+        {"_id": course["_id"]},
+        {"$inc": {"enrollments": sign, "revenue": sign * paid}},
+        session=session
+    )
+
+    pair = db["instructor_students"].find_one_and_update(
+        {"_id": {"instructorId": instructor_id, "studentId": enrollment["studentId"]}},
+        {"$inc": {"enrollments": sign}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    new_student = sign > 0 and pair["enrollments"] == 1
+    lost_student = sign < 0 and pair["enrollments"] <= 0
+    if lost_student:
+        db["instructor_students"].delete_one({"_id": pair["_id"]}, session=session)
+
+    db["instructor_stats"].update_one(
+        {"_id": instructor_id},
+        {
+            "$inc": {
+                "enrollments": sign,
+                "revenue": sign * paid,
+                "students": int(new_student) - int(lost_student)
+            }
+        },
+        upsert=True,
+        session=session
+    )
+
+
+def _apply_course(event, session):
+    # Returns instructors that need a full recompute (course moved to another instructor, or deleted)
+    if event["operationType"] == "delete":
+        course = event.get("fullDocumentBeforeChange")
+        if not course:
+            return []
+        db["course_projection"].delete_one({"_id": course["courseId"]}, session=session)
+        return [course["instructorId"]]
+
+    course = event.get("fullDocument")
+    if not course:
+        return []
+
+    projection = db["course_projection"].find_one({"_id": course["courseId"]}, session=session)
+    if not projection:
+        db["course_projection"].insert_one(
+            {
+                "_id": course["courseId"],
+                "instructorId": course["instructorId"],
+                "price": course["price"],
+                "enrollments": 0,
+                "revenue": 0.0
+            },
+            session=session
+        )
+        return []
+
+    if course["instructorId"] != projection["instructorId"]:
+        db["course_projection"].update_one(
+            {"_id": course["courseId"]},
+            {"$set": {"instructorId": course["instructorId"], "price": course["price"]}},
+            session=session
+        )
+        return [projection["instructorId"], course["instructorId"]]
+
+    if course["price"] != projection["price"]:
+        # Only future enrollments pay the new price; revenue already booked is unchanged
+        db["course_projection"].update_one({"_id": course["courseId"]}, {"$set": {"price": course["price"]}}, session=session)
+    return []
+
+
+def _apply_submission(submission, sign, session):
+    score = submission.get("score")
+    db["student_engagement"].update_one(
+        {"_id": submission["studentId"]},
+        [
+            {
+                "$set": {
+                    "submissionsMade": {"$add": [{"$ifNull": ["$submissionsMade", 0]}, sign]},
+                    "scoreSum": {"$add": [{"$ifNull": ["$scoreSum", 0]}, sign * (score or 0)]},
+                    "scoreCount": {"$add": [{"$ifNull": ["$scoreCount", 0]}, sign * int(score is not None)]}
+                }
+            },
+            {
+                "$set": {
+                    "averageScore": {
+                        "$cond": [
+                            {"$gt": ["$scoreCount", 0]},
+                            {"$round": [{"$divide": ["$scoreSum", "$scoreCount"]}, 2]},
+                            None
+                        ]
+                    }
+                }
+            }
+        ],
+        upsert=True,
+        session=session
+    )
+
+
+def apply_event(event, session):
+    # Runs inside one transaction together with the resume-token write, so a restart never applies an event twice
+    collection = event["ns"]["coll"]
+    operation = event["operationType"]
+    before = event.get("fullDocumentBeforeChange")
+    after = event.get("fullDocument")
+    rebuild = []
+
+    if collection == "courses":
+        rebuild = _apply_course(event, session)
+    elif collection == "enrollments":
+        # Updates only touch status/progress, which no projection counts
+        if operation == "insert":
+            _apply_enrollment(after, 1, session)
+        elif operation == "delete" and before:
+            _apply_enrollment(before, -1, session)
+        elif operation == "delete":
+            print("⚠️ Enrollment deleted without a pre-image; run with --rebuild to resync.")
+    elif collection == "submissions":
+        if operation != "insert" and not before:
+            print("⚠️ Submission changed without a pre-image; run with --rebuild to resync.")
+        else:
+            if before:
+                _apply_submission(before, -1, session)
+            if after and operation != "delete":
+                _apply_submission(after, 1, session)
+
+    state_update = {
+        "$set": {"resumeToken": event["_id"], "appliedThrough": event["clusterTime"], "updatedAt": utc_now_iso()}
+    }
+    if rebuild:
+        state_update["$addToSet"] = {"staleInstructors": {"$each": rebuild}}
+    db["projector_state"].update_one({"_id": STATE_ID}, state_update, upsert=True, session=session)
+    return rebuild
+
+
+def run_projector(rebuild=False):
+    # Requires a replica set (change streams, transactions) and MongoDB 6.0+ (pre-images)
+    state = db["projector_state"].find_one({"_id": STATE_ID}) or {}
+    token = state.get("resumeToken")
+
+    if rebuild or token is None:
+        enable_pre_images()
+        at = rebuild_projections()
+        # The rebuild counted everything up to `at`; the stream takes over strictly after it
+        options = {"start_at_operation_time": Timestamp(at.time, at.inc + 1)}
+        db["projector_state"].update_one({"_id": STATE_ID}, {"$unset": {"staleInstructors": ""}})
+        applied_at, pending = at, False
+    else:
+        options = {"resume_after": token}
+        applied_at, pending = state.get("appliedThrough"), bool(state.get("staleInstructors"))
+
+    pipeline = [{"$match": {"ns.coll": {"$in": WATCHED}, "operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+
+    try:
+        with get_client().start_session() as session, db.watch(
+            pipeline,
+            full_document="required",
+            full_document_before_change="whenAvailable",
+            **options
+        ) as stream:
+            print(f"👀 Projector watching {', '.join(WATCHED)}.")
+            while stream.alive:
+                event = stream.try_next()
+                # Recount once every event at applied_at is in (a transaction's events share one clusterTime)
+                # and before any later one, so the projections and the snapshot read agree
+                if pending and (event is None or event["clusterTime"] != applied_at):
+                    drain_stale_instructors()
+                    pending = False
+                if event is None:
+                    continue
+                pending = bool(session.with_transaction(lambda s: apply_event(event, s))) or pending
+                applied_at = event["clusterTime"]
+    except OperationFailure as e:
+        if e.code == CHANGE_STREAM_HISTORY_LOST:
+            print("❌ Resume token is no longer in the oplog; restart with --rebuild.")
+        elif e.code == SNAPSHOT_TOO_OLD:
+            print("❌ Queued instructor recomputes are older than the server's snapshot history; restart with --rebuild.")
+        else:
+            raise
+    except KeyboardInterrupt:
+        print("\n🛑 Projector stopped; it will resume from the stored token.")
+
+
+def instructor_dashboard(materialize=False, batch_size=None):
+    results = db["instructor_stats"].aggregate([
+        {"$sort": {"revenue": -1}},
+        {
+            "$project": {
+                "_id": 0,
+                "instructorId": "$_id",
+                "totalStudents": "$students",
+                "enrollments": 1,
+                "totalRevenue": {"$round": ["$revenue", 2]}
+            }
+        }
+    ])
+    return as_results(results, materialize, batch_size)
+
+
+def student_engagement(materialize=False, batch_size=None):
+    results = db["student_engagement"].aggregate([
+        {"$sort": {"submissionsMade": -1}},
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "_id",
+                "foreignField": "userId",
+                "as": "student_info"
+            }
+        },
+        {"$unwind": "$student_info"},
+        {
+            "$project": {
+                "studentId": "$_id",
+                "name": {"$concat": ["$student_info.firstName", " ", "$student_info.lastName"]},
+                "submissionsMade": 1,
+                "averageScore": 1
+            }
+        }
+    ])
+    return as_results(results, materialize, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Project enrollment/course/submission changes into dashboard collections.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every projection before streaming")
+    args = parser.parse_args(argv)
+
+    run_projector(rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict
+
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from pymongo.errors import PyMongoError
+
+from database.mongo_db import db
+from utils.cache import TTLCache
+from utils.results import as_results
+
+
+RESULT_CACHE_SIZE = int(os.environ.get("EDUHUB_RESULT_CACHE_SIZE", 256))
+# Upper bound on an entry's age even if no write is seen (e.g. writes from processes without a version watcher)
+RESULT_CACHE_MAX_AGE = float(os.environ.get("EDUHUB_RESULT_CACHE_MAX_AGE", 300))
+
+result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_MAX_AGE)
+
+_versions = defaultdict(int)
+_versions_lock = threading.Lock()
+_refreshing = set()
+
+
+def bump(*collections):
+    # Any write to a collection makes every cached result that read it stale
+    with _versions_lock:
+        for name in collections:
+            _versions[name] += 1
+
+
+def bumps(*collections):
+    # Decorator for (sync or async) write functions: bumps the collections they write once they return (or raise)
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    bump(*collections)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            finally:
+                bump(*collections)
+        return wrapper
+    return decorate
+
+
+def versions(collections):
+    with _versions_lock:
+        return tuple(_versions[name] for name in collections)
+
+
+def pipeline_collections(collection, pipeline):
+    # The source collection plus everything pulled in by $lookup / $unionWith / $graphLookup, at any depth
+    found = {collection}
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ("$lookup", "$graphLookup") and isinstance(value, dict) and "from" in value:
+                    found.add(value["from"])
+                elif key == "$unionWith":
+                    found.add(value if isinstance(value, str) else value["coll"])
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(pipeline)
+    return tuple(sorted(found))
+
+
+def fingerprint(collection, pipeline):
+    canonical = json_util.dumps([collection, pipeline], json_options=CANONICAL_JSON_OPTIONS, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _compute(key, collection, pipeline, depends_on):
+    # Versions are read before running, so a write that lands mid-aggregation leaves the entry stale
+    seen = versions(depends_on)
+    rows = list(db[collection].aggregate(pipeline))
+    result_cache.set(key, (seen, rows))
+    return rows
+
+
+def _refresh_in_background(key, collection, pipeline, depends_on):
+    with _versions_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            _compute(key, collection, pipeline, depends_on)
+        except PyMongoError as e:
+            print(f"⚠️ Background refresh of a cached aggregation failed: {e}")
+        finally:
+            with _versions_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def cached_aggregate(collection, pipeline, stale_while_revalidate=False):
+    depends_on = pipeline_collections(collection, pipeline)
+    key = fingerprint(collection, pipeline)
+
+    entry = result_cache.peek(key)
+    if entry is not None:
+        seen, rows = entry
+        if seen == versions(depends_on):
+            return rows
+        if stale_while_revalidate:
+            # Serve the previous result now; the next call gets the recomputed one
+            _refresh_in_background(key, collection, pipeline, depends_on)
+            return rows
+
+    return _compute(key, collection, pipeline, depends_on)
+
+
+def aggregate_results(collection, pipeline, materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    # Drop-in for db[collection].aggregate + as_results; cache=True serves repeats from memory
+    if not cache:
+        return as_results(db[collection].aggregate(pipeline), materialize, batch_size)
+
+    rows = copy.deepcopy(cached_aggregate(collection, pipeline, stale_while_revalidate))
+    return rows if materialize else iter(rows)
+
+
+def watch_versions():
+    # Bumps versions for writes from any process (needs a replica set). On a stream error nothing is known
+    # about the missed writes, so the whole cache is dropped before reconnecting.
+    while True:
+        try:
+            with db.watch([{"$project": {"ns": 1}}]) as stream:
+                for event in stream:
+                    name = event.get("ns", {}).get("coll")
+                    if name:
+                        bump(name)
+        except PyMongoError as e:
+            print(f"⚠️ Result-cache version watcher lost its change stream: {e}")
+            result_cache.clear()
+            time.sleep(1)
+
+
+def start_version_watcher():
+    thread = threading.Thread(target=watch_versions, daemon=True, name="result-cache-versions")
+    thread.start()
+    return thread
+
+
+def result_cache_stats():
+    return result_cache.stats()
@@ -0,0 +1,210 @@
+import argparse
+
+from analytics.result_cache import bumps
+from database.mongo_db import async_db, db
+from utils.sketch_store import areplace_sketch, aupdate_sketch, replace_sketch, update_sketch, write_sketch
+from utils.tdigest import TDigest
+from utils.timestamp import utc_now_iso
+
+
+# One t-digest per document, _id = assignmentId / courseId. Assignment sketches hold scores in points;
+# course sketches hold percent of each assignment's maxScore, so assignments with different maxScores combine.
+ASSIGNMENT_SKETCHES = "assignment_score_sketches"
+COURSE_SKETCHES = "course_score_sketches"
+
+
+def read_digest(document):
+    return TDigest.from_document(document["digest"]) if document else TDigest()
+
+
+def dump_digest(digest):
+    return {"digest": digest.to_document()}
+
+
+def update_digest(collection, key, change):
+    return update_sketch(collection, key, change, read_digest, dump_digest)
+
+
+async def aupdate_digest(collection, key, change):
+    return await aupdate_sketch(collection, key, change, read_digest, dump_digest)
+
+
+def adding(values):
+    def change(digest):
+        digest.update(values)
+        return digest
+    return change
+
+
+def sketch_changes(applied):
+    # For grades applied by grade_submissions: first-time scores to add per assignment / course, plus
+    # the assignments and courses to rebuild. A t-digest can't forget a value, so a regrade rebuilds.
+    assignment_scores, course_scores = {}, {}
+    rebuild_assignments, rebuild_courses = set(), set()
+    for grade in applied:
+        previous = grade["previous"]
+        if previous.get("isGraded"):
+            rebuild_assignments.add(previous["assignmentId"])
+            rebuild_courses.add(previous.get("courseId"))
+            continue
+        assignment_scores.setdefault(previous["assignmentId"], []).append(grade["score"])
+        course_scores.setdefault(previous.get("courseId"), []).append(grade["score"] * 100 / previous["maxScore"])
+
+    assignment_scores = {key: scores for key, scores in assignment_scores.items() if key not in rebuild_assignments}
+    course_scores = {key: scores for key, scores in course_scores.items() if key is not None and key not in rebuild_courses}
+    rebuild_courses.discard(None)
+    return assignment_scores, course_scores, sorted(rebuild_assignments), sorted(rebuild_courses)
+
+
+def graded_scores_query(assignment_id):
+    return {"assignmentId": assignment_id, "isGraded": True, "score": {"$type": "int"}}
+
+
+def assignment_digest(assignment_id):
+    digest = TDigest()
+    digest.update(doc["score"] for doc in db["submissions"].find(graded_scores_query(assignment_id), {"_id": 0, "score": 1}))
+    return digest
+
+
+async def aassignment_digest(assignment_id):
+    digest = TDigest()
+    async for doc in async_db["submissions"].find(graded_scores_query(assignment_id), {"_id": 0, "score": 1}):
+        digest.add(doc["score"])
+    return digest
+
+
+def course_digest(assignments, sketches):
+    # Merge of the course's assignment sketches, each rescaled to percent of its maxScore
+    digest = TDigest()
+    for assignment in assignments:
+        sketch = sketches.get(assignment["assignmentId"])
+        if sketch and assignment.get("maxScore"):
+            digest.merge(read_digest(sketch).scaled(100 / assignment["maxScore"]))
+    return digest
+
+
+def rebuild_course_sketch(course_id):
+    def build():
+        assignments = list(db["assignments"].find({"courseId": course_id}, {"_id": 0, "assignmentId": 1, "maxScore": 1}))
+        ids = [assignment["assignmentId"] for assignment in assignments]
+        sketches = {doc["_id"]: doc for doc in db[ASSIGNMENT_SKETCHES].find({"_id": {"$in": ids}})}
+        return course_digest(assignments, sketches)
+    replace_sketch(db[COURSE_SKETCHES], course_id, build, dump_digest)
+
+
+async def arebuild_course_sketch(course_id):
+    async def build():
+        assignments = await async_db["assignments"].find(
+            {"courseId": course_id}, {"_id": 0, "assignmentId": 1, "maxScore": 1}
+        ).to_list()
+        ids = [assignment["assignmentId"] for assignment in assignments]
+        sketches = {doc["_id"]: doc for doc in await async_db[ASSIGNMENT_SKETCHES].find({"_id": {"$in": ids}}).to_list()}
+        return course_digest(assignments, sketches)
+    await areplace_sketch(async_db[COURSE_SKETCHES], course_id, build, dump_digest)
+
+
+@bumps(ASSIGNMENT_SKETCHES, COURSE_SKETCHES)
+def update_score_sketches(applied):
+    assignment_scores, course_scores, rebuild_assignments, rebuild_courses = sketch_changes(applied)
+    for assignment_id, scores in assignment_scores.items():
+        update_digest(db[ASSIGNMENT_SKETCHES], assignment_id, adding(scores))
+    for course_id, scores in course_scores.items():
+        update_digest(db[COURSE_SKETCHES], course_id, adding(scores))
+
+    for assignment_id in rebuild_assignments:
+        replace_sketch(db[ASSIGNMENT_SKETCHES], assignment_id, lambda: assignment_digest(assignment_id), dump_digest)
+    for course_id in rebuild_courses:
+        rebuild_course_sketch(course_id)
+
+
+@bumps(ASSIGNMENT_SKETCHES, COURSE_SKETCHES)
+async def aupdate_score_sketches(applied):
+    assignment_scores, course_scores, rebuild_assignments, rebuild_courses = sketch_changes(applied)
+    for assignment_id, scores in assignment_scores.items():
+        await aupdate_digest(async_db[ASSIGNMENT_SKETCHES], assignment_id, adding(scores))
+    for course_id, scores in course_scores.items():
+        await aupdate_digest(async_db[COURSE_SKETCHES], course_id, adding(scores))
+
+    for assignment_id in rebuild_assignments:
+        await areplace_sketch(
+            async_db[ASSIGNMENT_SKETCHES], assignment_id, lambda: aassignment_digest(assignment_id), dump_digest
+        )
+    for course_id in rebuild_courses:
+        await arebuild_course_sketch(course_id)
+
+
+@bumps(ASSIGNMENT_SKETCHES, COURSE_SKETCHES)
+def rebuild_score_sketches():
+    # Full rebuild: one pass over graded submissions (sorted by assignment, so one digest is open at a time),
+    # then each course's sketch merged from its assignments'. Sketches are replaced in place, guarded on the
+    # versions read before the pass; one a concurrent grade moved since is re-derived on its own.
+    started = utc_now_iso()
+    versions = {doc["_id"]: doc for doc in db[ASSIGNMENT_SKETCHES].find({}, {"version": 1})}
+
+    def flush(assignment_id, digest):
+        if not write_sketch(db[ASSIGNMENT_SKETCHES], assignment_id, versions.get(assignment_id), dump_digest(digest)):
+            replace_sketch(db[ASSIGNMENT_SKETCHES], assignment_id, lambda: assignment_digest(assignment_id), dump_digest)
+
+    cursor = db["submissions"].find(
+        {"isGraded": True, "score": {"$type": "int"}}, {"_id": 0, "assignmentId": 1, "score": 1}
+    ).sort("assignmentId", 1)
+    current, digest = None, None
+    for submission in cursor:
+        if submission["assignmentId"] != current:
+            if current is not None:
+                flush(current, digest)
+            current, digest = submission["assignmentId"], TDigest()
+        digest.add(submission["score"])
+    if current is not None:
+        flush(current, digest)
+
+    for course_id in db["assignments"].distinct("courseId"):
+        rebuild_course_sketch(course_id)
+
+    # Whatever neither the rebuild nor a concurrent grade wrote since it started has no graded scores left
+    db[ASSIGNMENT_SKETCHES].delete_many({"updatedAt": {"$lt": started}})
+    db[COURSE_SKETCHES].delete_many({"updatedAt": {"$lt": started}})
+    print("🧮 Score sketches rebuilt from submissions.")
+
+
+def quantile_summary(document, percentiles):
+    if not document:
+        return None
+    digest = read_digest(document)
+    return {
+        "count": digest.count,
+        "min": digest.min,
+        "max": digest.max,
+        "percentiles": {f"p{p:g}": digest.quantile(p / 100) for p in percentiles}
+    }
+
+
+def assignment_score_quantiles(assignment_id: str, percentiles=(50, 90)):
+    # Percentiles in points; constant time, since a sketch holds a bounded number of centroids
+    return quantile_summary(db[ASSIGNMENT_SKETCHES].find_one({"_id": assignment_id}), percentiles)
+
+
+def course_score_quantiles(course_id: str, percentiles=(50, 90)):
+    # Percentiles in percent of maxScore
+    return quantile_summary(db[COURSE_SKETCHES].find_one({"_id": course_id}), percentiles)
+
+
+def merged_score_quantiles(assignment_ids, percentiles=(50, 90)):
+    # Percentiles across several assignments, in percent of maxScore
+    assignments = list(db["assignments"].find(
+        {"assignmentId": {"$in": list(assignment_ids)}}, {"_id": 0, "assignmentId": 1, "maxScore": 1}
+    ))
+    sketches = {doc["_id"]: doc for doc in db[ASSIGNMENT_SKETCHES].find({"_id": {"$in": list(assignment_ids)}})}
+    digest = course_digest(assignments, sketches)
+    return quantile_summary({"digest": digest.to_document()}, percentiles) if digest.count else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the per-assignment and per-course score sketches.")
+    parser.parse_args(argv)
+
+    rebuild_score_sketches()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+
+from analytics.course_stats import WATERMARK_LAG
+from analytics.result_cache import bumps
+from database.mongo_db import db
+from utils.hyperloglog import HyperLogLog
+from utils.sketch_store import update_sketch
+from utils.timestamp import utc_now_iso
+
+
+# HyperLogLog of distinct enrolled students, _id = courseId / instructorId. Each document carries the
+# sketch as compact binary plus its current estimate, so ranking instructors is an indexed sort.
+COURSE_STUDENT_SKETCHES = "course_student_sketches"
+INSTRUCTOR_STUDENT_SKETCHES = "instructor_student_sketches"
+STATE_ID = "student_reach"
+
+
+def read_hll(document):
+    return HyperLogLog.from_bytes(document["sketch"]) if document else HyperLogLog()
+
+
+def dump_hll(sketch):
+    return {"sketch": sketch.to_bytes(), "estimate": sketch.count()}
+
+
+def adding(student_ids):
+    def change(sketch):
+        sketch.update(student_ids)
+        return sketch
+    return change
+
+
+def reach_changes(enrollments):
+    # Student ids to add per course and per instructor. Adding a student twice is a no-op for an HLL,
+    # so the watermark overlap re-reading a few enrollments is harmless.
+    per_course, per_instructor = {}, {}
+    for enrollment in enrollments:
+        per_course.setdefault(enrollment["courseId"], []).append(enrollment["studentId"])
+        if enrollment.get("instructorId"):
+            per_instructor.setdefault(enrollment["instructorId"], []).append(enrollment["studentId"])
+    return per_course, per_instructor
+
+
+def _set_watermark(watermark):
+    db["analytics_state"].update_one({"_id": STATE_ID}, {"$set": {"watermark": watermark}}, upsert=True)
+
+
+@bumps(COURSE_STUDENT_SKETCHES, INSTRUCTOR_STUDENT_SKETCHES)
+def refresh_student_reach(full=False):
+    # Periodic job, like refresh_course_enrollment_stats: folds enrollments made since the last watermark into
+    # the sketches, one read-modify-write per touched course/instructor per run instead of per enrollment.
+    # full=True, or a first run with no watermark, rebuilds everything.
+    state = db["analytics_state"].find_one({"_id": STATE_ID}) or {}
+    if full or state.get("watermark") is None:
+        return rebuild_student_reach()
+
+    started = utc_now_iso()
+    enrollments = db["enrollments"].find(
+        {"enrolledAt": {"$gte": state["watermark"]}}, {"_id": 0, "studentId": 1, "courseId": 1, "instructorId": 1}
+    )
+    per_course, per_instructor = reach_changes(enrollments)
+    for course_id, student_ids in per_course.items():
+        update_sketch(db[COURSE_STUDENT_SKETCHES], course_id, adding(student_ids), read_hll, dump_hll)
+    for instructor_id, student_ids in per_instructor.items():
+        update_sketch(db[INSTRUCTOR_STUDENT_SKETCHES], instructor_id, adding(student_ids), read_hll, dump_hll)
+
+    _set_watermark(started - WATERMARK_LAG)
+    print(f"🧮 Student reach sketches refreshed for {len(per_course)} course(s) and {len(per_instructor)} instructor(s).")
+
+
+def _rebuild(collection, group_field, started):
+    # Walks the (group_field, studentId) index in order, so only one sketch is held in memory at a time.
+    # Each sketch is replaced in place through the compare-and-swap, so readers never see it missing and a
+    # racing refresh that inserts the same _id first is retried instead of failing the rebuild.
+    def flush(key, sketch):
+        update_sketch(db[collection], key, lambda _: sketch, read_hll, dump_hll)
+
+    cursor = db["enrollments"].find(
+        {group_field: {"$ne": None}}, {"_id": 0, group_field: 1, "studentId": 1}
+    ).sort([(group_field, 1), ("studentId", 1)])
+
+    current, sketch, written = None, None, 0
+    for enrollment in cursor:
+        if enrollment[group_field] != current:
+            if current is not None:
+                flush(current, sketch)
+                written += 1
+            current, sketch = enrollment[group_field], HyperLogLog()
+        sketch.add(enrollment["studentId"])
+    if current is not None:
+        flush(current, sketch)
+        written += 1
+
+    # Courses/instructors with no enrollments left weren't rewritten
+    db[collection].delete_many({"updatedAt": {"$lt": started}})
+    return written
+
+
+@bumps(COURSE_STUDENT_SKETCHES, INSTRUCTOR_STUDENT_SKETCHES)
+def rebuild_student_reach():
+    # Sketches only grow, so deleted enrollments and reassigned courses are reflected after a rebuild
+    started = utc_now_iso()
+    courses = _rebuild(COURSE_STUDENT_SKETCHES, "courseId", started)
+    instructors = _rebuild(INSTRUCTOR_STUDENT_SKETCHES, "instructorId", started)
+    _set_watermark(started - WATERMARK_LAG)
+    print(f"🧮 Student reach sketches rebuilt for {courses} course(s) and {instructors} instructor(s).")
+
+
+def approximate_students_per_instructor_pipeline():
+    # Same output shape as total_students_per_instructor_pipeline, read from the sketches' stored estimates
+    return [
+        {"$sort": {"estimate": -1}},
+        {"$project": {"_id": 0, "instructorId": "$_id", "totalStudents": "$estimate"}}
+    ]
+
+
+def distinct_students(course_ids=None, instructor_ids=None):
+    # Approximate distinct students across any set of courses and/or instructors (the union, not the sum)
+    union = HyperLogLog()
+    for collection, ids in ((COURSE_STUDENT_SKETCHES, course_ids), (INSTRUCTOR_STUDENT_SKETCHES, instructor_ids)):
+        if ids:
+            for document in db[collection].find({"_id": {"$in": list(ids)}}, {"sketch": 1}):
+                union.merge(read_hll(document))
+    return union.count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the per-course and per-instructor student HyperLogLogs.")
+    parser.add_argument("--full", action="store_true", help="rebuild every sketch instead of adding new enrollments")
+    args = parser.parse_args(argv)
+
+    refresh_student_reach(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,64 @@
 from faker import Faker
 from datetime import timedelta
-import uuid
 import random
 
+from analytics.result_cache import bumps
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.Assignment import assignment_validator
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, load_ids
+from utils.ids import random_uuid
+from utils.parallel import parallel_insert, split_count
+from utils.results import as_results
 from utils.timestamp import utc_now_iso
 
 
-def create_assignments():
-    if "assignments" not in db.list_collection_names():
-        db.create_collection("assignments")
-    db.command("collMod", "assignments", validator={"$jsonSchema": assignment_validator})
-
-    assignments = db["assignments"]
-    assignments.create_index("assignmentId", unique=True)
-    assignments.create_index("dueDate")
-
-    courses = list(db["courses"].find({}, {"courseId": 1}))
-    if not courses:
-        print("❌ No courses found to assign assignments.")
-        return
-
-    fake = Faker()
-
-    for i in range(10):
-        course = random.choice(courses)
+def generate_assignments(count, fake, course_ids):
+    for _ in range(count):
         created_at = utc_now_iso() - timedelta(days=random.randint(1, 60))
-        due_date = created_at + timedelta(days=random.randint(7, 30))
 
-        assignment = {
-            "assignmentId": str(uuid.uuid4()),
-            "courseId": course["courseId"],
+        yield {
+            "assignmentId": random_uuid(),
+            "courseId": random.choice(course_ids),
             "title": fake.sentence(nb_words=6),
             "description": fake.paragraph(),
             "createdAt": created_at,
-            "dueDate": due_date,
+            "dueDate": created_at + timedelta(days=random.randint(7, 30)),
             "maxScore": random.randint(50, 100),
             "isPublished": random.choice([True, False])
         }
 
+
+@bumps("assignments")
+def create_assignments(count=10, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
+    assignments = db["assignments"]
+
+    course_ids = load_ids(db["courses"], "courseId")
+    if not course_ids:
+        print("❌ No courses found to assign assignments.")
+        return
+
+    if workers > 1:
+        shards = [(n, (course_ids,), {}) for n in split_count(count, workers)]
+        return parallel_insert("assignments", generate_assignments, shards, batch_size)
+
+    fake = Faker()
+    documents = generate_assignments(count, fake, course_ids)
+
+    if bulk:
+        return bulk_insert(assignments, documents, batch_size)
+
+    for assignment in documents:
         try:
             assignments.insert_one(assignment)
-            print(f"✅ Inserted assignment: {assignment['title']} for course {course['courseId']}")
+            print(f"✅ Inserted assignment: {assignment['title']} for course {assignment['courseId']}")
         except Exception as e:
             print(f"❌ Failed to insert assignment: {e}")
 
 
 
 
-def get_upcoming_assignments():
+def get_upcoming_assignments(materialize=False, batch_size=None):
     assignments = db["assignments"]
     now = utc_now_iso()
     next_week = now + timedelta(days=7)
@@ -61,10 +70,7 @@ def get_upcoming_assignments():
         }
     }, {"_id": 0, "assignmentId": 1, "title": 1})
 
-    print("\n📘 Assignments due next week:")
-    for assignment in results:
-        print(assignment)
-    return list(results)
+    return as_results(results, materialize, batch_size)
 
 
 def create_index_due_date():
@@ -0,0 +1,177 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from analytics.enrollment_rollups import DAILY_COLLECTION
+from analytics.grade_stats import GRADE_STATS_COLLECTION
+from courses import average_course_rating_pipeline
+from database.mongo_db import DB_NAME, db
+from enrollments import (
+    monthly_enrollment_trends_pipeline,
+    revenue_per_instructor_pipeline,
+    total_students_per_instructor_pipeline
+)
+from seed import seed_dataset
+from users import student_engagement_metrics_pipeline, top_performing_students_with_names_pipeline
+from utils.timestamp import utc_now_iso
+
+
+# Benchmark name -> (collection the pipeline runs on, pipeline builder)
+PIPELINES = {
+    "average_course_rating": ("courses", average_course_rating_pipeline),
+    "total_students_per_instructor": ("enrollments", total_students_per_instructor_pipeline),
+    "revenue_per_instructor": ("enrollments", revenue_per_instructor_pipeline),
+    "monthly_enrollment_trends": (DAILY_COLLECTION, monthly_enrollment_trends_pipeline),
+    "student_engagement_metrics": (GRADE_STATS_COLLECTION, student_engagement_metrics_pipeline),
+    "top_performing_students_with_names": (GRADE_STATS_COLLECTION, top_performing_students_with_names_pipeline)
+}
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile over a small sample
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _sum_key(node, key):
+    if isinstance(node, dict):
+        own = node[key] if isinstance(node.get(key), (int, float)) else 0
+        return own + sum(_sum_key(value, key) for k, value in node.items() if k != key)
+    if isinstance(node, list):
+        return sum(_sum_key(value, key) for value in node)
+    return 0
+
+
+def explain_stats(collection, pipeline):
+    explain = db.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity="executionStats"
+    )
+    return {
+        "docsExamined": _sum_key(explain, "totalDocsExamined"),
+        "keysExamined": _sum_key(explain, "totalKeysExamined"),
+        "serverMemoryBytes": _sum_key(explain, "maxAccumulatorMemoryUsageBytes")
+    }
+
+
+def run_pipeline(collection, pipeline, runs):
+    list(db[collection].aggregate(pipeline))  # warm-up: load the working set into cache
+
+    latencies = []
+    peak_memory = 0
+    returned = 0
+    for _ in range(runs):
+        tracemalloc.start()
+        started = time.perf_counter()
+        results = list(db[collection].aggregate(pipeline))
+        latencies.append((time.perf_counter() - started) * 1000)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        returned = len(results)
+
+    return {
+        "runs": runs,
+        "p50Ms": round(percentile(latencies, 50), 3),
+        "p95Ms": round(percentile(latencies, 95), 3),
+        "p99Ms": round(percentile(latencies, 99), 3),
+        "docsReturned": returned,
+        "clientPeakMemoryBytes": peak_memory,
+        **explain_stats(collection, pipeline)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, runs=20, seed=42, reseed=True, only=None):
+    report = {
+        "revision": git_revision(),
+        "createdAt": utc_now_iso().isoformat(),
+        "database": DB_NAME,
+        "runs": runs,
+        "seed": seed,
+        "scales": {}
+    }
+
+    for scale in scales:
+        if reseed:
+            seed_dataset(scale=scale, seed=seed, drop=True)
+
+        results = {}
+        for name, (collection, build) in PIPELINES.items():
+            if only and name not in only:
+                continue
+            results[name] = run_pipeline(collection, build(), runs)
+            print(
+                f"⏱️ scale {scale} {name}: p50 {results[name]['p50Ms']}ms, p95 {results[name]['p95Ms']}ms, "
+                f"{results[name]['docsExamined']} examined / {results[name]['docsReturned']} returned"
+            )
+        report["scales"][str(scale)] = results
+
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.2, metric="p95Ms"):
+    # Regressions: pipelines whose metric grew by more than `threshold` (fractional) at the same scale
+    regressions = []
+    for scale, results in current["scales"].items():
+        for name, stats in results.items():
+            before = baseline.get("scales", {}).get(scale, {}).get(name)
+            if before and before[metric] and stats[metric] > before[metric] * (1 + threshold):
+                regressions.append({
+                    "scale": scale,
+                    "pipeline": name,
+                    "before": before[metric],
+                    "after": stats[metric]
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analytics pipelines across dataset scales.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES), help="subset to run")
+    parser.add_argument("--no-reseed", action="store_true", help="benchmark the data already in the database")
+    parser.add_argument("--output", default="benchmarks/report.json")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 growth before flagging")
+    args = parser.parse_args(argv)
+
+    if not args.no_reseed:
+        print(f"⚠️ Reseeding drops the seed collections in database '{DB_NAME}' (set EDUHUB_DB_NAME to use a scratch DB).")
+
+    report = run_benchmarks(args.scales, args.runs, args.seed, reseed=not args.no_reseed, only=args.pipelines)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        for regression in regressions:
+            print(
+                f"❌ Regression at scale {regression['scale']} in {regression['pipeline']}: "
+                f"p95 {regression['before']}ms -> {regression['after']}ms"
+            )
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
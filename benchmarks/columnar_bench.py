@@ -0,0 +1,116 @@
+import argparse
+import json
+import time
+
+from analytics.columnar import QUERIES, export_snapshot
+from analytics.course_stats import STATS_COLLECTION
+from analytics.enrollment_rollups import DAILY_COLLECTION
+from analytics.grade_stats import GRADE_STATS_COLLECTION
+from benchmarks.analytics import git_revision, percentile, run_pipeline
+from courses import popular_course_categories_pipeline
+from database.mongo_db import DB_NAME, db
+from enrollments import (
+    enrollment_stats_per_course_pipeline,
+    monthly_enrollment_trends_pipeline,
+    revenue_per_instructor_pipeline,
+    total_students_per_instructor_pipeline
+)
+from seed import seed_dataset
+from users import (
+    average_grade_per_student_pipeline,
+    student_engagement_metrics_pipeline,
+    top_performing_students_with_names_pipeline
+)
+from utils.timestamp import utc_now_iso
+
+
+# Query name -> (collection, pipeline builder) the server-side version runs today
+SERVER_PIPELINES = {
+    "popular_course_categories": ("enrollments", popular_course_categories_pipeline),
+    "revenue_per_instructor": ("enrollments", revenue_per_instructor_pipeline),
+    "total_students_per_instructor": ("enrollments", total_students_per_instructor_pipeline),
+    "enrollment_stats_per_course": (STATS_COLLECTION, enrollment_stats_per_course_pipeline),
+    "average_grade_per_student": (GRADE_STATS_COLLECTION, average_grade_per_student_pipeline),
+    "top_performing_students_with_names": (GRADE_STATS_COLLECTION, top_performing_students_with_names_pipeline),
+    "student_engagement_metrics": (GRADE_STATS_COLLECTION, student_engagement_metrics_pipeline),
+    "monthly_enrollment_trends": (DAILY_COLLECTION, monthly_enrollment_trends_pipeline)
+}
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    return value
+
+
+def same_rows(server, columnar):
+    # Order-insensitive: ties can come back in a different order from each engine
+    def canonical(rows):
+        return sorted(json.dumps(_rounded(row), sort_keys=True, default=str) for row in rows)
+    return canonical(server) == canonical(columnar)
+
+
+def run_columnar(query, snapshot, runs):
+    query(snapshot)  # warm-up
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        query(snapshot)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50Ms": round(percentile(latencies, 50), 3),
+        "p95Ms": round(percentile(latencies, 95), 3),
+        "p99Ms": round(percentile(latencies, 99), 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the NumPy columnar engine with the server-side analytics pipelines.")
+    parser.add_argument("--scale", type=float, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-reseed", action="store_true", help="benchmark the data already in the database")
+    parser.add_argument("--queries", nargs="+", choices=sorted(QUERIES), help="subset to run")
+    parser.add_argument("--output", default="benchmarks/columnar_report.json")
+    args = parser.parse_args(argv)
+
+    if not args.no_reseed:
+        print(f"⚠️ Reseeding drops the seed collections in database '{DB_NAME}' (set EDUHUB_DB_NAME to use a scratch DB).")
+        seed_dataset(scale=args.scale, seed=args.seed, drop=True)
+
+    started = time.perf_counter()
+    snapshot = export_snapshot()
+    export_seconds = time.perf_counter() - started
+
+    report = {
+        "revision": git_revision(),
+        "createdAt": utc_now_iso().isoformat(),
+        "database": DB_NAME,
+        "runs": args.runs,
+        "exportSeconds": round(export_seconds, 3),
+        "snapshotBytes": snapshot.nbytes(),
+        "queries": {}
+    }
+
+    for name, query in QUERIES.items():
+        if args.queries and name not in args.queries:
+            continue
+        collection, build = SERVER_PIPELINES[name]
+        server = run_pipeline(collection, build(), args.runs)
+        columnar = run_columnar(query, snapshot, args.runs)
+        matches = same_rows(list(db[collection].aggregate(build())), query(snapshot))
+        report["queries"][name] = {"server": server, "columnar": columnar, "resultsMatch": matches}
+        print(
+            f"⏱️ {name}: server p50 {server['p50Ms']}ms, columnar p50 {columnar['p50Ms']}ms"
+            f"{'' if matches else ' ❌ results differ'}"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
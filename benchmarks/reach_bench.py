@@ -0,0 +1,121 @@
+import argparse
+import json
+import tracemalloc
+
+from analytics.student_reach import (
+    INSTRUCTOR_STUDENT_SKETCHES,
+    approximate_students_per_instructor_pipeline,
+    rebuild_student_reach
+)
+from benchmarks.analytics import git_revision, percentile, run_pipeline
+from database.mongo_db import DB_NAME, db
+from enrollments import total_students_per_instructor_pipeline
+from seed import seed_dataset
+from utils.hyperloglog import HyperLogLog
+from utils.timestamp import utc_now_iso
+
+
+def relative_errors(exact, approximate):
+    return [abs(approximate.get(key, 0) - count) / count for key, count in exact.items() if count]
+
+
+def error_stats(errors):
+    if not errors:
+        return {}
+    return {
+        "meanRelativeError": round(sum(errors) / len(errors), 5),
+        "p95RelativeError": round(percentile(errors, 95), 5),
+        "maxRelativeError": round(max(errors), 5)
+    }
+
+
+def compare_instructor_reach(runs):
+    exact_pipeline = total_students_per_instructor_pipeline()
+    approximate_pipeline = approximate_students_per_instructor_pipeline()
+
+    exact = {row["instructorId"]: row["totalStudents"] for row in db["enrollments"].aggregate(exact_pipeline)}
+    approximate = {
+        row["instructorId"]: row["totalStudents"]
+        for row in db[INSTRUCTOR_STUDENT_SKETCHES].aggregate(approximate_pipeline)
+    }
+    sketch_bytes = sum(
+        len(doc["sketch"]) for doc in db[INSTRUCTOR_STUDENT_SKETCHES].find({}, {"_id": 0, "sketch": 1})
+    )
+
+    return {
+        "instructors": len(exact),
+        "exact": run_pipeline("enrollments", exact_pipeline, runs),
+        "approximate": run_pipeline(INSTRUCTOR_STUDENT_SKETCHES, approximate_pipeline, runs),
+        "sketchBytes": sketch_bytes,
+        **error_stats(relative_errors(exact, approximate))
+    }
+
+
+def synthetic_cardinalities(cardinalities, trials):
+    # Memory of an exact set of ids vs one sketch, and the sketch's error, at reach sizes the seed data can't reach
+    results = {}
+    for cardinality in cardinalities:
+        errors = []
+        for trial in range(trials):
+            ids = (f"student-{trial}-{i}" for i in range(cardinality))
+            sketch = HyperLogLog()
+            sketch.update(ids)
+            errors.append(abs(sketch.count() - cardinality) / cardinality)
+
+        tracemalloc.start()
+        exact = {f"student-{i}" for i in range(cardinality)}
+        exact_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del exact
+
+        results[str(cardinality)] = {
+            "exactSetBytes": exact_bytes,
+            "sketchBytes": len(sketch.to_bytes()),
+            **error_stats(errors)
+        }
+        print(
+            f"⏱️ {cardinality} students: set {exact_bytes:,} bytes, sketch {len(sketch.to_bytes()):,} bytes, "
+            f"mean error {results[str(cardinality)]['meanRelativeError']:.3%}"
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare exact and HyperLogLog distinct-student counts per instructor.")
+    parser.add_argument("--scale", type=float, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-reseed", action="store_true", help="benchmark the data already in the database")
+    parser.add_argument("--cardinalities", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--trials", type=int, default=5, help="sketches per synthetic cardinality")
+    parser.add_argument("--output", default="benchmarks/reach_report.json")
+    args = parser.parse_args(argv)
+
+    if not args.no_reseed:
+        print(f"⚠️ Reseeding drops the seed collections in database '{DB_NAME}' (set EDUHUB_DB_NAME to use a scratch DB).")
+        seed_dataset(scale=args.scale, seed=args.seed, drop=True)
+    else:
+        rebuild_student_reach()
+
+    report = {
+        "revision": git_revision(),
+        "createdAt": utc_now_iso().isoformat(),
+        "database": DB_NAME,
+        "runs": args.runs,
+        "instructorReach": compare_instructor_reach(args.runs),
+        "synthetic": synthetic_cardinalities(args.cardinalities, args.trials)
+    }
+    reach = report["instructorReach"]
+    print(
+        f"⏱️ exact: p50 {reach['exact']['p50Ms']}ms, {reach['exact']['serverMemoryBytes']:,} accumulator bytes; "
+        f"approximate: p50 {reach['approximate']['p50Ms']}ms, {reach['sketchBytes']:,} sketch bytes, "
+        f"mean error {reach.get('meanRelativeError', 0):.3%}"
+    )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
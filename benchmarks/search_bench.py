@@ -0,0 +1,123 @@
+import argparse
+import json
+import random
+import re
+import time
+
+from benchmarks.analytics import _sum_key, git_revision, percentile
+from courses import SEARCH_FIELDS, create_courses, search_courses_query, tokenize
+from database.bootstrap import bootstrap
+from database.mongo_db import DB_NAME, db
+from users import create_users
+from utils.timestamp import utc_now_iso
+
+
+def legacy_query(term):
+    # What search_courses_by_title sends: an unanchored, case-insensitive regex
+    return {"title": {"$regex": re.escape(term), "$options": "i"}}, None
+
+
+def text_query(term):
+    return search_courses_query(term), [("score", {"$meta": "textScore"})]
+
+
+def prefix_query(term):
+    return search_courses_query(term[:3], prefix=True), [("ratingSummary.average", -1)]
+
+
+# Benchmark name -> (filter, sort) builder for one search term
+STRATEGIES = {
+    "regex": legacy_query,
+    "text": text_query,
+    "prefix": prefix_query
+}
+
+
+def seed_courses(count, workers, seed):
+    random.seed(seed)
+    db.drop_collection("courses")
+    bootstrap(force=True)
+    if not db["users"].count_documents({"role": "instructor"}, limit=1):
+        create_users(count=200, bulk=True)
+    create_courses(count=count, bulk=True, workers=workers)
+
+
+def sample_terms(n):
+    # Real title words, so every strategy has matches to find
+    titles = db["courses"].aggregate([{"$sample": {"size": n}}, {"$project": {"_id": 0, "title": 1}}])
+    return [random.choice(tokenize(course["title"])) for course in titles]
+
+
+def run_strategy(build, terms, limit):
+    latencies = []
+    examined = {"docsExamined": 0, "keysExamined": 0}
+
+    for term in terms:
+        conditions, sort = build(term)
+        projection = dict(SEARCH_FIELDS)
+        if sort and sort[0][0] == "score":
+            projection["score"] = {"$meta": "textScore"}
+
+        cursor = db["courses"].find(conditions, projection).limit(limit)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        started = time.perf_counter()
+        list(cursor)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        command = {"find": "courses", "filter": conditions, "projection": projection, "limit": limit}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = db.command("explain", command, verbosity="executionStats")
+        examined["docsExamined"] += _sum_key(explain, "totalDocsExamined")
+        examined["keysExamined"] += _sum_key(explain, "totalKeysExamined")
+
+    return {
+        "queries": len(terms),
+        "p50Ms": round(percentile(latencies, 50), 3),
+        "p95Ms": round(percentile(latencies, 95), 3),
+        "p99Ms": round(percentile(latencies, 99), 3),
+        "avgDocsExamined": round(examined["docsExamined"] / len(terms), 1),
+        "avgKeysExamined": round(examined["keysExamined"] / len(terms), 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare regex, text-index and prefix course search latency.")
+    parser.add_argument("--courses", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-reseed", action="store_true", help="search the courses already in the database")
+    parser.add_argument("--output", default="benchmarks/search_report.json")
+    args = parser.parse_args(argv)
+
+    if not args.no_reseed:
+        print(f"⚠️ Reseeding drops the courses collection in database '{DB_NAME}' (set EDUHUB_DB_NAME to use a scratch DB).")
+        seed_courses(args.courses, args.workers, args.seed)
+
+    random.seed(args.seed)
+    terms = sample_terms(args.queries)
+
+    report = {
+        "revision": git_revision(),
+        "createdAt": utc_now_iso().isoformat(),
+        "database": DB_NAME,
+        "courses": db["courses"].estimated_document_count(),
+        "limit": args.limit,
+        "strategies": {}
+    }
+    for name, build in STRATEGIES.items():
+        stats = run_strategy(build, terms, args.limit)
+        report["strategies"][name] = stats
+        print(f"⏱️ {name}: p50 {stats['p50Ms']}ms, p95 {stats['p95Ms']}ms, {stats['avgDocsExamined']} docs examined/query")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
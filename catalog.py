@@ -0,0 +1,117 @@
+import os
+
+from database.mongo_db import async_db, db
+from utils.bulk import DEFAULT_BATCH_SIZE, chunked
+from utils.cache import TTLCache
+
+
+# Rarely-changing fields read on the enrollment path; the rest of a document is always read from MongoDB
+COURSE_FIELDS = {"_id": 0, "courseId": 1, "title": 1, "isPublished": 1, "price": 1, "instructorId": 1, "category": 1}
+USER_FIELDS = {"_id": 0, "userId": 1, "role": 1, "isActive": 1, "firstName": 1, "lastName": 1, "email": 1}
+
+# Per process: writes through courses.py/users.py invalidate immediately, writes from other
+# processes are picked up within the TTL
+CACHE_TTL = float(os.environ.get("EDUHUB_CATALOG_CACHE_TTL", 60))
+CACHE_SIZE = int(os.environ.get("EDUHUB_CATALOG_CACHE_SIZE", 10_000))
+
+course_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+user_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+
+def _load_course(course_id):
+    return db["courses"].find_one({"courseId": course_id}, COURSE_FIELDS)
+
+
+def _load_user(user_id):
+    return db["users"].find_one({"userId": user_id}, USER_FIELDS)
+
+
+async def _aload_course(course_id):
+    return await async_db["courses"].find_one({"courseId": course_id}, COURSE_FIELDS)
+
+
+async def _aload_user(user_id):
+    return await async_db["users"].find_one({"userId": user_id}, USER_FIELDS)
+
+
+def _copy(document):
+    # Callers get their own dict, so mutating a result can't corrupt the cached entry
+    return dict(document) if document is not None else None
+
+
+def get_course(course_id: str):
+    return _copy(course_cache.get(course_id, _load_course))
+
+
+def get_user(user_id: str):
+    return _copy(user_cache.get(user_id, _load_user))
+
+
+async def aget_course(course_id: str):
+    return _copy(await course_cache.aget(course_id, _aload_course))
+
+
+async def aget_user(user_id: str):
+    return _copy(await user_cache.aget(user_id, _aload_user))
+
+
+def _cached_many(cache, ids):
+    # (found, missing) for a batch of ids; duplicates are looked up once
+    found, missing = {}, []
+    for key in dict.fromkeys(ids):
+        value = cache.peek(key)
+        if value is None:
+            missing.append(key)
+        else:
+            found[key] = value
+    return found, missing
+
+
+def _load_many(cache, collection, field, fields, ids):
+    # One $in query per batch of cache misses instead of a find_one per id
+    found, missing = _cached_many(cache, ids)
+    for batch in chunked(missing, DEFAULT_BATCH_SIZE):
+        generations = {key: cache.generation(key) for key in batch}
+        for document in db[collection].find({field: {"$in": batch}}, fields):
+            cache.set(document[field], document, generations[document[field]])
+            found[document[field]] = document
+    return {key: _copy(value) for key, value in found.items()}
+
+
+async def _aload_many(cache, collection, field, fields, ids):
+    found, missing = _cached_many(cache, ids)
+    for batch in chunked(missing, DEFAULT_BATCH_SIZE):
+        generations = {key: cache.generation(key) for key in batch}
+        async for document in async_db[collection].find({field: {"$in": batch}}, fields):
+            cache.set(document[field], document, generations[document[field]])
+            found[document[field]] = document
+    return {key: _copy(value) for key, value in found.items()}
+
+
+def get_courses(course_ids):
+    # courseId -> course for the ids that exist
+    return _load_many(course_cache, "courses", "courseId", COURSE_FIELDS, course_ids)
+
+
+def get_users(user_ids):
+    return _load_many(user_cache, "users", "userId", USER_FIELDS, user_ids)
+
+
+async def aget_courses(course_ids):
+    return await _aload_many(course_cache, "courses", "courseId", COURSE_FIELDS, course_ids)
+
+
+async def aget_users(user_ids):
+    return await _aload_many(user_cache, "users", "userId", USER_FIELDS, user_ids)
+
+
+def invalidate_course(course_id: str):
+    course_cache.invalidate(course_id)
+
+
+def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
+
+
+def cache_stats():
+    return {"courses": course_cache.stats(), "users": user_cache.stats()}
@@ -2,66 +2,87 @@ from faker import Faker
 from datetime import timedelta
 import uuid
 import random
+import re
 
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from analytics.result_cache import aggregate_results, bumps
+from catalog import get_course, get_user, invalidate_course
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.Course import course_validator
+from ratings import rating_buckets, rating_summary
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, chunked, load_ids
+from utils.ids import random_uuid
+from utils.pagination import DEFAULT_PAGE_SIZE, find_page
+from utils.parallel import parallel_insert, split_count
+from utils.results import as_results
 from utils.timestamp import utc_now_iso
 
 
-def create_courses():
-    if "courses" not in db.list_collection_names():
-        db.create_collection("courses")
-    db.command("collMod", "courses", validator={"$jsonSchema": course_validator})
-
-    courses = db["courses"]
-    courses.create_index("courseId", unique=True)
-    courses.create_index([("title", 1), ("category", 1)])
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
 
 
-    users = list(db["users"].find({"role": "instructor"}, {"userId": 1}))
-    students = list(db["users"].find({"role": "student"}, {"userId": 1}))
+def search_tokens(title, tags):
+    # Lowercased words of the title and tags; the multikey index on them serves prefix search
+    return sorted(set(tokenize(title)).union(*(tokenize(tag) for tag in tags)))
 
-    if not users:
-        print("❌ Cannot seed courses: no instructors found.")
-        return
 
-    fake = Faker()
+def generate_courses(count, fake, instructor_ids):
     levels = ["beginner", "intermediate", "advanced"]
     categories = ["Data Science", "Web Development", "Finance", "DevOps", "Design"]
     tags_pool = ["Python", "MongoDB", "React", "Kubernetes", "Pandas", "Excel"]
 
-    for _ in range(10):
-        instructor = random.choice(users)
+    for _ in range(count):
         created_at = utc_now_iso()
-        updated_at = created_at
         is_published = random.choice([True, False])
 
+        title = fake.sentence(nb_words=5)
+        tags = random.sample(tags_pool, k=random.randint(2, 5))
+
         course = {
-            "courseId": str(uuid.uuid4()),
-            "title": fake.sentence(nb_words=5),
+            "courseId": random_uuid(),
+            "title": title,
             "description": fake.paragraph(nb_sentences=3),
-            "instructorId": instructor["userId"],
+            "instructorId": random.choice(instructor_ids),
             "category": random.choice(categories),
             "level": random.choice(levels),
             "duration": round(random.uniform(1.0, 20.0), 1),
             "price": round(random.uniform(10.0, 100.0), 2),
-            "tags": random.sample(tags_pool, k=random.randint(2, 5)),
+            "tags": tags,
+            "searchTokens": search_tokens(title, tags),
             "createdAt": created_at,
-            "updatedAt": updated_at,
+            "updatedAt": created_at,
             "isPublished": is_published,
-            "ratings": []
+            # Ratings live in course_ratings buckets (seeded by ratings.create_course_ratings)
+            "ratingSummary": rating_summary([])
         }
 
-        # Add ratings only if the course is published
-        if is_published and students:
-            for _ in range(random.randint(2, 6)):
-                student = random.choice(students)
-                course["ratings"].append({
-                    "studentId": student["userId"],
-                    "rating": round(random.uniform(1.0, 5.0), 1),
-                    "ratedAt": utc_now_iso()
-                })
+        yield course
+
+
+@bumps("courses")
+def create_courses(count=10, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
+    courses = db["courses"]
+
+    instructor_ids = load_ids(db["users"], "userId", {"role": "instructor"})
+
+    if not instructor_ids:
+        print("❌ Cannot seed courses: no instructors found.")
+        return
+
+    if workers > 1:
+        shards = [(n, (instructor_ids,), {}) for n in split_count(count, workers)]
+        return parallel_insert("courses", generate_courses, shards, batch_size)
+
+    fake = Faker()
+    documents = generate_courses(count, fake, instructor_ids)
+
+    if bulk:
+        return bulk_insert(courses, documents, batch_size)
 
+    for course in documents:
         try:
             courses.insert_one(course)
             print(f"✅ Inserted course: {course['title']} (Published: {course['isPublished']})")
@@ -71,6 +92,7 @@ def create_courses():
 
 
 
+@bumps("courses", "course_ratings")
 def create_single_course():
     # Ensure users collection and instructor reference
     user = db["users"]
@@ -81,13 +103,7 @@ def create_single_course():
         print("❌ Cannot add courses: missing or invalid instructor.")
         return
 
-    # Create or modify 'courses' collection with validator
-    if "courses" not in db.list_collection_names():
-        db.create_collection("courses")
-    db.command("collMod", "courses", validator={"$jsonSchema": course_validator})
-
     courses = db["courses"]
-    courses.create_index("courseId", unique=True)
 
     fake = Faker()
     levels = ["beginner", "intermediate", "advanced"]
@@ -107,31 +123,35 @@ def create_single_course():
             "duration": round(random.uniform(1.0, 20.0), 1),
             "price": round(random.uniform(10.0, 100.0), 2),
             "tags": random.sample(tags_pool, k=random.randint(2, 5)),
-            "rating": [],
             "createdAt": created_at,
             "updatedAt": updated_at,
-            "isPublished": random.choice([True, False])
+            "isPublished": is_published
         }
     
+    ratings = []
     if is_published and students:
             for _ in range(random.randint(2, 6)):
                 student = random.choice(students)
-                course["ratings"].append({
+                ratings.append({
                     "studentId": student["userId"],
                     "rating": round(random.uniform(1.0, 5.0), 1),
                     "ratedAt": utc_now_iso()
                 })
+    course["ratingSummary"] = rating_summary(ratings)
+    course["searchTokens"] = search_tokens(course["title"], course["tags"])
 
     try:
             courses.insert_one(course)
+            if ratings:
+                db["course_ratings"].insert_many(list(rating_buckets(course["courseId"], ratings)))
             print(f"✅ Inserted course: {course['title']} (Instructor: {course['instructorId']})")
     except Exception as e:
             print(f"❌ Failed to insert course: {e}")
 
 
 
-def get_course_with_instructor():
-    result = db["courses"].aggregate([
+def get_course_with_instructor_pipeline():
+    return [
         {
             "$lookup": {
                 "from": "users",
@@ -153,42 +173,150 @@ def get_course_with_instructor():
                 "instructor.email": 1
             }
         }
-    ])
+    ]
+
+
+def _with_instructor(courses):
+    # Instructor details come from the catalog cache instead of a $lookup per course; like the
+    # pipeline's $unwind, courses whose instructor doesn't exist are skipped
+    for course in courses:
+        instructor = get_user(course.pop("instructorId"))
+        if instructor:
+            course["instructor"] = {field: instructor[field] for field in ("firstName", "lastName", "email")}
+            yield course
+
 
-    print("\n📗 Courses with Instructor Info:")
-    for course in result:
-        print(course)
+def get_course_with_instructor(materialize=False, batch_size=None):
+    courses = db["courses"].find(
+        {},
+        {"_id": 0, "courseId": 1, "title": 1, "category": 1, "level": 1, "instructorId": 1}
+    )
+    results = _with_instructor(as_results(courses, batch_size=batch_size))
+
+    return list(results) if materialize else results
 
 
 
-def get_courses_by_category(category: str):
+def get_courses_by_category(category: str, materialize=False, batch_size=None):
     courses = db["courses"].find(
         {"category": category},
         {"_id": 0, "courseId": 1, "title": 1, "category": 1}
     )
 
-    print(f"\n📙 Courses in '{category}' Category:")
-    for course in courses:
-        print(course)
+    return as_results(courses, materialize, batch_size)
+
+
+def get_courses_by_category_page(category: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return find_page(
+        db["courses"],
+        {"category": category},
+        {"_id": 0, "courseId": 1, "title": 1, "category": 1},
+        [("courseId", ASCENDING)],
+        page_size,
+        token
+    )
 
 
 
-def search_courses_by_title(query: str):
-    regex_query = {"$regex": query, "$options": "i"}  # Case-insensitive
+def search_courses_by_title(query: str, materialize=False, batch_size=None):
+    # Legacy substring match (scans every title); search_courses is the indexed search
+    regex_query = {"$regex": re.escape(query), "$options": "i"}  # Case-insensitive, input matched literally
     courses = db["courses"].find(
         {"title": regex_query},
         {"_id": 0, "courseId": 1, "title": 1}
     )
 
-    print(f"\n🔍 Courses matching '{query}':")
-    for course in courses:
-        print(course)
+    return as_results(courses, materialize, batch_size)
+
+
+def search_courses_by_title_page(query: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # The regex is still checked against every title key, but each page resumes from the last (title, courseId)
+    return find_page(
+        db["courses"],
+        {"title": {"$regex": re.escape(query), "$options": "i"}},
+        {"_id": 0, "courseId": 1, "title": 1},
+        [("title", ASCENDING), ("courseId", ASCENDING)],
+        page_size,
+        token
+    )
 
 
 
+SEARCH_FIELDS = {"_id": 0, "courseId": 1, "title": 1, "category": 1, "level": 1, "price": 1}
+
+
+def search_courses_query(query, category=None, level=None, min_price=None, max_price=None, prefix=False):
+    # Words go to the text index (stemmed, ranked); with prefix=True the last word is matched as a
+    # prefix of a title/tag token instead (type-ahead). Only \w tokens are kept, so input is never a regex
+    # or $text operator syntax. Returns None when the query has no searchable words.
+    words = tokenize(query)
+    if not words:
+        return None
+
+    conditions = {}
+    text_words = words[:-1] if prefix else words
+    if text_words:
+        conditions["$text"] = {"$search": " ".join(text_words)}
+    if prefix:
+        conditions["searchTokens"] = {"$regex": f"^{re.escape(words[-1])}"}
+
+    if category:
+        conditions["category"] = category
+    if level:
+        conditions["level"] = level
+    if min_price is not None or max_price is not None:
+        conditions["price"] = {}
+        if min_price is not None:
+            conditions["price"]["$gte"] = min_price
+        if max_price is not None:
+            conditions["price"]["$lte"] = max_price
+    return conditions
+
+
+def search_courses(query: str, category=None, level=None, min_price=None, max_price=None, prefix=False,
+                   limit=20, materialize=False, batch_size=None):
+    conditions = search_courses_query(query, category, level, min_price, max_price, prefix)
+    if conditions is None:
+        return [] if materialize else iter(())
+
+    projection = dict(SEARCH_FIELDS)
+    if "$text" in conditions:
+        projection["score"] = {"$meta": "textScore"}
+        sort = [("score", {"$meta": "textScore"})]
+    else:
+        # Prefix-only matches have no text score; best-rated first
+        sort = [("ratingSummary.average", DESCENDING)]
+
+    results = db["courses"].find(conditions, projection).sort(sort).limit(limit)
+    return as_results(results, materialize, batch_size)
+
+
+@bumps("courses")
+def backfill_search_tokens(batch_size=500):
+    # One-off for courses written before searchTokens existed
+    courses = db["courses"]
+    updated = 0
+
+    cursor = courses.find({"searchTokens": {"$exists": False}}, {"_id": 0, "courseId": 1, "title": 1, "tags": 1})
+    for batch in chunked(cursor.batch_size(batch_size), batch_size):
+        courses.bulk_write([
+            UpdateOne(
+                {"courseId": course["courseId"]},
+                {"$set": {"searchTokens": search_tokens(course["title"], course["tags"])}}
+            )
+            for course in batch
+        ], ordered=False)
+        updated += len(batch)
+
+    print(f"🔤 Search tokens backfilled on {updated} course(s).")
+    return updated
+
+
+
+@bumps("courses")
 def publish_course(course_id: str):
     courses = db["courses"]
-    course = courses.find_one({"courseId": course_id})
+    course = get_course(course_id)
 
     if not course:
         print(f"❌ Course with ID {course_id} not found.")
@@ -199,8 +327,9 @@ def publish_course(course_id: str):
         print(f"⚠️ Course '{course_id}' is already published. No action taken.")
         return
 
+    # Guarded on isPublished, so a stale cache entry can't publish twice
     result = courses.update_one(
-        {"courseId": course_id},
+        {"courseId": course_id, "isPublished": False},
         {
             "$set": {
                 "isPublished": True,
@@ -208,87 +337,93 @@ def publish_course(course_id: str):
             }
         }
     )
+    invalidate_course(course_id)
     print(f"\n📢 Course '{course_id}' marked as published: {result.modified_count} document(s) updated.")
 
 
 
+@bumps("courses")
 def add_tags_to_course(course_id: str, new_tags: list):
-    courses = db["courses"]
-    course = courses.find_one({"courseId": course_id})
-
-    if not course:
-        print(f"❌ Course with ID {course_id} not found.")
-        return
-    
-    result = courses.update_one(
+    # No existence read: matched_count says whether the course exists
+    result = db["courses"].update_one(
         {"courseId": course_id},
         {
             "$addToSet": {
-                "tags": { "$each": new_tags }
+                "tags": { "$each": new_tags },
+                "searchTokens": {"$each": search_tokens("", new_tags)}
             },
             "$set": {
                 "updatedAt": utc_now_iso()
             }
         }
     )
+
+    if not result.matched_count:
+        print(f"❌ Course with ID {course_id} not found.")
+        return
     print(f"\n🏷️ Tags added to course {course_id}: {result.modified_count} document(s) updated.")
 
 
 
-def get_courses_in_price_range(min_price=50, max_price=200):
+def get_courses_in_price_range(min_price=50, max_price=200, materialize=False, batch_size=None):
     courses = db["courses"]
     results = courses.find({"price": {"$gte": min_price, "$lte": max_price}}, {"_id": 0, "courseId": 1, "price": 1})
-    print("\n📘 Courses within price range:")
-    for course in results:
-        print(course)
-    return list(results)
+    return as_results(results, materialize, batch_size)
+
+
+def get_courses_in_price_range_page(min_price=50, max_price=200, page_size=DEFAULT_PAGE_SIZE, token=None):
+    return find_page(
+        db["courses"],
+        {"price": {"$gte": min_price, "$lte": max_price}},
+        {"_id": 0, "courseId": 1, "price": 1},
+        [("price", ASCENDING), ("courseId", ASCENDING)],
+        page_size,
+        token
+    )
 
 
 
-def get_courses_by_tags(tag_list):
+def get_courses_by_tags(tag_list, materialize=False, batch_size=None):
     courses = db["courses"]
     results = courses.find({"tags": {"$in": tag_list}}, {"_id": 0, "courseId": 1, "tags": 1})
+    return as_results(results, materialize, batch_size)
 
-    print("\n📘 Users who joined in the last 6 months:")
-    for course in results:
-        print(course)
-    return list(results)
 
 
 
-
-def average_course_rating():
-    pipeline = [
+def average_course_rating_pipeline():
+    # Indexed sort on the maintained summary; no per-call $avg over the ratings arrays
+    return [
         {
             "$match": {
-                "ratings": {"$exists": True, "$ne": []}
+                "ratingSummary.count": {"$gt": 0}
             }
         },
+        {
+            "$sort": {"ratingSummary.average": -1}
+        },
         {
             "$project": {
                 "courseId": 1,
                 "title": 1,
-                "averageRating": {"$avg": "$ratings.rating"},
-                "numRatings": {"$size": "$ratings"}
+                "averageRating": "$ratingSummary.average",
+                "numRatings": "$ratingSummary.count"
             }
-        },
-        {
-            "$sort": {"averageRating": -1}
         }
     ]
 
-    results = db["courses"].aggregate(pipeline)
 
-    print("⭐ Course Ratings Summary:")
-    for doc in results:
-        print(f"{doc['title']} ({doc['courseId']}): Avg Rating = {doc['averageRating']:.2f} from {doc['numRatings']} ratings")
+def average_course_rating(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        "courses", average_course_rating_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
 
-def courses_grouped_by_category():
-    pipeline = [
+def courses_grouped_by_category_pipeline():
+    return [
         {
             "$group": {
                 "_id": "$category",
@@ -300,71 +435,67 @@ def courses_grouped_by_category():
         }
     ]
 
-    results = db["courses"].aggregate(pipeline)
 
-    print("📂 Courses Grouped by Category:")
-    for doc in results:
-        print(f"Category: {doc['_id']} — Total Courses: {doc['totalCourses']}")
+def courses_grouped_by_category(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        "courses", courses_grouped_by_category_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
-def average_rating_per_instructor():
-    pipeline = [
+def average_rating_per_instructor_pipeline():
+    # Sums the per-course summaries instead of $unwind-ing every rating
+    return [
         {
-            "$unwind": "$ratings"
+            "$match": {
+                "ratingSummary.count": {"$gt": 0}
+            }
         },
         {
             "$group": {
                 "_id": "$instructorId",
-                "averageRating": {"$avg": "$ratings.rating"},
-                "numRatings": {"$sum": 1}
+                "ratingSum": {"$sum": "$ratingSummary.sum"},
+                "numRatings": {"$sum": "$ratingSummary.count"}
             }
         },
         {
             "$project": {
                 "_id": 0,
                 "instructorId": "$_id",
-                "averageRating": {"$round": ["$averageRating", 2]},
+                "averageRating": {"$round": [{"$divide": ["$ratingSum", "$numRatings"]}, 2]},
                 "numRatings": 1
             }
         },
         {"$sort": {"averageRating": -1}}
     ]
 
-    results = db["courses"].aggregate(pipeline)
 
-    print("⭐ Average Rating per Instructor:")
-    for doc in results:
-        print(f"Instructor: {doc['instructorId']} — Avg: {doc['averageRating']} ({doc['numRatings']} ratings)")
+def average_rating_per_instructor(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        "courses", average_rating_per_instructor_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
-def popular_course_categories():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "courses",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "course_info"
-            }
-        },
-        {"$unwind": "$course_info"},
+def popular_course_categories_pipeline():
+    # Runs on enrollments, which carry the course's category
+    return [
         {
             "$group": {
-                "_id": "$course_info.category",
+                "_id": "$category",
                 "enrollments": {"$sum": 1}
             }
         },
         {"$sort": {"enrollments": -1}}
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
-    print("📚 Most Popular Course Categories:")
-    for doc in results:
-        print(f"{doc['_id']}: {doc['enrollments']} enrollments")
+
+def popular_course_categories(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        "enrollments", popular_course_categories_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
@@ -378,6 +509,8 @@ def create_course_index_title_category():
 # get_course_with_instructor()
 # get_courses_by_category("Finance")
 # search_courses_by_title("det")
+# search_courses("python data", category="Data Science", max_price=50, materialize=True)
+# backfill_search_tokens()
 # publish_course("c481152b-5ee5-4f68-a4ac-a66ff84dc62d")
 # add_tags_to_course("7d197809-a4f5-4669-9ea6-e76a2e6d8f57", ['Pymongo', 'SQL'])
 # get_courses_in_price_range()
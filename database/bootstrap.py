@@ -0,0 +1,63 @@
+import argparse
+
+from database.indexes import INDEXES
+from database.mongo_db import db
+from models import VALIDATORS
+from utils.timestamp import utc_now_iso
+
+
+# Bump whenever a validator in models/ or an index in database/indexes.py changes, so the next bootstrap re-applies them
+SCHEMA_VERSION = 13
+
+_schema_checked = False
+
+
+def applied_schema_version():
+    meta = db["schema_meta"].find_one({"_id": "schema"}, {"version": 1})
+    return meta["version"] if meta else 0
+
+
+def bootstrap(force=False):
+    # Applies every validator and index once and records SCHEMA_VERSION; returns True if anything ran
+    if not force and applied_schema_version() >= SCHEMA_VERSION:
+        return False
+
+    existing = set(db.list_collection_names())
+
+    for name, validator in VALIDATORS.items():
+        if name not in existing:
+            db.create_collection(name, validator={"$jsonSchema": validator})
+        else:
+            db.command("collMod", name, validator={"$jsonSchema": validator})
+
+    for name, indexes in INDEXES.items():
+        db[name].create_indexes(indexes)
+
+    db["schema_meta"].update_one(
+        {"_id": "schema"},
+        {"$set": {"version": SCHEMA_VERSION, "appliedAt": utc_now_iso()}},
+        upsert=True
+    )
+    print(f"🧱 Schema version {SCHEMA_VERSION} applied to {len(VALIDATORS)} collections.")
+    return True
+
+
+def ensure_schema():
+    # At most one schema_meta read per process; CRUD paths don't call this at all
+    global _schema_checked
+    if not _schema_checked:
+        bootstrap()
+        _schema_checked = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply EduHub validators and indexes.")
+    parser.add_argument("--force", action="store_true", help="re-apply even if the recorded version is current")
+    args = parser.parse_args(argv)
+
+    if not bootstrap(force=args.force):
+        print(f"✅ Schema already at version {SCHEMA_VERSION}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import argparse
+import sys
+from datetime import timedelta
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from database.mongo_db import db
+from utils.timestamp import utc_now_iso
+
+
+# Single source of truth for every index; the comment on each names the queries it serves.
+INDEXES = {
+    "users": [
+        IndexModel([("userId", ASCENDING)], unique=True),  # point lookups, $lookup foreignField
+        IndexModel([("email", ASCENDING)], unique=True),
+        # find_active_students(_page), role lookups
+        IndexModel([("role", ASCENDING), ("isActive", ASCENDING), ("dateJoined", ASCENDING), ("userId", ASCENDING)]),
+        IndexModel([("dateJoined", ASCENDING)])  # get_recent_users
+    ],
+    "courses": [
+        IndexModel([("courseId", ASCENDING)], unique=True),  # point lookups, $lookup foreignField
+        IndexModel([("title", ASCENDING), ("category", ASCENDING)]),  # search_courses_by_title
+        IndexModel([("title", ASCENDING), ("courseId", ASCENDING)]),  # search_courses_by_title_page
+        IndexModel([("category", ASCENDING), ("courseId", ASCENDING)]),  # get_courses_by_category(_page)
+        IndexModel([("price", ASCENDING), ("courseId", ASCENDING)]),  # get_courses_in_price_range(_page)
+        IndexModel([("tags", ASCENDING)]),  # get_courses_by_tags
+        IndexModel([("ratingSummary.average", DESCENDING)]),  # average_course_rating leaderboard
+        IndexModel(  # search_courses (ranked full-text); one text index per collection
+            [("title", TEXT), ("description", TEXT), ("tags", TEXT)],
+            weights={"title": 10, "tags": 5, "description": 1},
+            name="course_text"
+        ),
+        IndexModel([("searchTokens", ASCENDING)])  # search_courses(prefix=True)
+    ],
+    "course_ratings": [
+        IndexModel([("courseId", ASCENDING), ("count", ASCENDING)]),  # open-bucket upsert in add_course_rating
+        IndexModel([("courseId", ASCENDING), ("firstRatedAt", ASCENDING)])  # get_course_ratings
+    ],
+    "enrollments": [
+        IndexModel([("enrollmentId", ASCENDING)], unique=True),  # delete_enrollment
+        IndexModel([("studentId", ASCENDING), ("courseId", ASCENDING)], unique=True),  # enroll_student(s) upsert key
+        # get_students_in_course(_page), per-course stats recompute
+        IndexModel([("courseId", ASCENDING), ("studentId", ASCENDING)]),
+        IndexModel([("updatedAt", ASCENDING)]),  # course_enrollment_stats watermark scan
+        IndexModel([("instructorId", ASCENDING), ("studentId", ASCENDING)]),  # total_students_per_instructor
+        IndexModel([("enrolledAt", ASCENDING)])  # rollup refresh range, live part of enrollment_trends, reach refresh
+    ],
+    "course_enrollment_stats": [
+        IndexModel([("total", DESCENDING)]),  # enrollment_stats_per_course
+        IndexModel([("completionRate", DESCENDING)]),  # course_completion_rate
+        IndexModel([("refreshedAt", ASCENDING)])  # leftover cleanup after a full refresh
+    ],
+    "enrollment_rollups_course_daily": [
+        IndexModel([("courseId", ASCENDING), ("day", ASCENDING)]),  # enrollment_trends(course_id=...)
+        IndexModel([("day", ASCENDING)])  # daily rollup rebuild, refresh cleanup
+    ],
+    "course_projection": [
+        IndexModel([("instructorId", ASCENDING)])  # projector rebuild_instructors
+    ],
+    "instructor_students": [
+        IndexModel([("_id.instructorId", ASCENDING)])  # projector rebuild_instructors
+    ],
+    "instructor_stats": [
+        IndexModel([("revenue", DESCENDING)])  # instructor_dashboard
+    ],
+    "student_engagement": [
+        IndexModel([("submissionsMade", DESCENDING)])  # projector student_engagement
+    ],
+    "instructor_student_sketches": [
+        IndexModel([("estimate", DESCENDING)])  # total_students_per_instructor(approximate=True)
+    ],
+    "student_grade_stats": [
+        # average_grade_per_student, top_performing_students_with_names
+        IndexModel([("averageScore", DESCENDING)]),
+        IndexModel([("submissionsMade", DESCENDING)])  # student_engagement_metrics
+    ],
+    "lessons": [
+        IndexModel([("lessonId", ASCENDING)], unique=True),  # delete_lesson
+        IndexModel([("courseId", ASCENDING), ("position", ASCENDING)])  # next position per course
+    ],
+    "assignments": [
+        IndexModel([("assignmentId", ASCENDING)], unique=True),
+        IndexModel([("dueDate", ASCENDING)]),  # get_upcoming_assignments
+        IndexModel([("courseId", ASCENDING)])
+    ],
+    "submissions": [
+        IndexModel([("submissionId", ASCENDING)], unique=True),  # update_assignment_grade
+        IndexModel([("score", ASCENDING)]),  # graded-score $match in grade analytics
+        IndexModel([("studentId", ASCENDING)]),
+        IndexModel([("assignmentId", ASCENDING)])
+    ]
+}
+
+# Every selective query in the CRUD/analytics modules, with representative arguments.
+# Whole-collection $group analytics (no leading $match) scan by design and aren't listed.
+QUERIES = [
+    {"name": "users.find_active_students", "collection": "users",
+     "filter": lambda: {"role": "student", "isActive": True}},
+    {"name": "users.find_active_students_page", "collection": "users",
+     "pipeline": lambda: [
+         {"$match": {"role": "student", "isActive": True,
+                     "$or": [{"dateJoined": {"$gt": utc_now_iso()}},
+                             {"dateJoined": utc_now_iso(), "userId": {"$gt": "sample-user-id"}}]}},
+         {"$sort": {"dateJoined": 1, "userId": 1}}]},
+    {"name": "users.get_recent_users", "collection": "users",
+     "filter": lambda: {"dateJoined": {"$gte": utc_now_iso() - timedelta(days=180)}}},
+    {"name": "users.by_user_id", "collection": "users",
+     "filter": lambda: {"userId": "sample-user-id"}},
+    {"name": "users.first_by_role", "collection": "users",
+     "filter": lambda: {"role": "instructor"}},
+    {"name": "users.get_students_in_course", "collection": "enrollments",
+     "pipeline": lambda: [{"$match": {"courseId": "sample-course-id"}}]},
+    {"name": "users.top_performing_students", "collection": "student_grade_stats",
+     "pipeline": lambda: [{"$match": {"averageScore": {"$ne": None}}}, {"$sort": {"averageScore": -1}}, {"$limit": 5}]},
+    {"name": "users.student_engagement_metrics", "collection": "student_grade_stats",
+     "pipeline": lambda: [{"$sort": {"submissionsMade": -1}}]},
+    {"name": "grade_stats.refresh_students", "collection": "submissions",
+     "filter": lambda: {"studentId": {"$in": ["sample-user-id"]}}},
+    {"name": "courses.by_course_id", "collection": "courses",
+     "filter": lambda: {"courseId": "sample-course-id"}},
+    {"name": "courses.get_courses_by_category", "collection": "courses",
+     "filter": lambda: {"category": "Finance"}},
+    {"name": "courses.search_courses_by_title", "collection": "courses",
+     "filter": lambda: {"title": {"$regex": "python", "$options": "i"}}},
+    {"name": "courses.search_courses", "collection": "courses",
+     "filter": lambda: {"$text": {"$search": "python data"}, "category": "Data Science", "price": {"$lte": 50}}},
+    {"name": "courses.search_courses_prefix", "collection": "courses",
+     "filter": lambda: {"searchTokens": {"$regex": "^pyt"}, "level": "beginner"}},
+    {"name": "courses.get_courses_in_price_range", "collection": "courses",
+     "filter": lambda: {"price": {"$gte": 50, "$lte": 200}}},
+    {"name": "courses.get_courses_in_price_range_page", "collection": "courses",
+     "pipeline": lambda: [
+         {"$match": {"price": {"$gte": 50, "$lte": 200},
+                     "$or": [{"price": {"$gt": 75.5}}, {"price": 75.5, "courseId": {"$gt": "sample-course-id"}}]}},
+         {"$sort": {"price": 1, "courseId": 1}}]},
+    {"name": "courses.get_courses_by_category_page", "collection": "courses",
+     "pipeline": lambda: [{"$match": {"category": "Finance", "courseId": {"$gt": "sample-course-id"}}},
+                          {"$sort": {"courseId": 1}}]},
+    {"name": "courses.get_courses_by_tags", "collection": "courses",
+     "filter": lambda: {"tags": {"$in": ["Python", "MongoDB"]}}},
+    {"name": "courses.average_course_rating", "collection": "courses",
+     "pipeline": lambda: [{"$match": {"ratingSummary.count": {"$gt": 0}}}, {"$sort": {"ratingSummary.average": -1}}]},
+    {"name": "ratings.open_bucket", "collection": "course_ratings",
+     "filter": lambda: {"courseId": "sample-course-id", "count": {"$lt": 100}}},
+    {"name": "ratings.get_course_ratings", "collection": "course_ratings",
+     "pipeline": lambda: [{"$match": {"courseId": "sample-course-id"}}, {"$sort": {"firstRatedAt": 1}}]},
+    {"name": "users.get_students_in_course_page", "collection": "enrollments",
+     "pipeline": lambda: [{"$match": {"courseId": "sample-course-id", "studentId": {"$gt": "sample-user-id"}}},
+                          {"$sort": {"studentId": 1}}]},
+    {"name": "enrollments.enroll_upsert", "collection": "enrollments",
+     "filter": lambda: {"studentId": "sample-user-id", "courseId": "sample-course-id"}},
+    {"name": "enrollments.delete_enrollment", "collection": "enrollments",
+     "filter": lambda: {"enrollmentId": "sample-enrollment-id"}},
+    {"name": "student_reach.approximate_students_per_instructor", "collection": "instructor_student_sketches",
+     "pipeline": lambda: [{"$sort": {"estimate": -1}}]},
+    {"name": "student_reach.enrolled_since_watermark", "collection": "enrollments",
+     "filter": lambda: {"enrolledAt": {"$gte": utc_now_iso() - timedelta(hours=1)}}},
+    {"name": "enrollments.total_students_per_instructor", "collection": "enrollments",
+     "pipeline": lambda: [{"$sort": {"instructorId": 1, "studentId": 1}},
+                          {"$group": {"_id": {"instructorId": "$instructorId", "studentId": "$studentId"}}}]},
+    {"name": "rollups.enrollment_trends", "collection": "enrollment_rollups_daily",
+     "filter": lambda: {"_id": {"$gte": utc_now_iso() - timedelta(days=365), "$lt": utc_now_iso()}}},
+    {"name": "rollups.course_enrollment_trends", "collection": "enrollment_rollups_course_daily",
+     "filter": lambda: {"courseId": "sample-course-id", "day": {"$lt": utc_now_iso()}}},
+    {"name": "rollups.live_enrollments", "collection": "enrollments",
+     "filter": lambda: {"enrolledAt": {"$gte": utc_now_iso() - timedelta(days=1)}}},
+    {"name": "enrollments.changed_since_watermark", "collection": "enrollments",
+     "filter": lambda: {"updatedAt": {"$gte": utc_now_iso() - timedelta(minutes=5)}}},
+    {"name": "enrollments.enrollment_stats_per_course", "collection": "course_enrollment_stats",
+     "pipeline": lambda: [{"$sort": {"total": -1}}]},
+    {"name": "enrollments.course_completion_rate", "collection": "course_enrollment_stats",
+     "pipeline": lambda: [{"$sort": {"completionRate": -1}}]},
+    {"name": "projector.instructor_dashboard", "collection": "instructor_stats",
+     "pipeline": lambda: [{"$sort": {"revenue": -1}}]},
+    {"name": "projector.student_engagement", "collection": "student_engagement",
+     "pipeline": lambda: [{"$sort": {"submissionsMade": -1}}]},
+    {"name": "projector.instructor_students", "collection": "instructor_students",
+     "filter": lambda: {"_id.instructorId": {"$in": ["sample-user-id"]}}},
+    {"name": "projector.instructor_courses", "collection": "course_projection",
+     "filter": lambda: {"instructorId": {"$in": ["sample-user-id"]}}},
+    {"name": "lessons.course_lessons", "collection": "lessons",
+     "filter": lambda: {"courseId": "sample-course-id"}},
+    {"name": "lessons.delete_lesson", "collection": "lessons",
+     "filter": lambda: {"lessonId": "sample-lesson-id"}},
+    {"name": "assignments.get_upcoming_assignments", "collection": "assignments",
+     "filter": lambda: {"dueDate": {"$gte": utc_now_iso(), "$lte": utc_now_iso() + timedelta(days=7)}}},
+    {"name": "submissions.by_submission_id", "collection": "submissions",
+     "filter": lambda: {"submissionId": "sample-submission-id"}}
+]
+
+# Index options that change behaviour; anything else (v, ns, background) is ignored when diffing
+SPEC_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "weights")
+
+
+def _spec(index):
+    key = list(index["key"].items())
+    if "_fts" in index["key"]:
+        # listIndexes reports a text index as {_fts, _ftsx} and names its fields only in `weights`
+        key = sorted((field, TEXT) for field in index["weights"])
+    elif any(direction == TEXT for _, direction in key):
+        key = sorted(key)
+    return {
+        "key": key,
+        **{option: index[option] for option in SPEC_OPTIONS if index.get(option)}
+    }
+
+
+def diff_indexes():
+    drift = {"missing": [], "extra": [], "changed": []}
+
+    for collection, models in INDEXES.items():
+        wanted = {model.document["name"]: _spec(model.document) for model in models}
+        live = {
+            index["name"]: _spec(index)
+            for index in db[collection].list_indexes()
+            if index["name"] != "_id_"
+        }
+
+        for name, spec in wanted.items():
+            if name not in live:
+                drift["missing"].append({"collection": collection, "name": name, "spec": spec})
+            elif live[name] != spec:
+                drift["changed"].append({"collection": collection, "name": name, "wanted": spec, "live": live[name]})
+        for name, spec in live.items():
+            if name not in wanted:
+                drift["extra"].append({"collection": collection, "name": name, "spec": spec})
+
+    return drift
+
+
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for key, value in plan.items() if key != "rejectedPlans")
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+
+def explain_query(query):
+    if "pipeline" in query:
+        command = {"aggregate": query["collection"], "pipeline": query["pipeline"](), "cursor": {}}
+    else:
+        command = {"find": query["collection"], "filter": query["filter"]()}
+    return db.command("explain", command, verbosity="queryPlanner")
+
+
+def verify_query_plans():
+    failures = []
+    for query in QUERIES:
+        if _has_collscan(explain_query(query)):
+            failures.append(query["name"])
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check live indexes and query plans against the catalog.")
+    parser.add_argument("command", choices=["diff", "verify"])
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        drift = diff_indexes()
+        for kind, entries in drift.items():
+            for entry in entries:
+                print(f"⚠️ {kind}: {entry['collection']}.{entry['name']}")
+        if any(drift.values()):
+            sys.exit(1)
+        print("✅ Live indexes match the catalog.")
+    else:
+        failures = verify_query_plans()
+        for name in failures:
+            print(f"❌ COLLSCAN in plan for {name}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ {len(QUERIES)} registered queries use an index.")
+
+
+if __name__ == "__main__":
+    main()
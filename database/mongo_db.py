@@ -1,12 +1,108 @@
+import os
+import threading
+
+from pymongo import AsyncMongoClient
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 
 
-MONGO_URI = "mongodb://localhost:27017"
+MONGO_URI = os.environ.get("EDUHUB_MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("EDUHUB_DB_NAME", "edu_hub")
+
+# Environment variable -> (MongoClient option, parser)
+POOL_SETTINGS = {
+    "EDUHUB_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "EDUHUB_MIN_POOL_SIZE": ("minPoolSize", int),
+    "EDUHUB_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "EDUHUB_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "EDUHUB_COMPRESSORS": ("compressors", str),  # e.g. "zstd,snappy"
+    "EDUHUB_READ_PREFERENCE": ("readPreference", str)  # e.g. "secondaryPreferred"
+}
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+_overrides = {}
+
+
+def client_options():
+    options = {"server_api": ServerApi('1')}
+    for variable, (option, parse) in POOL_SETTINGS.items():
+        value = os.environ.get(variable)
+        if value:
+            options[option] = parse(value)
+    options.update(_overrides)
+    return options
+
+
+def configure(**options):
+    # Programmatic overrides (e.g. configure(maxPoolSize=200)); take effect on the next get_client()/get_async_client().
+    # The async client can only be closed from its event loop: `await close_async_client()` first to release its pool,
+    # otherwise the old client is just dropped here.
+    global _async_client
+    _overrides.update(options)
+    close_client()
+    _async_client = None
+
+
+def get_client():
+    # MongoClient() doesn't touch the network, so the first call is cheap; connections open on first use
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI, **client_options())
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def get_async_client():
+    # Same options as the sync client; AsyncMongoClient binds to the event loop it is first used on
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncMongoClient(MONGO_URI, **client_options())
+    return _async_client
+
+
+def get_async_db():
+    return get_async_client()[DB_NAME]
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def _reset_after_fork():
+    # A MongoClient must not be shared across fork(); the child drops the parent's and builds its own
+    global _client, _async_client, _client_lock
+    _client = None
+    _async_client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 def mongo_connection():
     try:
-        _client = MongoClient(MONGO_URI, server_api=ServerApi('1'))
+        _client = get_client()
         _client.admin.command('ping')
         print("Pinged your deployment. You successfully connected to MongoDB!")
         return _client
@@ -14,5 +110,26 @@ def mongo_connection():
         print(e)
         return None
 
-client = mongo_connection()
-db = client.edu_hub
+
+class _LazyDatabase:
+    # Resolves to the current process's client on every access, so `from database.mongo_db import db`
+    # neither connects at import time nor pins a client across fork()
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+db = _LazyDatabase(get_db)
+async_db = _LazyDatabase(get_async_db)
+
+
+def __getattr__(name):
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
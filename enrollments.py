@@ -1,116 +1,286 @@
 from datetime import timedelta
 import uuid
 import random
-
+import time
+
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from analytics.course_stats import STATS_COLLECTION, mark_course_stats_stale
+from analytics.enrollment_rollups import (
+    COURSE_DAILY_COLLECTION,
+    DAILY_COLLECTION,
+    apply_rollup_decrements,
+    enrollment_trends_pipeline,
+    rolled_through
+)
+from analytics.result_cache import aggregate_results, bumps
+from analytics.student_reach import INSTRUCTOR_STUDENT_SKETCHES, approximate_students_per_instructor_pipeline
+from catalog import get_course, get_courses, get_user, get_users
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.Enrollment import enrollment_validator
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, chunked, load_ids
+from utils.ids import random_uuid
+from utils.parallel import parallel_insert, split_count, split_list
 from utils.timestamp import utc_now_iso
 
 
-def create_enrollments():
-    if "enrollments" not in db.list_collection_names():
-        db.create_collection("enrollments")
-    db.command("collMod", "enrollments", validator={"$jsonSchema": enrollment_validator})
+# Course fields snapshotted onto every enrollment, so instructor/category analytics need no $lookup
+COURSE_SNAPSHOT = {"_id": 0, "courseId": 1, "instructorId": 1, "category": 1, "price": 1}
+
+
+def course_snapshot(course):
+    # instructorId/category follow the course (see repair_enrollment_course_fields); pricePaid never changes
+    return {
+        "instructorId": course["instructorId"],
+        "category": course["category"],
+        "pricePaid": course["price"]
+    }
+
+
+def load_course_snapshots(query=None):
+    # Sorted, like load_ids, so seeded enrollments are reproducible
+    return list(db["courses"].find(query or {}, COURSE_SNAPSHOT).sort("courseId", 1))
+
 
+def generate_enrollments(count, student_ids, courses):
+    # Each student draws distinct courses, so (studentId, courseId) stays unique
+    # without keeping a seen-set of every pair in memory.
+    count = min(count, len(student_ids) * len(courses))
+    per_student, extra = divmod(count, len(student_ids))
+    statuses = ["enrolled", "in_progress", "completed"]
+
+    for i, student_id in enumerate(random.sample(student_ids, len(student_ids))):
+        picks = per_student + (1 if i < extra else 0)
+        if not picks:
+            break
+
+        for course in random.sample(courses, picks):
+            status = random.choice(statuses)
+            progress = {
+                "enrolled": 0.0,
+                "in_progress": round(random.uniform(10.0, 90.0), 1),
+                "completed": 100.0
+            }[status]
+
+            enrolled_at = utc_now_iso() - timedelta(days=random.randint(1, 30))
+
+            yield {
+                "enrollmentId": random_uuid(),
+                "studentId": student_id,
+                "courseId": course["courseId"],
+                **course_snapshot(course),
+                "enrolledAt": enrolled_at,
+                "updatedAt": enrolled_at,
+                "progress": progress,
+                "status": status
+            }
+
+
+@bumps("enrollments")
+def create_enrollments(count=15, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
     enrollments = db["enrollments"]
-    enrollments.create_index("enrollmentId", unique=True)
-    enrollments.create_index([("studentId", 1), ("courseId", 1)], unique=True)
 
-    users = list(db["users"].find({"role": "student"}, {"userId": 1}))
-    courses = list(db["courses"].find({"isPublished": True}, {"courseId": 1}))
+    student_ids = load_ids(db["users"], "userId", {"role": "student"})
+    courses = load_course_snapshots({"isPublished": True})
 
-    if not users or not courses:
+    if not student_ids or not courses:
         print("❌ Cannot seed enrollments: missing users or courses.")
         return
 
-    statuses = ["enrolled", "in_progress", "completed"]
+    if workers > 1:
+        # Disjoint student slices per worker, so no two workers can produce the same (studentId, courseId)
+        student_slices = [ids for ids in split_list(student_ids, workers) if ids]
+        counts = split_count(min(count, len(student_ids) * len(courses)), len(student_slices))
+        shards = [
+            (min(n, len(ids) * len(courses)), (ids, courses), {})
+            for n, ids in zip(counts, student_slices)
+        ]
+        return parallel_insert("enrollments", generate_enrollments, shards, batch_size, uses_faker=False)
 
-    for i in range(15):
-        student = random.choice(users)
-        course = random.choice(courses)
-        enrolled_at = utc_now_iso() - timedelta(days=random.randint(1, 30))
-        status = random.choice(statuses)
-        progress = {
-            "enrolled": 0.0,
-            "in_progress": round(random.uniform(10.0, 90.0), 1),
-            "completed": 100.0
-        }[status]
-
-        enrollment = {
-            "enrollmentId": str(uuid.uuid4()),
-            "studentId": student["userId"],
-            "courseId": course["courseId"],
-            "enrolledAt": enrolled_at,
-            "progress": progress,
-            "status": status
-        }
+    documents = generate_enrollments(count, student_ids, courses)
+
+    if bulk:
+        return bulk_insert(enrollments, documents, batch_size)
 
+    for enrollment in documents:
         try:
             enrollments.insert_one(enrollment)
-            print(f"✅ Enrolled {student['userId']} in course {course['courseId']}")
+            print(f"✅ Enrolled {enrollment['studentId']} in course {enrollment['courseId']}")
         except Exception as e:
             print(f"❌ Failed to insert enrollment: {e}")
 
 
 
-def enroll_student(user_id: str, course_id: str):
-    #creates the enrollments collection with the enrollment validator if enrollment collection is not present in the database
-    if "enrollments" not in db.list_collection_names():
-        db.create_collection("enrollments")
-    db.command("collMod", "enrollments", validator={"$jsonSchema": enrollment_validator})
+def enrollment_rejection(student, course):
+    # Shared by the sync and async enrollment paths; None means the enrollment may proceed
+    if not student or not course:
+        return "missing/invalid user or course."
+    if student["role"] != "student":
+        return "This user is not a student"
+    if not course["isPublished"]:
+        return "course is not published"
+    return None
+
+
+def new_enrollment(student_id, course):
+    enrolled_at = utc_now_iso()
+    return {
+        "enrollmentId": str(uuid.uuid4()),
+        "studentId": student_id,
+        "courseId": course["courseId"],
+        **course_snapshot(course),
+        "enrolledAt": enrolled_at,
+        "updatedAt": enrolled_at,  # course_enrollment_stats refresh watermark
+        "progress": 0.0,
+        "status": "enrolled"
+    }
+
+
+def enrollment_upsert(student_id, course):
+    # (filter, update) for an upsert that only inserts when the pair is new. The unique
+    # (studentId, courseId) index makes it the duplicate check, so enrolling is a single write.
+    enrollment = new_enrollment(student_id, course)
+    on_insert = {key: value for key, value in enrollment.items() if key not in ("studentId", "courseId")}
+    return {"studentId": student_id, "courseId": course["courseId"]}, {"$setOnInsert": on_insert}
+
 
+@bumps("enrollments")
+def enroll_student(user_id: str, course_id: str):
+    # Validator and indexes are applied once by database.bootstrap, not per call
     enrollments = db["enrollments"]
-    enrollments.create_index("enrollmentId", unique=True)
-    enrollments.create_index([("studentId", 1), ("courseId", 1)], unique=True)
 
-    student = db["users"].find_one({"userId": user_id}, {"userId": 1, "role": 1})
-    course = db["courses"].find_one({"courseId": course_id}, {"courseId": 1, "isPublished": 1})
-    user = db["users"].find_one({"role": "student"}, {"userId": 1, "role": 1})
+    # Catalog cache: repeat enrollments for the same student/course skip these reads
+    student = get_user(user_id)
+    course = get_course(course_id)
 
-    if not student or not course or not user:
-        print("❌ Cannot add enrollment: missing/invalid user or course.")
+    rejection = enrollment_rejection(student, course)
+    if rejection:
+        print(f"❌ Cannot add enrollment: {rejection}")
         return
-    
-    if student['role'] != user['role']:
-        print("❌ Cannot add enrollment: This user is not a student")
-        return    
-
-    
-    if not course['isPublished']:
-        print("❌ Cannot add enrollment: course is not published")
+
+    enrollment_filter, enrollment_update = enrollment_upsert(student["userId"], course)
+
+    try:
+        result = enrollments.update_one(enrollment_filter, enrollment_update, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent enroll_student for the same pair won the insert
+        result = None
+    except Exception as e:
+        print(f"❌ Failed to insert enrollment: {e}")
         return
-    
-    existing = enrollments.find_one({
-        "studentId": student["userId"],
-        "courseId": course["courseId"]
-    })
 
-    if existing:
+    if result is None or result.upserted_id is None:
         print(f"⚠️ Student {student['userId']} is already enrolled in course {course['courseId']}")
         return
 
-    enrollment = {
-        "enrollmentId": str(uuid.uuid4()),
-        "studentId": student['userId'],
-        "courseId": course['courseId'],
-        "enrolledAt": utc_now_iso(),
-        "progress": 0.0,
-        "status": "enrolled"
+    print(f"✅ Enrolled {student['userId']} in course {course['courseId']}")
+    return result.upserted_id
+
+
+def enrollment_operations(pairs, students, courses):
+    # Shared by the sync and async bulk paths: (UpdateOne upserts, the (index in pairs, user_id, course_id)
+    # each one writes, rejected pairs). Duplicate pairs are sent once, under their first index.
+    operations, targets, rejected = [], [], []
+    first = {}
+    for index, pair in enumerate(pairs):
+        first.setdefault(pair, index)
+    for (user_id, course_id), index in first.items():
+        rejection = enrollment_rejection(students.get(user_id), courses.get(course_id))
+        if rejection:
+            rejected.append({"studentId": user_id, "courseId": course_id, "reason": rejection})
+            continue
+        enrollment_filter, enrollment_update = enrollment_upsert(user_id, courses[course_id])
+        operations.append(UpdateOne(enrollment_filter, enrollment_update, upsert=True))
+        targets.append((index, user_id, course_id))
+    return operations, targets, rejected
+
+
+def located_failures(failures, targets, offset):
+    # Bulk write errors index into one batch of operations; report the caller's pair instead
+    located = []
+    for failure in failures:
+        index, user_id, course_id = targets[offset + failure["index"]]
+        located.append({**failure, "index": index, "studentId": user_id, "courseId": course_id})
+    return located
+
+
+def enrollment_write_counts(result=None, error=None):
+    # (enrolled, alreadyEnrolled, failures) from a BulkWriteResult or a BulkWriteError
+    if error is None:
+        return result.upserted_count, result.matched_count, []
+
+    failures = []
+    already = error.details.get("nMatched", 0)
+    for write_error in error.details.get("writeErrors", []):
+        # Duplicate key: a concurrent writer inserted the pair first
+        if write_error.get("code") == 11000:
+            already += 1
+        else:
+            failures.append({"index": write_error["index"], "code": write_error.get("code"), "message": write_error.get("errmsg")})
+    return error.details.get("nUpserted", 0), already, failures
+
+
+def enrollment_summary(enrolled, already, rejected, failures, started):
+    elapsed = time.perf_counter() - started
+    print(
+        f"📦 enrollments: {enrolled} enrolled, {already} already enrolled, "
+        f"{len(rejected)} rejected, {len(failures)} failed in {elapsed:.2f}s"
+    )
+    for failure in failures[:5]:
+        print(
+            f"❌ #{failure['index']} {failure['studentId']} → {failure['courseId']} "
+            f"(code {failure['code']}): {failure['message']}"
+        )
+
+    return {
+        "enrolled": enrolled,
+        "alreadyEnrolled": already,
+        "rejected": rejected,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed
     }
 
-    try:
-        enrollments.insert_one(enrollment)
-        print(f"✅ Enrolled {student['userId']} in course {course['courseId']}")
-    except Exception as e:
-        print(f"❌ Failed to insert enrollment: {e}")
-    
+
+@bumps("enrollments")
+def enroll_students(pairs, batch_size=DEFAULT_BATCH_SIZE):
+    # Bulk enroll_student for (user_id, course_id) pairs: one batched catalog read per collection,
+    # then unordered upserts, so an existing or racing pair never stops the rest of its batch
+    started = time.perf_counter()
+    pairs = list(pairs)
+    students = get_users(user_id for user_id, _ in pairs)
+    courses = get_courses(course_id for _, course_id in pairs)
+    operations, targets, rejected = enrollment_operations(pairs, students, courses)
+
+    enrolled = already = 0
+    failures = []
+    offset = 0
+    for batch in chunked(operations, batch_size):
+        try:
+            counts = enrollment_write_counts(db["enrollments"].bulk_write(batch, ordered=False))
+        except BulkWriteError as e:
+            counts = enrollment_write_counts(error=e)
+        enrolled += counts[0]
+        already += counts[1]
+        failures += located_failures(counts[2], targets, offset)
+        offset += len(batch)
+
+    return enrollment_summary(enrolled, already, rejected, failures, started)
 
 
+@bumps("enrollments", DAILY_COLLECTION, COURSE_DAILY_COLLECTION)
 def delete_enrollment(enrollment_id: str):
     enrollments = db["enrollments"]
-    result = enrollments.delete_one({"enrollmentId": enrollment_id})
-
-    if result.deleted_count:
+    deleted = enrollments.find_one_and_delete(
+        {"enrollmentId": enrollment_id},
+        {"_id": 0, "courseId": 1, "enrolledAt": 1}
+    )
+
+    if deleted:
+        mark_course_stats_stale(deleted["courseId"])
+        apply_rollup_decrements(deleted["courseId"], deleted["enrolledAt"])
         print(f"✅ Enrollment '{enrollment_id}' deleted successfully.")
     else:
         print(f"❌ Enrollment '{enrollment_id}' not found.")
@@ -118,111 +288,144 @@ def delete_enrollment(enrollment_id: str):
 
 
 
-def enrollment_stats_per_course():
-    pipeline = [
+def backfill_enrollment_course_fields_pipeline():
+    return [
+        {"$match": {"instructorId": {"$exists": False}}},
         {
-            "$group": {
-                "_id": "$courseId",
-                "totalEnrollments": {"$sum": 1}
+            "$lookup": {
+                "from": "courses",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "course_info"
             }
         },
+        {"$unwind": "$course_info"},
         {
-            "$sort": {"totalEnrollments": -1}
-        }
+            "$project": {
+                "instructorId": "$course_info.instructorId",
+                "category": "$course_info.category",
+                "pricePaid": "$course_info.price"
+            }
+        },
+        {"$merge": {"into": "enrollments", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
 
-    print("📊 Total Enrollments per Course:")
-    for doc in results:
-        print(f"Course ID: {doc['_id']} — Enrollments: {doc['totalEnrollments']}")
+@bumps("enrollments")
+def backfill_enrollment_course_fields():
+    # One-off for enrollments written before the snapshot fields existed; pricePaid falls back to the current price
+    db["enrollments"].aggregate(backfill_enrollment_course_fields_pipeline())
+    remaining = db["enrollments"].count_documents({"instructorId": {"$exists": False}})
+    print(f"📦 Enrollment course fields backfilled ({remaining} enrollment(s) left without a matching course).")
+
+
+@bumps("enrollments")
+def repair_enrollment_course_fields(course_ids=None, batch_size=500):
+    # Re-syncs instructorId/category after a course is reassigned or recategorised; pricePaid is left alone
+    query = {"courseId": {"$in": course_ids}} if course_ids is not None else {}
+    courses = db["courses"].find(query, {"_id": 0, "courseId": 1, "instructorId": 1, "category": 1}, batch_size=batch_size)
+    repaired = 0
+
+    for batch in chunked(courses, batch_size):
+        result = db["enrollments"].bulk_write([
+            UpdateMany(
+                {
+                    "courseId": course["courseId"],
+                    "$or": [
+                        {"instructorId": {"$ne": course["instructorId"]}},
+                        {"category": {"$ne": course["category"]}}
+                    ]
+                },
+                {"$set": {"instructorId": course["instructorId"], "category": course["category"]}}
+            )
+            for course in batch
+        ], ordered=False)
+        repaired += result.modified_count
 
+    print(f"🛠️ Repaired course fields on {repaired} enrollment(s).")
+    return repaired
 
 
-def course_completion_rate():
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$courseId",
-                "total": {"$sum": 1},
-                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}}
-            }
-        },
+
+# These two read the materialized course_enrollment_stats collection (one document per course),
+# kept current by analytics.course_stats.refresh_course_enrollment_stats()
+def enrollment_stats_per_course_pipeline():
+    return [
+        {"$sort": {"total": -1}},
         {
             "$project": {
-                "completionRate": {
-                    "$cond": [
-                        {"$eq": ["$total", 0]},
-                        0,
-                        {"$round": [{"$multiply": [{"$divide": ["$completed", "$total"]}, 100]}, 1]}
-                    ]
-                },
-                "total": 1,
-                "completed": 1
+                "totalEnrollments": "$total",
+                "enrolled": 1,
+                "inProgress": 1,
+                "completed": 1,
+                "averageProgress": 1
             }
-        },
-        {"$sort": {"completionRate": -1}}
+        }
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
 
-    print("✅ Completion Rate by Course (%):")
-    for doc in results:
-        print(f"Course ID: {doc['_id']} | {doc['completed']} completed out of {doc['total']} — {doc['completionRate']}%")
+def enrollment_stats_per_course(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        STATS_COLLECTION, enrollment_stats_per_course_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
-def total_students_per_instructor():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "courses",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "course_info"
-            }
-        },
-        {"$unwind": "$course_info"},
-        {
-            "$group": {
-                "_id": "$course_info.instructorId",
-                "studentsTaught": {"$addToSet": "$studentId"}
-            }
-        },
+def course_completion_rate_pipeline():
+    return [
+        {"$sort": {"completionRate": -1}},
+        {"$project": {"completionRate": 1, "total": 1, "completed": 1}}
+    ]
+
+
+def course_completion_rate(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        STATS_COLLECTION, course_completion_rate_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
+
+
+
+def total_students_per_instructor_pipeline():
+    # Sorting on the (instructorId, studentId) index lets the planner feed both groups from the index alone
+    return [
+        {"$sort": {"instructorId": 1, "studentId": 1}},
+        {"$group": {"_id": {"instructorId": "$instructorId", "studentId": "$studentId"}}},
+        {"$group": {"_id": "$_id.instructorId", "totalStudents": {"$sum": 1}}},
         {
             "$project": {
                 "_id": 0,
                 "instructorId": "$_id",
-                "totalStudents": {"$size": "$studentsTaught"}
+                "totalStudents": 1
             }
         },
         {"$sort": {"totalStudents": -1}}
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
 
-    print("👨‍🏫 Total Students Taught by Instructor:")
-    for doc in results:
-        print(f"Instructor: {doc['instructorId']} — {doc['totalStudents']} students")
+def total_students_per_instructor(
+    approximate=False, materialize=False, batch_size=None, cache=False, stale_while_revalidate=False
+):
+    # approximate=True reads the per-instructor HyperLogLogs (~0.8% error, a few KB each) instead of
+    # grouping every (instructor, student) pair; they count students ever enrolled, up to the last rebuild
+    if approximate:
+        return aggregate_results(
+            INSTRUCTOR_STUDENT_SKETCHES, approximate_students_per_instructor_pipeline(),
+            materialize, batch_size, cache, stale_while_revalidate
+        )
+    return aggregate_results(
+        "enrollments", total_students_per_instructor_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
-def revenue_per_instructor():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "courses",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "course_info"
-            }
-        },
-        {"$unwind": "$course_info"},
+def revenue_per_instructor_pipeline():
+    # Revenue is what students paid (pricePaid at enrollment), not the course's current list price
+    return [
         {
             "$group": {
-                "_id": "$course_info.instructorId",
-                "totalRevenue": {"$sum": "$course_info.price"},
+                "_id": "$instructorId",
+                "totalRevenue": {"$sum": "$pricePaid"},
                 "enrollments": {"$sum": 1}
             }
         },
@@ -237,45 +440,39 @@ def revenue_per_instructor():
         {"$sort": {"totalRevenue": -1}}
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
 
-    print("💰 Revenue per Instructor:")
-    for doc in results:
-        print(f"Instructor: {doc['instructorId']} — ${doc['totalRevenue']} from {doc['enrollments']} enrollments")
+def revenue_per_instructor(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        "enrollments", revenue_per_instructor_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
-def monthly_enrollment_trends():
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$enrolledAt"},
-                    "month": {"$month": "$enrolledAt"}
-                },
-                "totalEnrollments": {"$sum": 1}
-            }
-        },
+def monthly_enrollment_trends_pipeline(rolled=None):
+    # Served from the daily rollups (see analytics.enrollment_rollups.enrollment_trends for other
+    # ranges/granularities), keeping the original {_id: {year, month}, totalEnrollments} shape
+    return enrollment_trends_pipeline("month", rolled=rolled or rolled_through()) + [
         {
-            "$sort": {
-                "_id.year": 1,
-                "_id.month": 1
+            "$project": {
+                "_id": {"year": {"$year": "$period"}, "month": {"$month": "$period"}},
+                "totalEnrollments": "$enrollments"
             }
         }
     ]
 
-    results = db["enrollments"].aggregate(pipeline)
-    print("📈 Monthly Enrollment Trends:")
-    for doc in results:
-        year = doc["_id"]["year"]
-        month = doc["_id"]["month"]
-        print(f"{year}-{month:02d}: {doc['totalEnrollments']} enrollments")
+
+def monthly_enrollment_trends(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        DAILY_COLLECTION, monthly_enrollment_trends_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 # create_enrollments()
-enroll_student(9, "6ea29704-fe4c-45ef-b842-a5df5134367f")
+# enroll_student(9, "6ea29704-fe4c-45ef-b842-a5df5134367f")
 # delete_enrollment("")
+# backfill_enrollment_course_fields()
+# repair_enrollment_course_fields()
 # enrollment_stats_per_course()
 # course_completion_rate()
 # total_students_per_instructor()
@@ -2,61 +2,94 @@ from faker import Faker
 import uuid
 import random
 
+from analytics.result_cache import bumps
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.Lesson import lesson_validator
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, load_ids
+from utils.ids import random_uuid
+from utils.parallel import parallel_insert, split_count, split_list
 from utils.timestamp import utc_now_iso
 
 
-def create_lessons():
-    if "lessons" not in db.list_collection_names():
-        db.create_collection("lessons")
-    db.command("collMod", "lessons", validator={"$jsonSchema": lesson_validator})
+def next_lesson_positions(lessons):
+    # One $group up front instead of a count_documents round trip per lesson
+    positions = lessons.aggregate([
+        {"$group": {"_id": "$courseId", "position": {"$max": "$position"}}}
+    ])
+    return {doc["_id"]: doc["position"] for doc in positions}
 
-    lessons = db["lessons"]
-    lessons.create_index("lessonId", unique=True)
 
-    courses = list(db["courses"].find({}, {"courseId": 1, "title": 1}))
-    if not courses:
-        print("❌ No courses found to assign lessons.")
-        return
-
-    fake = Faker()
-    total_lessons = 25
-    lesson_counter = 0
+def generate_lessons(count, fake, course_ids, positions):
+    for _ in range(count):
+        course_id = random.choice(course_ids)
+        positions[course_id] = positions.get(course_id, 0) + 1
 
-    while lesson_counter < total_lessons:
-        course = random.choice(courses)
-        position = lessons.count_documents({"courseId": course["courseId"]}) + 1
-
-        lesson = {
-            "lessonId": str(uuid.uuid4()),
-            "courseId": course["courseId"],
+        yield {
+            "lessonId": random_uuid(),
+            "courseId": course_id,
             "title": fake.sentence(nb_words=5),
             "content": fake.paragraph(nb_sentences=5),
             "duration": random.randint(5, 20),  # in minutes
-            "position": position,
+            "position": positions[course_id],
             "createdAt": utc_now_iso(),
             "updatedAt": utc_now_iso()
         }
 
+
+@bumps("lessons")
+def create_lessons(count=25, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
+    lessons = db["lessons"]
+
+    course_ids = load_ids(db["courses"], "courseId")
+    if not course_ids:
+        print("❌ No courses found to assign lessons.")
+        return
+
+    positions = next_lesson_positions(lessons)
+
+    if workers > 1:
+        # Each worker owns a disjoint set of courses, so lesson positions never interleave
+        course_slices = [ids for ids in split_list(course_ids, workers) if ids]
+        counts = split_count(count, len(course_slices))
+        shards = [
+            (n, (ids, {course_id: positions[course_id] for course_id in ids if course_id in positions}), {})
+            for n, ids in zip(counts, course_slices)
+        ]
+        return parallel_insert("lessons", generate_lessons, shards, batch_size)
+
+    fake = Faker()
+    documents = generate_lessons(count, fake, course_ids, positions)
+
+    if bulk:
+        return bulk_insert(lessons, documents, batch_size)
+
+    for lesson_counter, lesson in enumerate(documents, start=1):
         try:
             lessons.insert_one(lesson)
-            lesson_counter += 1
-            print(f"✅ [{lesson_counter}/25] Inserted lesson for course {course['courseId']}")
+            print(f"✅ [{lesson_counter}/{count}] Inserted lesson for course {lesson['courseId']}")
         except Exception as e:
             print(f"❌ Failed to insert lesson: {e}")
 
 
 
 
-def add_lesson_to_course():
-    # Ensure lessons collection exists with validator
-    if "lessons" not in db.list_collection_names():
-        db.create_collection("lessons")
-    db.command("collMod", "lessons", validator={"$jsonSchema": lesson_validator})
+def new_lesson(course_id, position, fake):
+    return {
+        "lessonId": str(uuid.uuid4()),
+        "courseId": course_id,
+        "title": fake.sentence(nb_words=5),
+        "content": fake.paragraph(nb_sentences=5),
+        "duration": fake.random_int(min=5, max=20),  # in minutes
+        "position": position,
+        "createdAt": utc_now_iso(),
+        "updatedAt": utc_now_iso()
+    }
 
+
+@bumps("lessons")
+def add_lesson_to_course():
     lessons = db["lessons"]
-    lessons.create_index("lessonId", unique=True)
 
     # Fetch a course to attach the lesson to
     course = db["courses"].find_one()
@@ -67,18 +100,7 @@ def add_lesson_to_course():
     # Determine next lesson position for this course
     current_position = lessons.count_documents({"courseId": course["courseId"]}) + 1
 
-    fake = Faker()
-
-    lesson = {
-        "lessonId": str(uuid.uuid4()),
-        "courseId": course["courseId"],
-        "title": fake.sentence(nb_words=5),
-        "content": fake.paragraph(nb_sentences=5),
-        "duration": fake.random_int(min=5, max=20),  # in minutes
-        "position": current_position,
-        "createdAt": utc_now_iso(),
-        "updatedAt": utc_now_iso()
-    }
+    lesson = new_lesson(course["courseId"], current_position, Faker())
 
     try:
         lessons.insert_one(lesson)
@@ -88,6 +110,7 @@ def add_lesson_to_course():
 
 
 
+@bumps("lessons")
 def delete_lesson(lesson_id: str):
     lessons = db["lessons"]
     result = lessons.delete_one({"lessonId": lesson_id})
@@ -101,6 +124,6 @@ def delete_lesson(lesson_id: str):
 
 
 
-create_lessons()
+# create_lessons()
 # add_lesson_to_course()
 # delete_lesson("")
\ No newline at end of file
@@ -14,6 +14,20 @@ assignment_validator = {
             "bsonType": "int",
             "minimum": 1
         },
-        "isPublished": {"bsonType": "bool"}
+        "isPublished": {"bsonType": "bool"},
+        "gradeDistribution": {
+            "bsonType": "object",
+            "required": ["count", "sum", "histogram"],
+            "properties": {
+                "count": {"bsonType": "int", "minimum": 0},
+                "sum": {"bsonType": ["int", "long"], "minimum": 0},
+                "average": {"bsonType": ["double", "null"]},
+                "histogram": {
+                    "bsonType": "object",
+                    "description": "Graded submission counts keyed by percentage of maxScore, \"0\" - \"90\""
+                }
+            },
+            "description": "Maintained by grade_submissions; rebuilt with rebuild_grade_distributions"
+        }
     }
 }
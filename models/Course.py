@@ -43,29 +43,26 @@ course_validator = {
             },
             "description": "Relevant keywords for filtering"
         },
-        "ratings": {
+        "searchTokens": {
             "bsonType": "array",
             "items": {
-                "bsonType": "object",
-                "required": ["studentId", "rating", "ratedAt"],
-                "properties": {
-                    "studentId": {
-                        "bsonType": "string",
-                        "description": "Student who gave the rating"
-                    },
-                    "rating": {
-                        "bsonType": "double",
-                        "minimum": 1.0,
-                        "maximum": 5.0,
-                        "description": "Rating score (1.0 - 5.0)"
-                    },
-                    "ratedAt": {
-                        "bsonType": "date",
-                        "description": "Timestamp of the rating"
-                    }
+                "bsonType": "string"
+            },
+            "description": "Lowercased title and tag words for prefix search"
+        },
+        "ratingSummary": {
+            "bsonType": "object",
+            "required": ["count", "sum", "histogram"],
+            "properties": {
+                "count": {"bsonType": "int", "minimum": 0},
+                "sum": {"bsonType": "double", "minimum": 0},
+                "average": {"bsonType": "double", "minimum": 1.0, "maximum": 5.0},
+                "histogram": {
+                    "bsonType": "object",
+                    "description": "Rating counts keyed by nearest whole star, \"1\" - \"5\""
                 }
             },
-            "description": "User-generated course reviews"
+            "description": "Incrementally maintained aggregate of the course_ratings buckets"
         },
         "createdAt": {
             "bsonType": "date",
@@ -0,0 +1,24 @@
+# Bucket pattern: each document holds up to ratings.RATINGS_BUCKET_SIZE ratings for one course
+
+course_rating_validator = {
+    "bsonType": "object",
+    "required": ["courseId", "count", "ratings"],
+    "properties": {
+        "courseId": {"bsonType": "string"},  # Reference to courses.courseId
+        "count": {"bsonType": "int", "minimum": 0},
+        "ratings": {
+            "bsonType": "array",
+            "items": {
+                "bsonType": "object",
+                "required": ["studentId", "rating", "ratedAt"],
+                "properties": {
+                    "studentId": {"bsonType": "string"},  # Reference to users.userId
+                    "rating": {"bsonType": "double", "minimum": 1.0, "maximum": 5.0},
+                    "ratedAt": {"bsonType": "date"}
+                }
+            }
+        },
+        "firstRatedAt": {"bsonType": "date"},
+        "lastRatedAt": {"bsonType": "date"}
+    }
+}
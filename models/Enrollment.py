@@ -7,7 +7,11 @@ enrollment_validator = {
         "enrollmentId": {"bsonType": "string"},
         "studentId": {"bsonType": "string"},     # Reference to users.userId
         "courseId": {"bsonType": "string"},      # Reference to courses.courseId
+        "instructorId": {"bsonType": "string"},  # Snapshot of courses.instructorId
+        "category": {"bsonType": "string"},      # Snapshot of courses.category
+        "pricePaid": {"bsonType": "double", "minimum": 0},  # courses.price at enrollment time
         "enrolledAt": {"bsonType": "date"},
+        "updatedAt": {"bsonType": "date"},       # Last status/progress change; drives the stats refresh watermark
         "progress": {
             "bsonType": "double",
             "minimum": 0,
@@ -0,0 +1,19 @@
+from models.Assignment import assignment_validator
+from models.Course import course_validator
+from models.CourseRating import course_rating_validator
+from models.Enrollment import enrollment_validator
+from models.Lesson import lesson_validator
+from models.Submission import submission_validator
+from models.User import user_validator
+
+
+# Collection name -> $jsonSchema validator
+VALIDATORS = {
+    "users": user_validator,
+    "courses": course_validator,
+    "course_ratings": course_rating_validator,
+    "enrollments": enrollment_validator,
+    "lessons": lesson_validator,
+    "assignments": assignment_validator,
+    "submissions": submission_validator
+}
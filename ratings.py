@@ -0,0 +1,255 @@
+import random
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from analytics.result_cache import bumps
+from database.bootstrap import ensure_schema
+from database.mongo_db import db
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, chunked, load_ids
+from utils.parallel import parallel_insert, split_count, split_list
+from utils.results import as_results
+from utils.timestamp import utc_now_iso
+
+
+# Ratings per course_ratings document; keeps every bucket (and every course document) bounded in size
+RATINGS_BUCKET_SIZE = 100
+
+
+def rating_star(rating):
+    # Histogram bucket for a 1.0-5.0 rating: nearest whole star, halves round up
+    return int(rating + 0.5)
+
+
+def rating_summary(ratings):
+    histogram = {str(star): 0 for star in range(1, 6)}
+    for entry in ratings:
+        histogram[str(rating_star(entry["rating"]))] += 1
+
+    total = float(sum(entry["rating"] for entry in ratings))
+    summary = {"count": len(ratings), "sum": total, "histogram": histogram}
+    if ratings:
+        summary["average"] = round(total / len(ratings), 2)
+    return summary
+
+
+def rating_buckets(course_id, ratings):
+    for bucket in chunked(ratings, RATINGS_BUCKET_SIZE):
+        yield {
+            "courseId": course_id,
+            "count": len(bucket),
+            "ratings": bucket,
+            "firstRatedAt": min(entry["ratedAt"] for entry in bucket),
+            "lastRatedAt": max(entry["ratedAt"] for entry in bucket)
+        }
+
+
+def generate_course_ratings(count, student_ids, course_ids):
+    # Spreads `count` ratings over the courses and yields them already packed into buckets
+    per_course, extra = divmod(count, len(course_ids))
+
+    for i, course_id in enumerate(random.sample(course_ids, len(course_ids))):
+        n = per_course + (1 if i < extra else 0)
+        if not n:
+            break
+
+        ratings = [
+            {
+                "studentId": random.choice(student_ids),
+                "rating": round(random.uniform(1.0, 5.0), 1),
+                "ratedAt": utc_now_iso()
+            }
+            for _ in range(n)
+        ]
+        yield from rating_buckets(course_id, ratings)
+
+
+@bumps("course_ratings", "courses")
+def create_course_ratings(count=20, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
+    course_ratings = db["course_ratings"]
+
+    student_ids = load_ids(db["users"], "userId", {"role": "student"})
+    # Ratings only go on published courses
+    course_ids = load_ids(db["courses"], "courseId", {"isPublished": True})
+
+    if not student_ids or not course_ids:
+        print("❌ Cannot seed ratings: missing students or published courses.")
+        return
+
+    if workers > 1:
+        # Disjoint course slices, so no bucket is written by two workers
+        course_slices = [ids for ids in split_list(course_ids, workers) if ids]
+        counts = split_count(count, len(course_slices))
+        shards = [(n, (student_ids, ids), {}) for n, ids in zip(counts, course_slices)]
+        report = parallel_insert("course_ratings", generate_course_ratings, shards, batch_size, uses_faker=False)
+    elif bulk:
+        report = bulk_insert(course_ratings, generate_course_ratings(count, student_ids, course_ids), batch_size)
+    else:
+        report = None
+        for bucket in generate_course_ratings(count, student_ids, course_ids):
+            try:
+                course_ratings.insert_one(bucket)
+                print(f"✅ Inserted {bucket['count']} rating(s) for course {bucket['courseId']}")
+            except Exception as e:
+                print(f"❌ Failed to insert ratings: {e}")
+
+    rebuild_rating_summaries()
+    return report
+
+
+def rating_summary_update(rating: float, rated_at):
+    # Pipeline update folding one rating into ratingSummary atomically (average needs the new sum/count)
+    star = f"ratingSummary.histogram.{rating_star(rating)}"
+    return [
+        {
+            "$set": {
+                "ratingSummary.count": {"$add": [{"$ifNull": ["$ratingSummary.count", 0]}, 1]},
+                "ratingSummary.sum": {"$add": [{"$ifNull": ["$ratingSummary.sum", 0.0]}, rating]},
+                star: {"$add": [{"$ifNull": [f"${star}", 0]}, 1]},
+                "updatedAt": rated_at
+            }
+        },
+        {
+            "$set": {
+                "ratingSummary.average": {
+                    "$round": [{"$divide": ["$ratingSummary.sum", "$ratingSummary.count"]}, 2]
+                }
+            }
+        }
+    ]
+
+
+def rating_bucket_push(course_id: str, student_id: str, rating: float, rated_at):
+    # (filter, update) for an upsert into the course's open bucket; a new bucket starts once it is full
+    return (
+        {"courseId": course_id, "count": {"$lt": RATINGS_BUCKET_SIZE}},
+        {
+            "$push": {"ratings": {"studentId": student_id, "rating": rating, "ratedAt": rated_at}},
+            "$inc": {"count": 1},
+            "$min": {"firstRatedAt": rated_at},
+            "$max": {"lastRatedAt": rated_at}
+        }
+    )
+
+
+@bumps("course_ratings", "courses")
+def add_course_rating(course_id: str, student_id: str, rating: float):
+    rating = float(rating)
+    if not 1.0 <= rating <= 5.0:
+        print(f"❌ Rating must be between 1.0 and 5.0, got {rating}.")
+        return
+
+    rated_at = utc_now_iso()
+
+    # Summary first, so an unknown course never gets a bucket. The two writes are not one
+    # transaction; rebuild_rating_summaries() re-derives the summaries from the buckets.
+    result = db["courses"].update_one({"courseId": course_id}, rating_summary_update(rating, rated_at))
+    if not result.matched_count:
+        print(f"❌ Course with ID {course_id} not found.")
+        return
+
+    bucket_filter, bucket_update = rating_bucket_push(course_id, student_id, rating, rated_at)
+    db["course_ratings"].update_one(bucket_filter, bucket_update, upsert=True)
+    print(f"\n⭐ Rating {rating} added to course {course_id}.")
+
+
+
+def get_course_ratings(course_id: str, materialize=False, batch_size=None):
+    results = db["course_ratings"].aggregate([
+        {"$match": {"courseId": course_id}},
+        {"$sort": {"firstRatedAt": 1}},
+        {"$unwind": "$ratings"},
+        {"$replaceRoot": {"newRoot": "$ratings"}}
+    ])
+    return as_results(results, materialize, batch_size)
+
+
+
+def rebuild_rating_summaries_pipeline(course_ids=None):
+    def rated_as(star):
+        return {"$sum": {"$cond": [{"$eq": [{"$floor": {"$add": ["$ratings.rating", 0.5]}}, star]}, 1, 0]}}
+
+    match = [{"$match": {"courseId": {"$in": course_ids}}}] if course_ids else []
+    return match + [
+        {"$unwind": "$ratings"},
+        {
+            "$group": {
+                "_id": "$courseId",
+                "count": {"$sum": 1},
+                "sum": {"$sum": "$ratings.rating"},
+                **{f"star{star}": rated_as(star) for star in range(1, 6)}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "courseId": "$_id",
+                "ratingSummary": {
+                    "count": "$count",
+                    "sum": {"$toDouble": "$sum"},
+                    "average": {"$round": [{"$divide": ["$sum", "$count"]}, 2]},
+                    "histogram": {str(star): f"$star{star}" for star in range(1, 6)}
+                }
+            }
+        },
+        {"$merge": {"into": "courses", "on": "courseId", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+
+@bumps("courses")
+def rebuild_rating_summaries(course_ids=None):
+    # Re-derives ratingSummary for the given (or all) courses from their rating buckets
+    db["course_ratings"].aggregate(rebuild_rating_summaries_pipeline(course_ids))
+    print("🧮 Rating summaries rebuilt from course_ratings.")
+
+
+
+@bumps("courses", "course_ratings")
+def migrate_embedded_ratings(batch_size=500):
+    # One-off: moves courses.ratings arrays into course_ratings buckets and drops the arrays.
+    # Courses are handled in batches; a batch's buckets are written before its arrays are unset. Migrated
+    # buckets get deterministic _ids, so rerunning after a crash between the two writes skips the buckets
+    # already inserted instead of duplicating those ratings.
+    ensure_schema()
+    courses = db["courses"]
+    migrated = 0
+
+    cursor = courses.find(
+        {"ratings": {"$exists": True}},
+        {"_id": 0, "courseId": 1, "ratings": 1},
+        batch_size=batch_size
+    )
+    for batch in chunked(cursor, batch_size):
+        buckets = [
+            {"_id": f"{course['courseId']}:embedded:{n}", **bucket}
+            for course in batch
+            for n, bucket in enumerate(rating_buckets(course["courseId"], course["ratings"]))
+        ]
+        if buckets:
+            try:
+                db["course_ratings"].insert_many(buckets, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys are buckets from an interrupted earlier run; anything else keeps the arrays
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+
+        courses.bulk_write([
+            UpdateOne(
+                {"courseId": course["courseId"]},
+                {"$set": {"ratingSummary": rating_summary(course["ratings"])}, "$unset": {"ratings": ""}}
+            )
+            for course in batch
+        ], ordered=False)
+        migrated += len(batch)
+
+    print(f"📦 Moved embedded ratings of {migrated} course(s) into course_ratings.")
+    return migrated
+
+
+
+# create_course_ratings()
+# add_course_rating("7d197809-a4f5-4669-9ea6-e76a2e6d8f57", "1eeccd9f-bba5-4a69-82bc-da723955fdb9", 4.5)
+# get_course_ratings("7d197809-a4f5-4669-9ea6-e76a2e6d8f57")
+# rebuild_rating_summaries()
+# migrate_embedded_ratings()
@@ -0,0 +1,101 @@
+import argparse
+import random
+import time
+
+from faker import Faker
+
+from analytics.course_stats import refresh_course_enrollment_stats
+from analytics.enrollment_rollups import refresh_enrollment_rollups
+from analytics.score_quantiles import rebuild_score_sketches
+from analytics.student_reach import rebuild_student_reach
+from assignments import create_assignments
+from courses import create_courses
+from database.bootstrap import bootstrap
+from database.mongo_db import db
+from enrollments import create_enrollments
+from lessons import create_lessons
+from ratings import create_course_ratings
+from submissions import create_submissions, rebuild_grade_distributions
+from users import create_users
+from utils.bulk import DEFAULT_BATCH_SIZE
+
+
+# Documents per collection at --scale 1 (the original hand-run seeder sizes)
+BASE_COUNTS = {
+    "users": 20,
+    "courses": 10,
+    "course_ratings": 20,
+    "enrollments": 15,
+    "lessons": 25,
+    "assignments": 10,
+    "submissions": 12
+}
+
+# Dependency order: each seeder reads the ids written by the ones before it
+SEEDERS = [
+    ("users", create_users),
+    ("courses", create_courses),
+    ("course_ratings", create_course_ratings),
+    ("enrollments", create_enrollments),
+    ("lessons", create_lessons),
+    ("assignments", create_assignments),
+    ("submissions", create_submissions)
+]
+
+
+def scaled_counts(scale):
+    return {name: max(1, int(count * scale)) for name, count in BASE_COUNTS.items()}
+
+
+def seed_dataset(scale=1, seed=42, batch_size=DEFAULT_BATCH_SIZE, drop=False, workers=1):
+    random.seed(seed)
+    Faker.seed(seed)
+
+    if drop:
+        for name, _ in SEEDERS:
+            db.drop_collection(name)
+        print("🧹 Dropped existing seed collections.")
+
+    bootstrap(force=drop)
+
+    counts = scaled_counts(scale)
+    reports = {}
+    started = time.perf_counter()
+
+    for name, seeder in SEEDERS:
+        print(f"\n🌱 Seeding {counts[name]} {name} (scale {scale}, seed {seed})")
+        reports[name] = seeder(count=counts[name], bulk=True, batch_size=batch_size, workers=workers)
+
+    # Seeded enrollments are back-dated, so they sit behind any watermark; rebuild the stats outright
+    refresh_course_enrollment_stats(full=True)
+    refresh_enrollment_rollups(full=True)
+    rebuild_student_reach()
+    rebuild_grade_distributions()
+    rebuild_score_sketches()
+
+    elapsed = time.perf_counter() - started
+    total = sum(report["inserted"] for report in reports.values() if report)
+    print(f"\n✅ Seeded {total} documents in {elapsed:.2f}s")
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a referentially consistent EduHub dataset.")
+    parser.add_argument("--scale", type=float, default=1, help="multiplier applied to the base seed counts")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for reproducible datasets")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per insert_many call")
+    parser.add_argument("--workers", type=int, default=1, help="generator processes per collection")
+    parser.add_argument("--drop", action="store_true", help="drop the seeded collections before seeding")
+    args = parser.parse_args(argv)
+
+    seed_dataset(
+        scale=args.scale,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        drop=args.drop,
+        workers=args.workers
+    )
+
+
+if __name__ == "__main__":
+    main()
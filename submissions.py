@@ -1,82 +1,379 @@
 from faker import Faker
 from datetime import timedelta
-import uuid
 import random
+import time
 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from analytics.grade_stats import (
+    GRADE_STATS_COLLECTION,
+    graded_stats_operations,
+    recompute_student_grade_stats,
+    record_submissions,
+    refresh_student_grade_stats
+)
+from analytics.result_cache import bumps
+from analytics.score_quantiles import update_score_sketches
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.Submission import submission_validator
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert, chunked, load_ids
+from utils.ids import random_uuid
+from utils.parallel import parallel_insert, split_count
 from utils.timestamp import utc_now_iso
 
 
-def create_submissions():
-    if "submissions" not in db.list_collection_names():
-        db.create_collection("submissions")
-    db.command("collMod", "submissions", validator={"$jsonSchema": submission_validator})
+def generate_submissions(count, fake, student_ids, assignment_ids):
+    for _ in range(count):
+        is_graded = random.choice([True, False])
+
+        yield {
+            "submissionId": random_uuid(),
+            "assignmentId": random.choice(assignment_ids),
+            "studentId": random.choice(student_ids),
+            "submittedAt": utc_now_iso() - timedelta(days=random.randint(0, 15)),
+            "gradedAt": utc_now_iso() if is_graded else None,
+            "score": random.randint(50, 100) if is_graded else 0,
+            "feedback": fake.sentence() if is_graded else "None",
+            "isGraded": is_graded
+        }
+
 
+@bumps("submissions", GRADE_STATS_COLLECTION)
+def create_submissions(count=12, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
     submissions = db["submissions"]
-    submissions.create_index("submissionId", unique=True)
 
-    students = list(db["users"].find({"role": "student"}, {"userId": 1}))
-    assignments = list(db["assignments"].find({}, {"assignmentId": 1}))
+    student_ids = load_ids(db["users"], "userId", {"role": "student"})
+    assignment_ids = load_ids(db["assignments"], "assignmentId")
 
-    if not students or not assignments:
+    if not student_ids or not assignment_ids:
         print("❌ Cannot add submissions: missing students or assignments.")
         return
 
-    fake = Faker()
+    if workers > 1:
+        shards = [(n, (student_ids, assignment_ids), {}) for n in split_count(count, workers)]
+        report = parallel_insert("submissions", generate_submissions, shards, batch_size)
+    elif bulk:
+        report = bulk_insert(submissions, generate_submissions(count, Faker(), student_ids, assignment_ids), batch_size)
+    else:
+        for submission in generate_submissions(count, Faker(), student_ids, assignment_ids):
+            try:
+                submissions.insert_one(submission)
+                record_submissions([submission])
+                print(f"✅ Inserted submission from student {submission['studentId']} for assignment {submission['assignmentId']}")
+            except Exception as e:
+                print(f"❌ Failed to insert submission: {e}")
+        return
 
-    for i in range(12):
-        student = random.choice(students)
-        assignment = random.choice(assignments)
+    # Bulk loads rebuild student_grade_stats in one pass rather than folding in every document
+    refresh_student_grade_stats()
+    return report
 
-        submitted_at = utc_now_iso() - timedelta(days=random.randint(0, 15))
-        is_graded = random.choice([True, False])
-        graded_at = utc_now_iso() if is_graded else None
-        score = random.randint(50, 100) if is_graded else 0
-        feedback = fake.sentence() if is_graded else "None"
-
-        submission = {
-            "submissionId": str(uuid.uuid4()),
-            "assignmentId": assignment["assignmentId"],
-            "studentId": student["userId"],
-            "submittedAt": submitted_at,
-            "gradedAt": graded_at,
-            "score": score,
-            "feedback": feedback,
-            "isGraded": is_graded
+
+
+
+# gradeDistribution histogram bands: percentage of maxScore rounded down to 10s, with a full score in "90"
+GRADE_BANDS = [str(band) for band in range(0, 100, 10)]
+
+
+def grade_band(score, max_score):
+    return str(min(score * 10 // max_score * 10, 90))
+
+
+def grading_state_pipeline(submission_ids):
+    # Current grade of each submission plus its assignment's maxScore and courseId, in one round trip
+    return [
+        {"$match": {"submissionId": {"$in": submission_ids}}},
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "pipeline": [{"$project": {"_id": 0, "maxScore": 1, "courseId": 1}}],
+                "as": "assignment"
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "submissionId": 1,
+                "assignmentId": 1,
+                "studentId": 1,
+                "score": 1,
+                "isGraded": 1,
+                "maxScore": {"$arrayElemAt": ["$assignment.maxScore", 0]},
+                "courseId": {"$arrayElemAt": ["$assignment.courseId", 0]}
+            }
         }
+    ]
+
+
+def grade_rejection(current, score):
+    if current is None:
+        return "not_found", "Submission not found."
+    if current.get("maxScore") is None:
+        return "invalid", f"Assignment {current['assignmentId']} has no maxScore."
+    if isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= current["maxScore"]:
+        return "invalid", f"Score must be a whole number between 0 and {current['maxScore']}, got {score!r}."
+    return None
+
+
+def grading_plan(batch, current, graded_at):
+    # Shared by the sync and async paths: (UpdateOne per valid grade, the grades they apply, rejections).
+    # Each update is guarded on the grade that was read, so a concurrent regrade turns into a conflict
+    # instead of throwing gradeDistribution off.
+    operations, planned, rejected = [], [], []
+    seen = set()
+    for submission_id, score, feedback in batch:
+        if submission_id in seen:
+            rejected.append({"submissionId": submission_id, "status": "invalid", "message": "Graded twice in one batch."})
+            continue
+        seen.add(submission_id)
+        if isinstance(score, float) and score.is_integer():
+            score = int(score)
+        state = current.get(submission_id)
+        rejection = grade_rejection(state, score)
+        if rejection:
+            rejected.append({"submissionId": submission_id, "status": rejection[0], "message": rejection[1]})
+            continue
+
+        grade = {"score": score, "isGraded": True, "gradedAt": graded_at}
+        if feedback is not None:
+            grade["feedback"] = feedback
+        operations.append(UpdateOne(
+            {"submissionId": submission_id, "isGraded": state.get("isGraded"), "score": state.get("score")},
+            {"$set": grade}
+        ))
+        planned.append({"submissionId": submission_id, "score": score, "previous": state})
+    return operations, planned, rejected
+
+
+def grading_outcomes(planned, failed, applied_ids=None):
+    # applied_ids=None means every update without a write error matched its guard
+    applied, results = [], []
+    for index, grade in enumerate(planned):
+        if index in failed:
+            results.append({"submissionId": grade["submissionId"], "status": "failed", "message": failed[index]})
+        elif applied_ids is not None and grade["submissionId"] not in applied_ids:
+            results.append({
+                "submissionId": grade["submissionId"],
+                "status": "conflict",
+                "message": "Submission changed while grading; nothing was written."
+            })
+        else:
+            applied.append(grade)
+            results.append({"submissionId": grade["submissionId"], "status": "graded"})
+    return applied, results
+
+
+def grade_distribution_updates(applied):
+    # One pipeline update per assignment folding the batch's grade changes into gradeDistribution
+    deltas = {}
+    for grade in applied:
+        previous = grade["previous"]
+        delta = deltas.setdefault(previous["assignmentId"], {"count": 0, "sum": 0, "bands": {}})
+        if previous.get("isGraded") and isinstance(previous.get("score"), int):
+            band = grade_band(previous["score"], previous["maxScore"])
+            delta["count"] -= 1
+            delta["sum"] -= previous["score"]
+            delta["bands"][band] = delta["bands"].get(band, 0) - 1
+        band = grade_band(grade["score"], previous["maxScore"])
+        delta["count"] += 1
+        delta["sum"] += grade["score"]
+        delta["bands"][band] = delta["bands"].get(band, 0) + 1
 
+    updates = []
+    for assignment_id, delta in deltas.items():
+        changes = {
+            "gradeDistribution.count": {"$add": [{"$ifNull": ["$gradeDistribution.count", 0]}, delta["count"]]},
+            "gradeDistribution.sum": {"$add": [{"$ifNull": ["$gradeDistribution.sum", 0]}, delta["sum"]]}
+        }
+        for band, change in delta["bands"].items():
+            field = f"gradeDistribution.histogram.{band}"
+            changes[field] = {"$add": [{"$ifNull": [f"${field}", 0]}, change]}
+        updates.append(UpdateOne({"assignmentId": assignment_id}, [
+            {"$set": changes},
+            {
+                "$set": {
+                    "gradeDistribution.average": {
+                        "$cond": [
+                            {"$gt": ["$gradeDistribution.count", 0]},
+                            {"$round": [{"$divide": ["$gradeDistribution.sum", "$gradeDistribution.count"]}, 2]},
+                            None
+                        ]
+                    }
+                }
+            }
+        ]))
+    return updates
+
+
+def grading_summary(results, started):
+    elapsed = time.perf_counter() - started
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    print(
+        f"📝 submissions: {counts.get('graded', 0)} graded, {counts.get('invalid', 0)} invalid, "
+        f"{counts.get('not_found', 0)} not found, {counts.get('conflict', 0)} conflicts, "
+        f"{counts.get('failed', 0)} failed in {elapsed:.2f}s"
+    )
+    return {"counts": counts, "results": results, "seconds": elapsed}
+
+
+def grading_batch_time():
+    # BSON dates keep milliseconds; truncating up front lets gradedAt be matched exactly afterwards
+    now = utc_now_iso()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def write_errors(error):
+    return {write_error["index"]: write_error.get("errmsg") for write_error in error.details.get("writeErrors", [])}
+
+
+@bumps("submissions", "assignments", GRADE_STATS_COLLECTION)
+def grade_submissions(grades, batch_size=DEFAULT_BATCH_SIZE):
+    # Bulk grading for (submission_id, score, feedback) tuples; feedback=None leaves it unchanged.
+    # Per batch: one read of the current grades and maxScores, one unordered bulk_write on submissions,
+    # one on assignments for gradeDistribution and one on student_grade_stats, then a compare-and-swap on the
+    # score sketch of each assignment and course touched. Returns a per-submission status list.
+    started = time.perf_counter()
+    results = []
+
+    for batch in chunked(grades, batch_size):
+        submission_ids = [submission_id for submission_id, _, _ in batch]
+        current = {doc["submissionId"]: doc for doc in db["submissions"].aggregate(grading_state_pipeline(submission_ids))}
+        graded_at = grading_batch_time()
+        operations, planned, rejected = grading_plan(batch, current, graded_at)
+        results += rejected
+        if not operations:
+            continue
+
+        failed = {}
         try:
-            submissions.insert_one(submission)
-            print(f"✅ Inserted submission from student {student['userId']} for assignment {assignment['assignmentId']}")
-        except Exception as e:
-            print(f"❌ Failed to insert submission: {e}")
+            matched = db["submissions"].bulk_write(operations, ordered=False).matched_count
+        except BulkWriteError as e:
+            matched, failed = e.details.get("nMatched", 0), write_errors(e)
 
+        applied_ids = None
+        if matched + len(failed) < len(operations):
+            # Some guards missed; only the submissions stamped with this batch's gradedAt were written
+            applied_ids = set(db["submissions"].distinct(
+                "submissionId",
+                {"submissionId": {"$in": [grade["submissionId"] for grade in planned]}, "gradedAt": graded_at}
+            ))
 
+        applied, outcomes = grading_outcomes(planned, failed, applied_ids)
+        results += outcomes
+        updates = grade_distribution_updates(applied)
+        if updates:
+            db["assignments"].bulk_write(updates, ordered=False)
 
+        stats_operations, regraded = graded_stats_operations(applied)
+        if stats_operations:
+            db[GRADE_STATS_COLLECTION].bulk_write(stats_operations, ordered=False)
+        if regraded:
+            recompute_student_grade_stats(regraded)
 
-def update_assignment_grade(submission_id: str, grade: float):
-    submissions = db["submissions"]
-    submission = submissions.find_one({"submissionId": submission_id})
+        update_score_sketches(applied)
+
+    return grading_summary(results, started)
 
-    if not submission:
-        print(f"❌ Submission with ID {submission_id} not found.")
+
+def update_assignment_grade(submission_id: str, grade: int, feedback: str = None):
+    result = grade_submissions([(submission_id, grade, feedback)])["results"][0]
+    if result["status"] != "graded":
+        print(f"❌ Could not grade submission {submission_id}: {result['message']}")
         return
+    print(f"\n📝 Grade updated for submission {submission_id}: {grade}")
+
 
-    result = submissions.update_one(
-        {"submissionId": submission_id},
+def rebuild_grade_distributions_pipeline(assignment_ids=None):
+    match = {"isGraded": True, "score": {"$type": "int"}}
+    targets = {}
+    if assignment_ids:
+        match["assignmentId"] = {"$in": assignment_ids}
+        targets["assignmentId"] = {"$in": assignment_ids}
+    return [
+        {"$match": match},
         {
-            "$set": {
-                "grade": grade,
-                "gradedAt": utc_now_iso()
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "pipeline": [{"$project": {"_id": 0, "maxScore": 1}}],
+                "as": "assignment"
             }
-        }
-    )
-    print(f"\n📝 Grade updated for submission {submission_id}: {result.modified_count} document(s) updated.")
+        },
+        {"$set": {"maxScore": {"$arrayElemAt": ["$assignment.maxScore", 0]}}},
+        {"$match": {"maxScore": {"$gte": 1}}},
+        {
+            "$group": {
+                "_id": {
+                    "assignmentId": "$assignmentId",
+                    "band": {
+                        "$toString": {
+                            "$toInt": {
+                                "$min": [{"$multiply": [{"$floor": {"$divide": [{"$multiply": ["$score", 10]}, "$maxScore"]}}, 10]}, 90]
+                            }
+                        }
+                    }
+                },
+                "count": {"$sum": 1},
+                "sum": {"$sum": "$score"}
+            }
+        },
+        # An empty row per targeted assignment, so one with no graded submissions left is reset to zero
+        # instead of keeping a distribution that has drifted
+        {
+            "$unionWith": {
+                "coll": "assignments",
+                "pipeline": [
+                    {"$match": targets},
+                    {
+                        "$project": {
+                            "_id": {"assignmentId": "$assignmentId", "band": {"$literal": None}},
+                            "count": {"$literal": 0},
+                            "sum": {"$literal": 0}
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id.assignmentId",
+                "count": {"$sum": "$count"},
+                "sum": {"$sum": "$sum"},
+                "bands": {"$push": {"k": "$_id.band", "v": "$count"}}
+            }
+        },
+        {"$set": {"bands": {"$filter": {"input": "$bands", "cond": {"$ne": ["$$this.k", None]}}}}},
+        {
+            "$project": {
+                "_id": 0,
+                "assignmentId": "$_id",
+                "gradeDistribution": {
+                    "count": "$count",
+                    "sum": "$sum",
+                    "average": {"$cond": [{"$gt": ["$count", 0]}, {"$round": [{"$divide": ["$sum", "$count"]}, 2]}, None]},
+                    "histogram": {"$mergeObjects": [{band: 0 for band in GRADE_BANDS}, {"$arrayToObject": "$bands"}]}
+                }
+            }
+        },
+        {"$merge": {"into": "assignments", "on": "assignmentId", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
 
 
+@bumps("assignments")
+def rebuild_grade_distributions(assignment_ids=None):
+    # Re-derives gradeDistribution for the given (or all) assignments from their graded submissions
+    db["submissions"].aggregate(rebuild_grade_distributions_pipeline(assignment_ids))
+    print("🧮 Grade distributions rebuilt from submissions.")
 
 
 
-create_submissions()
+# create_submissions()
 # update_assignment_grade("42e5b615-457d-452e-803a-a15cf44e70b6", 76)
@@ -3,33 +3,38 @@ import uuid
 import random
 from datetime import timedelta
 
+from pymongo import ASCENDING
+
+from analytics.grade_stats import GRADE_STATS_COLLECTION
+from analytics.result_cache import aggregate_results, bumps
+from catalog import get_user, invalidate_user
+from database.bootstrap import ensure_schema
 from database.mongo_db import db
-from models.User import user_validator
+from utils.bulk import DEFAULT_BATCH_SIZE, bulk_insert
+from utils.ids import random_uuid
+from utils.pagination import DEFAULT_PAGE_SIZE, aggregate_page, find_page
+from utils.parallel import parallel_insert, split_count
+from utils.results import as_results
 from utils.timestamp import utc_now_iso
 
 
-def create_users():
-    # Create or modify the 'users' collection with validator
-    if "users" not in db.list_collection_names():
-        db.create_collection("users")
-    db.command("collMod", "users", validator={"$jsonSchema": user_validator})
-
-    users = db["users"]
-    users.create_index("userId", unique=True)
-    users.create_index("email", unique=True)
-
-    fake = Faker()
+def generate_users(count, fake, email_tag=None):
     roles = ["student", "instructor"]
     skills_pool = ["Python", "MongoDB", "Data Analysis", "Machine Learning", "Web Development"]
 
-    for i in range(20):
-        role = random.choice(roles)
-        user = {
-            "userId": str(uuid.uuid4()),
-            "email": fake.unique.email(),
+    for _ in range(count):
+        email = fake.unique.email()
+        if email_tag:
+            # fake.unique is per Faker instance; the tag keeps parallel workers' emails disjoint
+            local, domain = email.split("@")
+            email = f"{local}.{email_tag}@{domain}"
+
+        yield {
+            "userId": random_uuid(),
+            "email": email,
             "firstName": fake.first_name(),
             "lastName": fake.last_name(),
-            "role": role,
+            "role": random.choice(roles),
             "dateJoined": utc_now_iso(),
             "updatedAt": None,
             "profile": {
@@ -40,14 +45,32 @@ def create_users():
             "isActive": random.choice([True, False])
         }
 
+
+@bumps("users")
+def create_users(count=20, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    ensure_schema()
+    users = db["users"]
+
+    if workers > 1:
+        shards = [(n, (), {"email_tag": f"w{i}"}) for i, n in enumerate(split_count(count, workers))]
+        return parallel_insert("users", generate_users, shards, batch_size)
+
+    fake = Faker()
+    documents = generate_users(count, fake)
+
+    if bulk:
+        return bulk_insert(users, documents, batch_size)
+
+    for user in documents:
         try:
             users.insert_one(user)
-            print(f"✅ Inserted user: {user['firstName']} {user['lastName']} ({role})")
+            print(f"✅ Inserted user: {user['firstName']} {user['lastName']} ({user['role']})")
         except Exception as e:
             print(f"❌ Failed to insert user: {e}")
 
 
 
+@bumps("users")
 def create_single_user():
     new_user = {
         "userId": str(uuid.uuid4()),
@@ -69,30 +92,35 @@ def create_single_user():
     print(f"✅ New student added with _id: {result.inserted_id}")
 
 
-def find_active_students():
+ACTIVE_STUDENT_FIELDS = {"_id": 0, "userId": 1, "firstName": 1, "lastName": 1, "dateJoined": 1, "email": 1}
+
+
+def find_active_students(materialize=False, batch_size=None):
     users = db["users"]
     active_students = users.find({
         "role": "student",
         "isActive": True
-    }, {
-        "_id": 0,
-        "userId": 1,
-        "firstName": 1,
-        "lastName": 1,
-        "dateJoined": 1,
-        "email": 1
-    })
+    }, ACTIVE_STUDENT_FIELDS)
+
+    return as_results(active_students, materialize, batch_size)
 
-    print("\n📘 Active Students:")
-    for student in active_students:
-        print(student)
 
+def find_active_students_page(page_size=DEFAULT_PAGE_SIZE, token=None):
+    # Keyset page over the (role, isActive, dateJoined, userId) index; pass the returned nextToken for the next page
+    return find_page(
+        db["users"],
+        {"role": "student", "isActive": True},
+        ACTIVE_STUDENT_FIELDS,
+        [("dateJoined", ASCENDING), ("userId", ASCENDING)],
+        page_size,
+        token
+    )
 
 
 
-def get_students_in_course(course_id: str):
-    result = db["enrollments"].aggregate([
-        { "$match": { "courseId": course_id } },
+
+def students_in_course_stages():
+    return [
         {
             "$lookup": {
                 "from": "users",
@@ -109,18 +137,38 @@ def get_students_in_course(course_id: str):
                 "student.firstName": 1,
                 "student.lastName": 1,
                 "student.email": 1,
+                "studentId": 1,
                 "status": 1
             }
         }
-    ])
+    ]
+
 
-    print(f"\n📒 Students enrolled in course {course_id}:")
-    for entry in result:
-        print(entry)
+def get_students_in_course_pipeline(course_id: str):
+    return [{"$match": {"courseId": course_id}}] + students_in_course_stages()
 
 
+def get_students_in_course(course_id: str, materialize=False, batch_size=None):
+    result = db["enrollments"].aggregate(get_students_in_course_pipeline(course_id))
 
+    return as_results(result, materialize, batch_size)
 
+
+def get_students_in_course_page(course_id: str, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # Pages enrollments on the (courseId, studentId) index, then joins only that page's students
+    return aggregate_page(
+        db["enrollments"],
+        {"courseId": course_id},
+        [("studentId", ASCENDING)],
+        students_in_course_stages(),
+        page_size,
+        token
+    )
+
+
+
+
+@bumps("users")
 def update_user_profile(user_id: str, bio: str, avatar: str, skills: list):
     result = db["users"].update_one(
         {"userId": user_id},
@@ -137,10 +185,11 @@ def update_user_profile(user_id: str, bio: str, avatar: str, skills: list):
 
 
 
+@bumps("users")
 def soft_delete_user(user_id: str):
     users = db["users"]
 
-    user = users.find_one({"userId": user_id}, {"userId": 1, "isActive": 1})
+    user = get_user(user_id)
 
     if not user:
         print(f"❌ User '{user_id}' not found.")
@@ -151,9 +200,10 @@ def soft_delete_user(user_id: str):
         return
 
     result = users.update_one(
-        {"userId": user_id},
+        {"userId": user_id, "isActive": True},
         {"$set": {"isActive": False, "updatedAt": utc_now_iso()}}
     )
+    invalidate_user(user_id)
 
     if result.modified_count:
         print(f"✅ User '{user_id}' marked as inactive.")
@@ -162,7 +212,7 @@ def soft_delete_user(user_id: str):
 
 
 
-def get_recent_users(months=6):
+def get_recent_users(months=6, materialize=False, batch_size=None):
     users = db["users"]
     six_months_ago = utc_now_iso() - timedelta(days=30 * months)
 
@@ -170,44 +220,30 @@ def get_recent_users(months=6):
         "dateJoined": {"$gte": six_months_ago}
     }, {"_id": 0, "userId": 1, "firstName": 1, "lastName": 1})
 
-    print("\n📘 Users who joined in the last 6 months:")
-    for user in results:
-        print(user)
-    return list(results)
+    return as_results(results, materialize, batch_size)
 
 
-def average_grade_per_student():
-    pipeline = [
-        {"$match": {"score": {"$ne": None}}},  # Only graded submissions
-        {
-            "$group": {
-                "_id": "$studentId",
-                "averageScore": {"$avg": "$score"},
-                "submissionsGraded": {"$sum": 1}
-            }
-        },
-        {"$sort": {"averageScore": -1}}
+def average_grade_per_student_pipeline():
+    # Reads the per-student running aggregates instead of grouping every submission
+    return [
+        {"$match": {"averageScore": {"$ne": None}}},  # Students with graded submissions
+        {"$sort": {"averageScore": -1}},
+        {"$project": {"averageScore": 1, "submissionsGraded": "$gradedCount"}}
     ]
 
-    results = db["submissions"].aggregate(pipeline)
 
-    print("📊 Average Grade per Student:")
-    for doc in results:
-        print(f"Student ID: {doc['_id']} | Avg Score: {doc['averageScore']:.2f} | Graded Submissions: {doc['submissionsGraded']}")
+def average_grade_per_student(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        GRADE_STATS_COLLECTION, average_grade_per_student_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
-def top_performing_students_with_names(limit=5):
-    pipeline = [
-        {"$match": {"score": {"$ne": None}}},
-        {
-            "$group": {
-                "_id": "$studentId",
-                "averageScore": {"$avg": "$score"},
-                "submissionsCount": {"$sum": 1}
-            }
-        },
+def top_performing_students_with_names_pipeline(limit=5):
+    # Walks the averageScore index, so only `limit` stats documents (and their users) are read
+    return [
+        {"$match": {"averageScore": {"$ne": None}}},
         {"$sort": {"averageScore": -1}},
         {"$limit": limit},
         {
@@ -224,7 +260,7 @@ def top_performing_students_with_names(limit=5):
                 "_id": 0,
                 "studentId": "$_id",
                 "averageScore": 1,
-                "submissionsCount": 1,
+                "submissionsCount": "$gradedCount",
                 "firstName": "$userInfo.firstName",
                 "lastName": "$userInfo.lastName",
                 "email": "$userInfo.email"
@@ -232,28 +268,18 @@ def top_performing_students_with_names(limit=5):
         }
     ]
 
-    results = db["submissions"].aggregate(pipeline)
 
-    print(f"🏆 Top {limit} Performing Students (with names):")
-    for doc in results:
-        print(
-            f"{doc['firstName']} {doc['lastName']} ({doc['email']}) "
-            f"| Avg Score: {doc['averageScore']:.2f} "
-            f"| Submissions: {doc['submissionsCount']}"
-        )
+def top_performing_students_with_names(limit=5, materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        GRADE_STATS_COLLECTION, top_performing_students_with_names_pipeline(limit), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
 
-def student_engagement_metrics():
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$studentId",
-                "submissionsMade": {"$sum": 1},
-                "averageScore": {"$avg": "$score"}
-            }
-        },
+def student_engagement_metrics_pipeline():
+    return [
+        {"$sort": {"submissionsMade": -1}},
         {
             "$lookup": {
                 "from": "users",
@@ -272,14 +298,14 @@ def student_engagement_metrics():
                 "submissionsMade": 1,
                 "averageScore": {"$round": ["$averageScore", 2]}
             }
-        },
-        {"$sort": {"submissionsMade": -1}}
+        }
     ]
 
-    results = db["submissions"].aggregate(pipeline)
-    print("📊 Student Engagement:")
-    for doc in results:
-        print(f"{doc['name']} — {doc['submissionsMade']} submissions, Avg Score: {doc['averageScore']}")
+
+def student_engagement_metrics(materialize=False, batch_size=None, cache=False, stale_while_revalidate=False):
+    return aggregate_results(
+        GRADE_STATS_COLLECTION, student_engagement_metrics_pipeline(), materialize, batch_size, cache, stale_while_revalidate
+    )
 
 
 
@@ -293,4 +319,4 @@ def student_engagement_metrics():
 # get_recent_users()
 # average_grade_per_student()
 # top_performing_students_with_names()
-student_engagement_metrics()
\ No newline at end of file
+# student_engagement_metrics()
\ No newline at end of file
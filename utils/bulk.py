@@ -0,0 +1,68 @@
+import time
+
+from pymongo.errors import BulkWriteError
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(collection, documents, batch_size=DEFAULT_BATCH_SIZE):
+    # Unordered insert_many per chunk: a bad document (validation / duplicate key)
+    # is recorded and the rest of the chunk still goes in.
+    inserted = 0
+    failures = []
+    offset = 0
+    started = time.perf_counter()
+
+    for batch in chunked(documents, batch_size):
+        try:
+            result = collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                failures.append({
+                    "index": offset + error["index"],
+                    "code": error.get("code"),
+                    "message": error.get("errmsg")
+                })
+        offset += len(batch)
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0.0
+
+    print(
+        f"📦 {collection.name}: {inserted} inserted, {len(failures)} failed "
+        f"in {elapsed:.2f}s ({rate:,.0f} docs/sec)"
+    )
+    for failure in failures[:5]:
+        print(f"❌ #{failure['index']} (code {failure['code']}): {failure['message']}")
+    if len(failures) > 5:
+        print(f"❌ ... and {len(failures) - 5} more failure(s)")
+
+    return {
+        "collection": collection.name,
+        "inserted": inserted,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "docsPerSec": rate
+    }
+
+
+def load_ids(collection, field, query=None):
+    # Plain find instead of distinct(): distinct's single-document reply caps out at 16MB.
+    # Sorted so random.choice over the result is reproducible under a fixed seed.
+    cursor = collection.find(query or {}, {"_id": 0, field: 1}, batch_size=10000)
+    return sorted(doc[field] for doc in cursor)
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    # Bounded read-through cache: least-recently-used entries are evicted past `maxsize`, and each entry
+    # expires `ttl` seconds after it was loaded. Loaders returning None are not cached, so a lookup for
+    # something that doesn't exist yet keeps going to the database. A load that an invalidate() overtook
+    # is returned to its caller but not cached, since it may hold the value from before the write.
+
+    def __init__(self, maxsize=10_000, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        # Bumped per key by invalidate(); the epoch moves on clear() and whenever the map is trimmed
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return _MISSING
+
+    def generation(self, key):
+        # Take before loading, then pass to set(): the value is dropped if the key was invalidated meanwhile
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key):
+        # Cached value or None, without loading
+        value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def get(self, key, loader):
+        value = self._lookup(key)
+        if value is _MISSING:
+            generation = self.generation(key)
+            value = loader(key)
+            if value is not None:
+                self.set(key, value, generation)
+        return value
+
+    async def aget(self, key, loader):
+        # Same as get() with an async loader; the lock is never held across the await
+        value = self._lookup(key)
+        if value is _MISSING:
+            generation = self.generation(key)
+            value = await loader(key)
+            if value is not None:
+                self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > self.maxsize:
+                # Forgetting generations is only safe if every load in flight is invalidated too
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRate": round(self.hits / lookups, 3) if lookups else None
+            }
@@ -0,0 +1,7 @@
+import random
+import uuid
+
+
+def random_uuid():
+    # uuid4-shaped id drawn from the `random` module, so a seeded run reproduces the same ids
+    return str(uuid.UUID(int=random.getrandbits(128), version=4))
@@ -0,0 +1,114 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def _fingerprint(query, sort):
+    # Ties a token to the query it came from, so it can't be replayed against a different filter or order
+    canonical = json_util.dumps([query, sort], json_options=CANONICAL_JSON_OPTIONS, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+
+def encode_token(values, query, sort):
+    payload = json_util.dumps({"q": _fingerprint(query, sort), "k": values}, json_options=CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token, query, sort):
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Malformed page token.") from e
+
+    if not isinstance(payload, dict) or payload.get("q") != _fingerprint(query, sort) or len(payload.get("k", [])) != len(sort):
+        raise ValueError("Page token does not belong to this query.")
+    return payload["k"]
+
+
+def _value(document, path):
+    for part in path.split("."):
+        document = document.get(part) if isinstance(document, dict) else None
+    return document
+
+
+def keyset_filter(sort, values):
+    # Rows strictly after `values` in `sort` order: (a > x) or (a == x and b > y) or ...
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {prior: values[j] for j, (prior, _) in enumerate(sort[:i])}
+        branch[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def page_filter(query, sort, token):
+    if not token:
+        return query
+    return {"$and": [query, keyset_filter(sort, decode_token(token, query, sort))]}
+
+
+def check_page_size(page_size):
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}, got {page_size}.")
+
+
+def build_page(documents, query, sort, page_size, keys=None):
+    # `keys` holds up to page_size + 1 source rows; the extra one only signals that another page exists.
+    # It defaults to `documents`, and differs only when a joined pipeline dropped some of the rows.
+    keys = documents if keys is None else keys
+    items = documents[:page_size]
+    next_token = None
+    if len(keys) > page_size:
+        next_token = encode_token([_value(keys[page_size - 1], field) for field, _ in sort], query, sort)
+    return {"items": items, "nextToken": next_token}
+
+
+def find_page(collection, query, projection, sort, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # `sort` must end in a unique field and every sort field must survive `projection`
+    check_page_size(page_size)
+    cursor = collection.find(page_filter(query, sort, token), projection).sort(sort).limit(page_size + 1)
+    return build_page(list(cursor), query, sort, page_size)
+
+
+def aggregate_page_stages(query, sort, pipeline, page_size, token):
+    # Pages on the source collection first; `pipeline` (lookups, projections) then runs on at most one page.
+    # The page's sort keys are kept apart from it, since an $unwind in `pipeline` may drop rows and the
+    # next token has to continue after the last source row, not the last row that survived the join.
+    return [
+        {"$match": page_filter(query, sort, token)},
+        {"$sort": dict(sort)},
+        {"$limit": page_size + 1},
+        {
+            "$facet": {
+                "keys": [{"$project": {field: 1 for field, _ in sort}}],
+                "items": [{"$limit": page_size}] + pipeline
+            }
+        }
+    ]
+
+
+def aggregate_page(collection, query, sort, pipeline, page_size=DEFAULT_PAGE_SIZE, token=None):
+    check_page_size(page_size)
+    page = next(collection.aggregate(aggregate_page_stages(query, sort, pipeline, page_size, token)))
+    return build_page(page["items"], query, sort, page_size, page["keys"])
+
+
+async def async_find_page(collection, query, projection, sort, page_size=DEFAULT_PAGE_SIZE, token=None):
+    check_page_size(page_size)
+    cursor = collection.find(page_filter(query, sort, token), projection).sort(sort).limit(page_size + 1)
+    return build_page(await cursor.to_list(), query, sort, page_size)
+
+
+async def async_aggregate_page(collection, query, sort, pipeline, page_size=DEFAULT_PAGE_SIZE, token=None):
+    check_page_size(page_size)
+    cursor = await collection.aggregate(aggregate_page_stages(query, sort, pipeline, page_size, token))
+    page = (await cursor.to_list())[0]
+    return build_page(page["items"], query, sort, page_size, page["keys"])
@@ -0,0 +1,80 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from faker import Faker
+
+from utils.bulk import DEFAULT_BATCH_SIZE
+
+
+def split_count(count, parts):
+    base, extra = divmod(count, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def split_list(items, parts):
+    # Contiguous, disjoint slices: anything unique per item stays unique per shard
+    sizes = split_count(len(items), parts)
+    slices, start = [], 0
+    for size in sizes:
+        slices.append(items[start:start + size])
+        start += size
+    return slices
+
+
+def _seed_shard(collection_name, generator, count, args, kwargs, batch_size, shard_seed, uses_faker):
+    # Runs in a spawned worker, so the lazy db below opens a MongoClient owned by this process
+    from database.mongo_db import db
+    from utils.bulk import bulk_insert
+
+    random.seed(shard_seed)
+    if uses_faker:
+        fake = Faker()
+        fake.seed_instance(shard_seed)
+        args = (fake, *args)
+
+    documents = generator(count, *args, **kwargs)
+    return bulk_insert(db[collection_name], documents, batch_size)
+
+
+def parallel_insert(collection_name, generator, shards, batch_size=DEFAULT_BATCH_SIZE, uses_faker=True):
+    # shards: one (count, args, kwargs) tuple per worker. Shard seeds come from the parent's
+    # `random`, so a seeded run shards and generates identically every time.
+    base_seed = random.getrandbits(64)
+    started = time.perf_counter()
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as pool:
+        futures = [
+            pool.submit(
+                _seed_shard, collection_name, generator, count, args, kwargs,
+                batch_size, f"{base_seed}:{collection_name}:{shard}", uses_faker
+            )
+            for shard, (count, args, kwargs) in enumerate(shards)
+        ]
+        reports = [future.result() for future in futures]
+
+    elapsed = time.perf_counter() - started
+    inserted = sum(report["inserted"] for report in reports)
+    failures = [
+        {**failure, "shard": shard}
+        for shard, report in enumerate(reports)
+        for failure in report["failures"]
+    ]
+    rate = inserted / elapsed if elapsed else 0.0
+
+    print(
+        f"🚀 {collection_name}: {inserted} inserted, {len(failures)} failed across "
+        f"{len(shards)} workers in {elapsed:.2f}s ({rate:,.0f} docs/sec)"
+    )
+
+    return {
+        "collection": collection_name,
+        "inserted": inserted,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "docsPerSec": rate,
+        "workers": len(shards)
+    }
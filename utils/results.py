@@ -0,0 +1,32 @@
+def _stream(cursor):
+    # Closes the server-side cursor even if the caller stops iterating early
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def as_results(cursor, materialize=False, batch_size=None):
+    # Lazily-consumed generator by default (bounded memory); a list when materialize=True
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+    if materialize:
+        return list(cursor)
+    return _stream(cursor)
+
+
+async def _astream(cursor):
+    try:
+        async for document in cursor:
+            yield document
+    finally:
+        await cursor.close()
+
+
+async def as_async_results(cursor, materialize=False, batch_size=None):
+    # Async counterpart of as_results: an async generator by default, a list when materialize=True
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+    if materialize:
+        return await cursor.to_list()
+    return _astream(cursor)
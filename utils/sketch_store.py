@@ -0,0 +1,81 @@
+from pymongo.errors import DuplicateKeyError
+
+from utils.timestamp import utc_now_iso
+
+
+# Compare-and-swap attempts before a sketch update gives up (the owning module's rebuild repairs it)
+CAS_RETRIES = 10
+
+
+def sketch_write(key, document, state):
+    # (filter, update) that only applies if `version` is unchanged since `document` was read,
+    # or (None, document to insert) for a sketch that doesn't exist yet
+    state = {**state, "updatedAt": utc_now_iso()}
+    if document is None:
+        return None, {"_id": key, "version": 1, **state}
+    return {"_id": key, "version": document["version"]}, {"$set": state, "$inc": {"version": 1}}
+
+
+def write_sketch(collection, key, document, state):
+    # One compare-and-swap attempt against the version in `document` (None: the sketch must not exist yet)
+    sketch_filter, update = sketch_write(key, document, state)
+    try:
+        if sketch_filter is None:
+            collection.insert_one(update)
+            return True
+        return bool(collection.update_one(sketch_filter, update).matched_count)
+    except DuplicateKeyError:
+        return False
+
+
+async def awrite_sketch(collection, key, document, state):
+    sketch_filter, update = sketch_write(key, document, state)
+    try:
+        if sketch_filter is None:
+            await collection.insert_one(update)
+            return True
+        return bool((await collection.update_one(sketch_filter, update)).matched_count)
+    except DuplicateKeyError:
+        return False
+
+
+def update_sketch(collection, key, change, load, dump):
+    # Read-modify-write of one sketch document: load(document) -> sketch, change(sketch) -> sketch,
+    # dump(sketch) -> fields to store. Re-read and retried when another writer got there first.
+    for _ in range(CAS_RETRIES):
+        document = collection.find_one({"_id": key})
+        if write_sketch(collection, key, document, dump(change(load(document)))):
+            return True
+    print(f"⚠️ Gave up updating {collection.name} {key} after {CAS_RETRIES} conflicting writes.")
+    return False
+
+
+async def aupdate_sketch(collection, key, change, load, dump):
+    for _ in range(CAS_RETRIES):
+        document = await collection.find_one({"_id": key})
+        if await awrite_sketch(collection, key, document, dump(change(load(document)))):
+            return True
+    print(f"⚠️ Gave up updating {collection.name} {key} after {CAS_RETRIES} conflicting writes.")
+    return False
+
+
+def replace_sketch(collection, key, build, dump):
+    # Replaces a sketch with build(), which re-derives it from its sources. The version is read before
+    # build() reads them, so a value another writer added in between moves the version, fails the swap
+    # and is picked up by the next build instead of being overwritten.
+    for _ in range(CAS_RETRIES):
+        document = collection.find_one({"_id": key}, {"version": 1})
+        if write_sketch(collection, key, document, dump(build())):
+            return True
+    print(f"⚠️ Gave up rebuilding {collection.name} {key} after {CAS_RETRIES} conflicting writes.")
+    return False
+
+
+async def areplace_sketch(collection, key, build, dump):
+    # build is a coroutine function here
+    for _ in range(CAS_RETRIES):
+        document = await collection.find_one({"_id": key}, {"version": 1})
+        if await awrite_sketch(collection, key, document, dump(await build())):
+            return True
+    print(f"⚠️ Gave up rebuilding {collection.name} {key} after {CAS_RETRIES} conflicting writes.")
+    return False
@@ -0,0 +1,139 @@
+import math
+
+
+DEFAULT_COMPRESSION = 100
+
+
+def _k(q, compression):
+    # k1 scale function: centroids stay small near q=0 and q=1, so tail percentiles stay accurate
+    return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+def _k_inverse(k, compression):
+    return (math.sin(2 * math.pi * k / compression) + 1) / 2
+
+
+class TDigest:
+    # Merging t-digest (Dunning & Ertl). Holds at most ~compression centroids however many values
+    # are added, so it stores in one small document, and two digests merge into one. Quantile error
+    # is smallest in the tails.
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        other._compress()
+        if not other.count:
+            return self
+        self._buffer.extend(zip(other.means, other.weights))
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def scaled(self, factor):
+        # Same distribution in other units (e.g. points -> percent of maxScore); factor must be positive
+        self._compress()
+        digest = TDigest(self.compression)
+        digest.means = [mean * factor for mean in self.means]
+        digest.weights = list(self.weights)
+        digest.count = self.count
+        digest.min = None if self.min is None else self.min * factor
+        digest.max = None if self.max is None else self.max * factor
+        return digest
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+
+        total = self.count
+        means, weights = [], []
+        mean, weight = points[0]
+        q0 = 0.0
+        q_limit = _k_inverse(_k(q0, self.compression) + 1, self.compression)
+
+        for next_mean, next_weight in points[1:]:
+            if (q0 * total + weight + next_weight) / total <= q_limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                q0 += weight / total
+                q_limit = _k_inverse(min(_k(q0, self.compression) + 1, self.compression / 4), self.compression)
+                mean, weight = next_mean, next_weight
+
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        # Value at quantile q (0-1), interpolated between centroid centres; None for an empty digest
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}.")
+        self._compress()
+        if not self.count:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+
+        target = q * self.count
+        first_centre = self.weights[0] / 2
+        if target <= first_centre:
+            return self.min + (self.means[0] - self.min) * target / first_centre if first_centre else self.min
+
+        cumulative = 0.0
+        for i in range(len(self.means) - 1):
+            centre = cumulative + self.weights[i] / 2
+            next_centre = cumulative + self.weights[i] + self.weights[i + 1] / 2
+            if target <= next_centre:
+                fraction = (target - centre) / (next_centre - centre)
+                return self.means[i] + (self.means[i + 1] - self.means[i]) * fraction
+            cumulative += self.weights[i]
+
+        last_centre = self.count - self.weights[-1] / 2
+        tail = self.count - last_centre
+        return self.means[-1] + (self.max - self.means[-1]) * (target - last_centre) / tail if tail else self.max
+
+    def to_document(self):
+        self._compress()
+        return {
+            "compression": self.compression,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "means": self.means,
+            "weights": self.weights
+        }
+
+    @classmethod
+    def from_document(cls, document):
+        digest = cls(document.get("compression", DEFAULT_COMPRESSION))
+        digest.means = list(document.get("means", []))
+        digest.weights = list(document.get("weights", []))
+        digest.count = document.get("count", 0)
+        digest.min = document.get("min")
+        digest.max = document.get("max")
+        return digest